@@ -0,0 +1,263 @@
+import argparse
+import threading
+import time
+from datetime import date
+from typing import Any, Dict, Iterable, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from oficial import ERRORES_CONSULTA, ejecutar_query, iterar_query
+from feed_kardex import COLUMNAS_FEED, SuscriptorKardex
+
+# Dimensiones por las que se puede agrupar o filtrar. Las dos últimas son
+# atributos del producto (tabla producto), no columnas del kardex.
+DIMENSIONES = ("producto", "lote", "entorno", "estado", "tipo", "tipo_producto", "operador")
+SIGNO_POR_TIPO = {"ENTRADA": 1, "SALIDA": -1} # DEVOLUCION y MANTENIMIENTO no mueven el saldo (ver saldo_stock)
+
+SQL_CARGA = f"SELECT {', '.join(COLUMNAS_FEED)} FROM movimiento_kardex WHERE num_movimiento > %s ORDER BY num_movimiento;"
+
+
+class Diccionario:
+    """Codifica valores (ids, estados...) como enteros 0..n-1 en orden de aparición."""
+
+    def __init__(self):
+        self.valores: List[Any] = []
+        self._codigos: Dict[Any, int] = {}
+
+    def __len__(self) -> int:
+        return len(self.valores)
+
+    def codigo(self, valor: Any) -> int:
+        codigo = self._codigos.get(valor)
+        if codigo is None:
+            codigo = self._codigos[valor] = len(self.valores)
+            self.valores.append(valor)
+        return codigo
+
+    def buscar(self, valor: Any) -> int: # -1 si el valor nunca apareció: un filtro por él no coincide con nada
+        return self._codigos.get(valor, -1)
+
+    def codificar(self, valores: Sequence[Any]) -> np.ndarray:
+        # Solo los valores distintos del bloque pasan por el dict; el resto es indexado de NumPy
+        distintos, inversa = np.unique(np.array(["" if v is None else v for v in valores], dtype=object),
+                                       return_inverse=True)
+        codigos = np.array([self.codigo(None if v == "" else v) for v in distintos], dtype=np.int32)
+        return codigos[inversa.reshape(-1)]
+
+
+class KardexColumnar:
+    """movimiento_kardex en memoria como arreglos NumPy por columna.
+
+    Productos, lotes, entornos, estados y tipos se guardan como códigos
+    enteros (ver Diccionario) y cada movimiento trae su cantidad con signo
+    según el tipo, así cualquier stock agrupado es un np.bincount sobre
+    los códigos. Los movimientos nuevos se agregan con actualizar() sin
+    releer lo ya cargado. Seguro entre hilos.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.diccionarios = {dimension: Diccionario() for dimension in ("producto", "lote", "entorno", "estado", "tipo",
+                                                                        "tipo_producto", "operador")}
+        self._capacidad = 0
+        self.filas = 0
+        self._columnas: Dict[str, np.ndarray] = {}
+        self._reservar(1024)
+        # Atributos del producto, indexados por código de producto
+        self._tipo_producto = np.zeros(0, dtype=np.int32)
+        self._operador = np.zeros(0, dtype=np.int32)
+        self.marca = 0 # Mayor num_movimiento cargado
+        self._suscriptor: Optional[SuscriptorKardex] = None
+
+    def _reservar(self, adicionales: int) -> None:
+        # Crecimiento por duplicación: agregar n filas cuesta O(n) amortizado
+        necesarias = self.filas + adicionales
+        if necesarias <= self._capacidad:
+            return
+        capacidad = max(necesarias, self._capacidad * 2)
+        tipos = {"num": np.int64, "fecha": "datetime64[D]", "delta": np.int64, "producto": np.int32,
+                 "lote": np.int32, "entorno": np.int32, "estado": np.int32, "tipo": np.int32}
+        for columna, tipo in tipos.items():
+            nueva = np.empty(capacidad, dtype=tipo)
+            if columna in self._columnas:
+                nueva[:self.filas] = self._columnas[columna][:self.filas]
+            self._columnas[columna] = nueva
+        self._capacidad = capacidad
+
+    def _actualizar_atributos(self) -> None:
+        # Tipo y operador de los productos que todavía no los tienen (productos nuevos en el kardex)
+        productos = self.diccionarios["producto"]
+        conocidos = len(self._tipo_producto)
+        if conocidos == len(productos):
+            return
+        faltantes = productos.valores[conocidos:]
+        atributos: Dict[str, Tuple[Any, Any]] = {}
+        for inicio in range(0, len(faltantes), 500):
+            bloque = faltantes[inicio:inicio + 500]
+            marcadores = ", ".join(["%s"] * len(bloque))
+            for id_producto, tipo, operador in ejecutar_query(
+                    f"SELECT id_producto, tipo, operador FROM producto WHERE id_producto IN ({marcadores});",
+                    tuple(bloque)) or []:
+                atributos[id_producto] = (tipo, operador)
+        tipos = np.array([self.diccionarios["tipo_producto"].codigo(atributos.get(p, (None, None))[0]) for p in faltantes],
+                         dtype=np.int32)
+        operadores = np.array([self.diccionarios["operador"].codigo(atributos.get(p, (None, None))[1]) for p in faltantes],
+                              dtype=np.int32)
+        self._tipo_producto = np.concatenate([self._tipo_producto, tipos])
+        self._operador = np.concatenate([self._operador, operadores])
+
+    def agregar(self, filas: List[Tuple]) -> None:
+        """Agrega movimientos con las columnas de feed_kardex.COLUMNAS_FEED, en cualquier orden."""
+        if not filas:
+            return
+        num, fecha, tipo, producto, lote, cantidad, entorno, estado = zip(*filas)
+        with self._lock:
+            self._reservar(len(filas))
+            tramo = slice(self.filas, self.filas + len(filas))
+            columnas = self._columnas
+            columnas["num"][tramo] = num
+            columnas["fecha"][tramo] = np.array(fecha, dtype="datetime64[D]") # None queda como NaT
+            columnas["tipo"][tramo] = codigos_tipo = self.diccionarios["tipo"].codificar(tipo)
+            signos = np.array([SIGNO_POR_TIPO.get(valor, 0) for valor in self.diccionarios["tipo"].valores], dtype=np.int64)
+            columnas["delta"][tramo] = signos[codigos_tipo] * np.array([c or 0 for c in cantidad], dtype=np.int64)
+            columnas["producto"][tramo] = self.diccionarios["producto"].codificar(producto)
+            columnas["lote"][tramo] = self.diccionarios["lote"].codificar(lote)
+            columnas["entorno"][tramo] = self.diccionarios["entorno"].codificar(entorno)
+            columnas["estado"][tramo] = self.diccionarios["estado"].codificar(estado)
+            self.filas += len(filas)
+            self.marca = max(self.marca, max(num))
+            self._actualizar_atributos()
+
+    def cargar(self, tamano_lote: int = 50000) -> int:
+        """Lee todo el kardex (en streaming, sin lista intermedia completa). Devuelve las filas cargadas.
+
+        Si la lectura falla a mitad se relanza el error: con parte del kardex
+        las agregaciones darían resultados incorrectos. Lo ya cargado llega
+        hasta self.marca, así que volver a llamar a cargar() (o actualizar())
+        sigue desde ahí.
+        """
+        antes = self.filas
+        for bloque in iterar_query(SQL_CARGA, (self.marca,), tamano_lote, propagar_errores=True):
+            self.agregar(bloque)
+        self._suscriptor = SuscriptorKardex(desde=self.marca, tamano_lote=tamano_lote)
+        return self.filas - antes
+
+    def actualizar(self) -> int:
+        """Agrega los movimientos insertados desde la última carga o actualización."""
+        if self._suscriptor is None:
+            return self.cargar()
+        agregadas = 0
+        while True:
+            cambios = self._suscriptor.sondear()
+            self.agregar(cambios)
+            agregadas += len(cambios)
+            if len(cambios) < self._suscriptor.tamano_lote:
+                return agregadas
+
+    def _codigos(self, dimension: str) -> np.ndarray:
+        if dimension == "tipo_producto":
+            return self._tipo_producto[self._columnas["producto"][:self.filas]]
+        if dimension == "operador":
+            return self._operador[self._columnas["producto"][:self.filas]]
+        return self._columnas[dimension][:self.filas]
+
+    def _mascara(self, filtros: Dict[str, Any], fecha_desde: Optional[date], fecha_hasta: Optional[date]) -> Optional[np.ndarray]:
+        mascara = None
+        for dimension, valor in filtros.items():
+            if dimension not in DIMENSIONES:
+                raise ValueError(f"Dimensión desconocida: {dimension} (use {', '.join(DIMENSIONES)})")
+            condicion = self._codigos(dimension) == self.diccionarios[dimension].buscar(valor)
+            mascara = condicion if mascara is None else mascara & condicion
+        fechas = self._columnas["fecha"][:self.filas]
+        for limite, comparar in ((fecha_desde, np.greater_equal), (fecha_hasta, np.less_equal)):
+            if limite is not None:
+                condicion = comparar(fechas, np.datetime64(str(limite), "D")) # NaT nunca cumple
+                mascara = condicion if mascara is None else mascara & condicion
+        return mascara
+
+    def _agregar_por(self, pesos: Optional[str], agrupar_por: Sequence[str], filtros: Dict[str, Any],
+                     fecha_desde: Optional[date], fecha_hasta: Optional[date]) -> Dict[Any, int]:
+        for dimension in agrupar_por:
+            if dimension not in DIMENSIONES:
+                raise ValueError(f"Dimensión desconocida: {dimension} (use {', '.join(DIMENSIONES)})")
+        with self._lock:
+            mascara = self._mascara(filtros, fecha_desde, fecha_hasta)
+            valores = self._columnas["delta"][:self.filas] if pesos == "delta" else None
+            codigos = [self._codigos(dimension) for dimension in agrupar_por]
+            if mascara is not None:
+                codigos = [columna[mascara] for columna in codigos]
+                valores = valores[mascara] if valores is not None else None
+            if not agrupar_por:
+                total = int(valores.sum()) if valores is not None else int(mascara.sum() if mascara is not None else self.filas)
+                return {(): total}
+            if len(codigos) == 1:
+                claves_unicas, grupo = None, codigos[0]
+            else:
+                # Combinación de códigos -> un entero; np.unique la reduce a los grupos que existen
+                combinado = np.ravel_multi_index(codigos, [len(self.diccionarios[d]) for d in agrupar_por])
+                claves_unicas, grupo = np.unique(combinado, return_inverse=True)
+                grupo = grupo.reshape(-1)
+            sumas = np.bincount(grupo, weights=valores) if len(grupo) else np.zeros(0)
+            presentes = np.flatnonzero(np.bincount(grupo)) if len(grupo) else np.zeros(0, dtype=np.int64)
+            resultado: Dict[Any, int] = {}
+            for indice in presentes:
+                if claves_unicas is None:
+                    clave = self.diccionarios[agrupar_por[0]].valores[indice]
+                else:
+                    partes = np.unravel_index(claves_unicas[indice], [len(self.diccionarios[d]) for d in agrupar_por])
+                    clave = tuple(self.diccionarios[d].valores[int(p)] for d, p in zip(agrupar_por, partes))
+                resultado[clave] = int(round(sumas[indice])) # bincount suma en float64: exacto hasta 2**53
+            return resultado
+
+    def stock_por(self, *agrupar_por: str, fecha_desde: Optional[date] = None, fecha_hasta: Optional[date] = None,
+                  **filtros: Any) -> Dict[Any, int]:
+        """Stock (entradas menos salidas) por cada combinación de `agrupar_por`.
+
+        stock_por("producto"), stock_por("lote", "entorno", producto="DS0001"),
+        stock_por("operador", tipo_producto="SIM", fecha_hasta=date(2025, 6, 30)).
+        Con una sola dimensión la clave es el valor; con varias, una tupla.
+        Los filtros comparan por igualdad con cualquier dimensión.
+        """
+        return self._agregar_por("delta", agrupar_por, filtros, fecha_desde, fecha_hasta)
+
+    def contar_por(self, *agrupar_por: str, fecha_desde: Optional[date] = None, fecha_hasta: Optional[date] = None,
+                   **filtros: Any) -> Dict[Any, int]:
+        # Número de movimientos en lugar de unidades, p. ej. contar_por(estado="DAÑADO")
+        return self._agregar_por(None, agrupar_por, filtros, fecha_desde, fecha_hasta)
+
+    def stock_total(self, **filtros: Any) -> int:
+        return self.stock_por(**filtros)[()]
+
+    def memoria_bytes(self) -> int:
+        return sum(columna.nbytes for columna in self._columnas.values())
+
+def _medir(descripcion: str, funcion) -> Any:
+    inicio = time.perf_counter()
+    resultado = funcion()
+    print(f"{descripcion:<40} {(time.perf_counter() - inicio) * 1000:8.2f} ms  ({len(resultado)} grupos)")
+    return resultado
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Carga el kardex en memoria y responde agregaciones de stock.")
+    parser.add_argument("agrupar", nargs="*", choices=DIMENSIONES, help="Dimensiones del agrupamiento (por defecto, producto)")
+    parser.add_argument("--hasta", help="Stock al final de esta fecha YYYY-MM-DD")
+    parser.add_argument("--limite", type=int, default=20, help="Grupos a mostrar")
+    args = parser.parse_args()
+
+    kardex = KardexColumnar()
+    inicio = time.perf_counter()
+    try:
+        filas = kardex.cargar()
+    except ERRORES_CONSULTA as err:
+        print(f"❌ No se pudo cargar el kardex completo: {err}")
+        raise SystemExit(1)
+    print(f"Cargados {filas} movimientos en {time.perf_counter() - inicio:.2f} s "
+          f"({kardex.memoria_bytes() / 1024 / 1024:.1f} MB en arreglos)")
+    _medir("stock por producto", lambda: kardex.stock_por("producto"))
+    _medir("stock por (producto, lote, entorno)", lambda: kardex.stock_por("producto", "lote", "entorno"))
+    _medir("SIMs por operador", lambda: kardex.stock_por("operador", tipo_producto="SIM"))
+    _medir("movimientos DAÑADO", lambda: kardex.contar_por(estado="DAÑADO"))
+
+    grupos = kardex.stock_por(*(args.agrupar or ["producto"]), fecha_hasta=args.hasta)
+    for clave, stock in sorted(grupos.items(), key=lambda item: item[1], reverse=True)[:args.limite]:
+        print(f"  {clave}: {stock}")
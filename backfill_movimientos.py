@@ -0,0 +1,90 @@
+import sys
+import time
+from typing import Tuple
+
+from oficial import ejecutar_query, transaccion
+
+# Ids de texto que ya son un entero en forma canónica ('30', no '030' ni 'A-30')
+CONDICION_CANONICA = "num_movimiento REGEXP '^[1-9][0-9]*$'"
+
+def _rango_siguiente(ultimo: str, tamano_lote: int) -> Tuple[str, int]:
+    # Último id (texto) del bloque que empieza después de `ultimo`, y cuántos ids tiene
+    filas = ejecutar_query(
+        "SELECT num_movimiento FROM movimiento_kardex WHERE num_movimiento > %s "
+        "ORDER BY num_movimiento LIMIT %s;",
+        (ultimo, tamano_lote),
+    )
+    if filas is None:
+        raise RuntimeError("No se pudo leer el kardex")
+    if not filas:
+        return ultimo, 0
+    return filas[-1][0], len(filas)
+
+def copiar_ids_numericos(tamano_lote: int = 5000) -> int:
+    """Paso 1: copia los ids canónicos a num_movimiento_nuevo, bloque a bloque.
+
+    Cada bloque es un rango de la PK actual y se confirma en su propia
+    transacción, así que los bloqueos son cortos y el proceso puede
+    interrumpirse y reanudarse (las filas ya copiadas se saltan).
+    """
+    ultimo, total = "", 0
+    while True:
+        hasta, cantidad = _rango_siguiente(ultimo, tamano_lote)
+        if cantidad == 0:
+            return total
+        with transaccion() as cursor:
+            cursor.execute(
+                "UPDATE movimiento_kardex SET num_movimiento_nuevo = CAST(num_movimiento AS UNSIGNED) "
+                f"WHERE num_movimiento > %s AND num_movimiento <= %s AND {CONDICION_CANONICA} "
+                "AND num_movimiento_nuevo IS NULL;",
+                (ultimo, hasta),
+            )
+            total += cursor.rowcount
+        ultimo = hasta
+
+def asignar_ids_restantes(tamano_lote: int = 5000) -> int:
+    """Paso 2: numera los ids no numéricos a continuación del mayor ya asignado.
+
+    Se respeta el orden cronológico (fecha y luego id original) para que el
+    nuevo id siga siendo monótono respecto de la historia.
+    """
+    total = 0
+    while True:
+        with transaccion() as cursor:
+            cursor.execute(
+                "SELECT num_movimiento FROM movimiento_kardex WHERE num_movimiento_nuevo IS NULL "
+                "ORDER BY fecha, num_movimiento LIMIT %s FOR UPDATE;",
+                (tamano_lote,),
+            )
+            pendientes = [fila[0] for fila in cursor.fetchall()]
+            if not pendientes:
+                return total
+            # MAX sobre el índice único: una sola lectura del extremo del índice
+            cursor.execute("SELECT COALESCE(MAX(num_movimiento_nuevo), 0) FROM movimiento_kardex;")
+            base = int(cursor.fetchone()[0])
+            cursor.executemany(
+                "UPDATE movimiento_kardex SET num_movimiento_nuevo = %s WHERE num_movimiento = %s;",
+                [(base + i, num) for i, num in enumerate(pendientes, start=1)],
+            )
+            total += len(pendientes)
+
+def contar_pendientes() -> int:
+    resultado = ejecutar_query("SELECT COUNT(*) FROM movimiento_kardex WHERE num_movimiento_nuevo IS NULL;")
+    if resultado is None:
+        raise RuntimeError("No se pudo leer el kardex")
+    return int(resultado[0][0])
+
+if __name__ == "__main__":
+    argumentos = sys.argv[1:]
+    if "--verificar" in argumentos:
+        pendientes = contar_pendientes()
+        print(f"Movimientos sin id numérico: {pendientes}")
+        sys.exit(1 if pendientes else 0)
+
+    tamano_lote = int(argumentos[0]) if argumentos else 5000
+    inicio = time.perf_counter()
+    copiados = copiar_ids_numericos(tamano_lote)
+    print(f"Ids numéricos copiados: {copiados}")
+    asignados = asignar_ids_restantes(tamano_lote)
+    print(f"Ids no numéricos renumerados: {asignados}")
+    print(f"Backfill completado en {time.perf_counter() - inicio:.1f} s. Pendientes: {contar_pendientes()}")
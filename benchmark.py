@@ -0,0 +1,196 @@
+import argparse
+import json
+import os
+import platform
+import random
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+import oficial
+import motores_bd
+import resumen_diario
+import cierres_stock
+from generador_datos import CatalogoSintetico, cargar_catalogo, cargar_movimientos, iterar_movimientos
+
+TAMANOS_POR_DEFECTO = [10_000, 100_000, 1_000_000]
+
+def percentil(valores_ordenados: List[float], p: float) -> float:
+    # Percentil con interpolación lineal (igual que numpy.percentile por defecto)
+    if not valores_ordenados:
+        return 0.0
+    posicion = (len(valores_ordenados) - 1) * p / 100
+    abajo = int(posicion)
+    arriba = min(abajo + 1, len(valores_ordenados) - 1)
+    return valores_ordenados[abajo] + (valores_ordenados[arriba] - valores_ordenados[abajo]) * (posicion - abajo)
+
+def _contar_filas(resultado: Any) -> int:
+    if resultado is None:
+        return 0
+    if isinstance(resultado, list): # Listado de filas; los demás resultados son una fila o un escalar
+        return len(resultado)
+    return 1
+
+def consultas_a_medir(catalogo: CatalogoSintetico, dias_cargados: int, semilla: int) -> List[Tuple[str, Callable[[], Any]]]:
+    """Funciones públicas de oficial.py con argumentos tomados del catálogo sintético.
+
+    Cada repetición elige otro producto, lote o fecha (de forma determinista)
+    para no medir siempre la misma fila caliente.
+    """
+    rng = random.Random(semilla + 2)
+    lotes = catalogo.lotes
+    entornos = [fila[0] for fila in catalogo.entornos]
+
+    def producto():
+        return rng.choice(catalogo.productos)[0]
+
+    def fecha():
+        return str(catalogo.fecha_inicio + timedelta(days=rng.randrange(max(dias_cargados, 1))))
+
+    def lote_con_entorno():
+        indice = rng.randrange(len(lotes))
+        return lotes[indice][1], lotes[indice][0], catalogo.entorno_de_lote[indice]
+
+    def detalles_sin_cache():
+        oficial.invalidar_cache_productos() # Se mide la consulta, no el acierto de la cache
+        return oficial.obtener_detalles_producto(producto())
+
+    def sim_sin_cache(funcion, *args):
+        oficial.cache_sim.limpiar() # Igual que detalles_sin_cache: se mide la consulta agrupada
+        return funcion(*args)
+
+    def rango_semanal():
+        desde = fecha()
+        hasta = str(datetime.strptime(desde, "%Y-%m-%d").date() + timedelta(days=6))
+        return resumen_diario.obtener_resumen_movimientos(desde, hasta, refrescar=False)
+
+    return [
+        ("obtener_detalles_producto", detalles_sin_cache),
+        ("obtener_stock", lambda: oficial.obtener_stock(producto())),
+        ("obtener_stock_producto_lote", lambda: oficial.obtener_stock_producto_lote(*lote_con_entorno())),
+        ("producto_entorno", lambda: oficial.producto_entorno(rng.choice(entornos))),
+        ("obtener_stock_producto_desglosado_por_lote", lambda: oficial.obtener_stock_producto_desglosado_por_lote(producto())),
+        ("cantidad_productos_dañados", oficial.cantidad_productos_dañados),
+        ("obtener_stock_por_entorno", oficial.obtener_stock_por_entorno),
+        ("obtener_sim_total", lambda: sim_sin_cache(oficial.obtener_sim_total)),
+        ("obtener_sim_de_operador", lambda: sim_sin_cache(oficial.obtener_sim_de_operador, rng.choice(oficial.OPERADORES))),
+        ("obtener_sim_por_operador", lambda: sim_sin_cache(oficial.obtener_sim_por_operador)),
+        ("obtener_detalles_entradas_en_un_dia", lambda: oficial.obtener_detalles_entradas_en_un_dia(fecha())),
+        ("obtener_detalles_salidas_en_un_dia", lambda: oficial.obtener_detalles_salidas_en_un_dia(fecha())),
+        ("obtener_stock_todos_productos", oficial.obtener_stock_todos_productos),
+        ("obtener_resumen_movimientos (7 días)", rango_semanal),
+        ("obtener_stock_many (200 ids)", lambda: oficial.obtener_stock_many(producto() for _ in range(200))),
+        ("obtener_stock_lotes_many (200 lotes)", lambda: oficial.obtener_stock_lotes_many(lote_con_entorno() for _ in range(200))),
+        ("obtener_stock_a_fecha", lambda: cierres_stock.obtener_stock_a_fecha(producto(), fecha())),
+    ]
+
+def medir(funcion: Callable[[], Any], repeticiones: int, calentamiento: int = 2) -> Dict[str, float]:
+    for _ in range(calentamiento):
+        funcion()
+    tiempos, filas = [], 0
+    for _ in range(repeticiones):
+        inicio = time.perf_counter()
+        resultado = funcion()
+        tiempos.append(time.perf_counter() - inicio)
+        filas += _contar_filas(resultado)
+    tiempos.sort()
+    total = sum(tiempos)
+    return {
+        "repeticiones": repeticiones,
+        "p50_ms": percentil(tiempos, 50) * 1000,
+        "p95_ms": percentil(tiempos, 95) * 1000,
+        "p99_ms": percentil(tiempos, 99) * 1000,
+        "media_ms": total / repeticiones * 1000,
+        "filas": filas,
+        "filas_por_segundo": filas / total if total > 0 else 0.0,
+    }
+
+def _version_codigo() -> Optional[str]:
+    try:
+        return subprocess.run(["git", "describe", "--always", "--dirty"], capture_output=True, text=True,
+                              cwd=os.path.dirname(os.path.abspath(__file__)), check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+def ejecutar_benchmark(tamanos: List[int], repeticiones: int = 30, semilla: int = 42, productos: int = 1000,
+                       movimientos_por_dia: int = 2000) -> Dict[str, Any]:
+    """Carga el conjunto sintético por tramos y mide cada consulta al llegar a cada tamaño.
+
+    Usa la base configurada en oficial (ver configurar_motor), que debe
+    estar vacía de datos sintéticos: el catálogo se inserta al empezar.
+    """
+    catalogo = CatalogoSintetico(semilla, productos)
+    cargar_catalogo(catalogo)
+    flujo = iterar_movimientos(catalogo, semilla, movimientos_por_dia)
+    cargados = 0
+    resultados = []
+    for tamano in sorted(tamanos):
+        inicio = time.perf_counter()
+        cargados += cargar_movimientos(flujo, tamano - cargados)
+        resumen_diario.refrescar_resumen_diario()
+        cierres_stock.crear_cierres_mensuales(catalogo.fecha_inicio + timedelta(days=cargados // movimientos_por_dia),
+                                              espera=0) # La carga ya terminó: no hay números pendientes
+        print(f"--- {cargados} movimientos (carga: {time.perf_counter() - inicio:.1f} s) ---")
+        dias = cargados // movimientos_por_dia + 1
+        for nombre, funcion in consultas_a_medir(catalogo, dias, semilla):
+            metricas = medir(funcion, repeticiones)
+            resultados.append({"tamano": cargados, "funcion": nombre, **metricas})
+            print(f"{nombre:<45} p50 {metricas['p50_ms']:9.2f} ms  p95 {metricas['p95_ms']:9.2f} ms  "
+                  f"p99 {metricas['p99_ms']:9.2f} ms  {metricas['filas_por_segundo']:12.0f} filas/s")
+    return {
+        "version": _version_codigo(),
+        "fecha": datetime.now().isoformat(timespec="seconds"),
+        "motor": oficial.motor.descripcion(),
+        "python": platform.python_version(),
+        "semilla": semilla,
+        "productos": productos,
+        "repeticiones": repeticiones,
+        "resultados": resultados,
+    }
+
+def comparar(anterior: Dict[str, Any], actual: Dict[str, Any], tolerancia: float = 1.2) -> List[str]:
+    # Consultas cuyo p95 empeoró más que `tolerancia` veces respecto de una corrida anterior
+    previos = {(r["tamano"], r["funcion"]): r for r in anterior["resultados"]}
+    regresiones = []
+    for r in actual["resultados"]:
+        previo = previos.get((r["tamano"], r["funcion"]))
+        if previo and previo["p95_ms"] > 0 and r["p95_ms"] > previo["p95_ms"] * tolerancia:
+            regresiones.append(f"{r['funcion']} @ {r['tamano']}: p95 {previo['p95_ms']:.2f} -> {r['p95_ms']:.2f} ms "
+                               f"(x{r['p95_ms'] / previo['p95_ms']:.2f})")
+    return regresiones
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Mide la latencia de las consultas de oficial.py a distintos volúmenes.")
+    parser.add_argument("--tamanos", type=int, nargs="+", default=TAMANOS_POR_DEFECTO, help="Movimientos en el kardex para cada medición")
+    parser.add_argument("--repeticiones", type=int, default=30)
+    parser.add_argument("--productos", type=int, default=1000)
+    parser.add_argument("--semilla", type=int, default=42)
+    parser.add_argument("--salida", default="benchmark.json", help="Archivo JSON con los resultados")
+    parser.add_argument("--comparar", help="JSON de una corrida anterior para detectar regresiones")
+    parser.add_argument("--tolerancia", type=float, default=1.2, help="Cuántas veces puede crecer el p95 antes de marcar regresión")
+    parser.add_argument("--usar-bd-configurada", action="store_true",
+                        help="Medir contra la base de BD_MOTOR en lugar de una SQLite temporal (¡inserta datos!)")
+    args = parser.parse_args()
+
+    if not args.usar_bd_configurada:
+        ruta = os.path.join(tempfile.mkdtemp(prefix="benchmark_bd_"), "benchmark.sqlite3")
+        oficial.configurar_motor(motores_bd.MotorSQLite(ruta, datos_ejemplo=False))
+        print(f"Usando una base SQLite temporal en {ruta}")
+
+    informe = ejecutar_benchmark(args.tamanos, args.repeticiones, args.semilla, args.productos)
+    with open(args.salida, "w", encoding="utf-8") as archivo:
+        json.dump(informe, archivo, indent=2, ensure_ascii=False)
+    print(f"Resultados guardados en {args.salida}")
+
+    if args.comparar:
+        with open(args.comparar, encoding="utf-8") as archivo:
+            regresiones = comparar(json.load(archivo), informe, args.tolerancia)
+        if regresiones:
+            print("Regresiones respecto de la corrida anterior:")
+            for linea in regresiones:
+                print(f"  {linea}")
+            sys.exit(1)
+        print("Sin regresiones respecto de la corrida anterior.")
@@ -0,0 +1,69 @@
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Hashable, Optional, Tuple
+
+
+class CacheLRU:
+    """Cache en memoria de tamaño acotado con expiración por tiempo (TTL).
+
+    Al llenarse descarta la entrada usada hace más tiempo. Es segura para
+    usarse desde varios hilos (la GUI y el menú comparten el mismo proceso).
+    """
+
+    def __init__(self, tamano_maximo: int = 1000, ttl: Optional[float] = 300.0):
+        if tamano_maximo < 1:
+            raise ValueError("El tamaño máximo de la cache debe ser al menos 1")
+        self.tamano_maximo = tamano_maximo
+        self.ttl = ttl
+        self._datos: "OrderedDict[Hashable, Tuple[Any, float]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._aciertos = 0
+        self._fallos = 0
+        self._desalojos = 0
+        self._expiraciones = 0
+
+    def obtener(self, clave: Hashable) -> Tuple[bool, Any]:
+        """Devuelve (encontrado, valor); un valor expirado cuenta como fallo."""
+        with self._lock:
+            entrada = self._datos.get(clave)
+            if entrada is not None:
+                valor, vence = entrada
+                if vence >= time.monotonic():
+                    self._datos.move_to_end(clave)
+                    self._aciertos += 1
+                    return True, valor
+                del self._datos[clave]
+                self._expiraciones += 1
+            self._fallos += 1
+            return False, None
+
+    def guardar(self, clave: Hashable, valor: Any) -> None:
+        vence = time.monotonic() + self.ttl if self.ttl is not None else float("inf")
+        with self._lock:
+            self._datos[clave] = (valor, vence)
+            self._datos.move_to_end(clave)
+            while len(self._datos) > self.tamano_maximo:
+                self._datos.popitem(last=False)
+                self._desalojos += 1
+
+    def invalidar(self, clave: Hashable) -> bool:
+        with self._lock:
+            return self._datos.pop(clave, None) is not None
+
+    def limpiar(self) -> None:
+        with self._lock:
+            self._datos.clear()
+
+    def estadisticas(self) -> Dict[str, Any]:
+        with self._lock:
+            consultas = self._aciertos + self._fallos
+            return {
+                "entradas": len(self._datos),
+                "tamano_maximo": self.tamano_maximo,
+                "aciertos": self._aciertos,
+                "fallos": self._fallos,
+                "desalojos": self._desalojos,
+                "expiraciones": self._expiraciones,
+                "tasa_aciertos": self._aciertos / consultas if consultas else 0.0,
+            }
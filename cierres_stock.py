@@ -0,0 +1,202 @@
+import argparse
+import calendar
+import os
+import time
+from datetime import date, datetime
+from typing import Any, List, Optional, Tuple
+
+from oficial import ejecutar_query, transaccion
+
+# Efecto de un movimiento sobre el saldo, igual que en los triggers de saldo_stock
+SQL_DELTA = "CASE tipo_movimiento WHEN 'ENTRADA' THEN cantidad WHEN 'SALIDA' THEN -cantidad ELSE 0 END"
+TIPOS_CON_EFECTO = "tipo_movimiento IN ('ENTRADA', 'SALIDA')"
+
+# Segundos entre leer el último num_movimiento y usarlo como tope de un cierre. En MySQL un
+# AUTO_INCREMENT se asigna al insertar pero la fila se ve al confirmar: una carga en curso puede
+# tener un número menor que todavía no aparece. Pasado este tiempo (mayor que la transacción de
+# escritura más larga) esos números ya son visibles o no van a aparecer.
+ESPERA_CIERRE = float(os.environ.get("BD_CIERRE_ESPERA", "60"))
+
+def _saldos_desde_corte(fecha: str, corte: Optional[Tuple[str, int]], filtros: List[Tuple[str, Any]],
+                        hasta_movimiento: Optional[int] = None) -> Tuple[str, List[Any]]:
+    """Subconsulta con las filas (id_producto, id_lote, id_entorno, cantidad) que suman el saldo a `fecha`.
+
+    Son el cierre `corte` (fecha_corte, ultimo_movimiento), los movimientos
+    con fecha entre el corte y `fecha`, y los cargados después del cierre
+    con una fecha anterior a él. Sin corte se suman todos los movimientos
+    hasta `fecha`. Los movimientos sin fecha no entran en ningún saldo histórico.
+    """
+    extra = "".join(f" AND {columna} = %s" for columna, _ in filtros)
+    valores = [valor for _, valor in filtros]
+    # Al crear un cierre: solo los movimientos que ya estaban cargados al empezar
+    tope = "" if hasta_movimiento is None else " AND num_movimiento <= %s"
+    valores_tope = [] if hasta_movimiento is None else [hasta_movimiento]
+
+    if corte is None:
+        sql = (f"SELECT id_producto, id_lote, id_entorno, {SQL_DELTA} AS cantidad FROM movimiento_kardex "
+               f"WHERE {TIPOS_CON_EFECTO} AND fecha <= %s{tope}{extra}")
+        return sql, [fecha, *valores_tope, *valores]
+
+    fecha_corte, ultimo_movimiento = corte
+    sql = (f"SELECT id_producto, id_lote, id_entorno, cantidad FROM cierre_stock WHERE fecha_corte = %s{extra} "
+           f"UNION ALL "
+           f"SELECT id_producto, id_lote, id_entorno, {SQL_DELTA} FROM movimiento_kardex "
+           f"WHERE {TIPOS_CON_EFECTO} AND fecha > %s AND fecha <= %s{tope}{extra} "
+           f"UNION ALL "
+           f"SELECT id_producto, id_lote, id_entorno, {SQL_DELTA} FROM movimiento_kardex "
+           f"WHERE {TIPOS_CON_EFECTO} AND num_movimiento > %s AND fecha <= %s{tope}{extra}")
+    params = [fecha_corte, *valores,
+              fecha_corte, fecha, *valores_tope, *valores,
+              ultimo_movimiento, fecha_corte, *valores_tope, *valores]
+    return sql, params
+
+def obtener_corte_anterior(fecha: str) -> Optional[Tuple[str, int]]: # Cierre más reciente con fecha_corte <= fecha
+    resultado = ejecutar_query(
+        "SELECT fecha_corte, ultimo_movimiento FROM cierre_stock_corte WHERE fecha_corte <= %s "
+        "ORDER BY fecha_corte DESC LIMIT 1;", (fecha,))
+    if not resultado:
+        return None
+    return str(resultado[0][0]), int(resultado[0][1])
+
+def consulta_saldos_a_fecha(fecha: str, id_producto: Optional[str] = None,
+                            id_entorno: Optional[str] = None) -> Tuple[str, tuple]:
+    # (query, params) de obtener_saldos_a_fecha, para leerla también en streaming (ver exportacion.py)
+    fecha = str(fecha)
+    filtros = [(columna, valor) for columna, valor in (("id_producto", id_producto), ("id_entorno", id_entorno)) if valor]
+    subconsulta, params = _saldos_desde_corte(fecha, obtener_corte_anterior(fecha), filtros)
+    query = (f"SELECT id_producto, id_lote, id_entorno, SUM(cantidad) FROM ({subconsulta}) AS saldos "
+             f"GROUP BY id_producto, id_lote, id_entorno HAVING SUM(cantidad) <> 0 "
+             f"ORDER BY id_producto, id_lote, id_entorno;")
+    return query, tuple(params)
+
+def obtener_saldos_a_fecha(fecha: str, id_producto: Optional[str] = None,
+                           id_entorno: Optional[str] = None) -> List[Tuple[str, str, str, int]]:
+    """Saldo por (producto, lote, entorno) al final de `fecha`, sin los que quedaron en cero."""
+    resultados = ejecutar_query(*consulta_saldos_a_fecha(fecha, id_producto, id_entorno))
+    if not resultados:
+        return []
+    return [(id_producto, id_lote, id_entorno, int(cantidad)) for id_producto, id_lote, id_entorno, cantidad in resultados]
+
+def obtener_stock_a_fecha(id_producto: str, fecha: str) -> int: # obtener_stock tal como estaba al final de `fecha`
+    fecha = str(fecha)
+    subconsulta, params = _saldos_desde_corte(fecha, obtener_corte_anterior(fecha), [("id_producto", id_producto)])
+    resultado = ejecutar_query(f"SELECT SUM(cantidad) FROM ({subconsulta}) AS saldos;", tuple(params))
+    if resultado and resultado[0] and resultado[0][0] is not None:
+        return int(resultado[0][0])
+    return 0
+
+def marca_estable(espera: float = ESPERA_CIERRE) -> int:
+    """Último num_movimiento, devuelto después de esperar `espera` segundos.
+
+    Todo movimiento con un número menor o igual que se confirme después de
+    leerlo quedaría fuera del cierre y también de la consulta a fecha (que
+    solo suma los posteriores a ultimo_movimiento): la espera deja que las
+    transacciones que ya tenían su número terminen antes de usarlo.
+    """
+    resultado = ejecutar_query("SELECT COALESCE(MAX(num_movimiento), 0) FROM movimiento_kardex;")
+    if resultado is None:
+        raise RuntimeError("No se pudo leer el último movimiento del kardex")
+    if espera > 0:
+        time.sleep(espera)
+    return int(resultado[0][0])
+
+def crear_cierre(fecha_corte: str, ultimo_movimiento: Optional[int] = None) -> int:
+    """Guarda los saldos al final de `fecha_corte` partiendo del cierre anterior. Devuelve las filas guardadas.
+
+    Incluye los movimientos hasta `ultimo_movimiento`, que por defecto
+    es marca_estable() (espera ESPERA_CIERRE segundos). Si ya existía un
+    cierre en esa fecha se reemplaza; los cierres posteriores no se
+    recalculan (para eso está reconstruir_cierres()).
+    """
+    fecha_corte = str(fecha_corte)
+    if ultimo_movimiento is None:
+        ultimo_movimiento = marca_estable()
+    with transaccion() as cursor:
+        cursor.execute(
+            "SELECT fecha_corte, ultimo_movimiento FROM cierre_stock_corte WHERE fecha_corte < %s "
+            "ORDER BY fecha_corte DESC LIMIT 1;", (fecha_corte,))
+        fila = cursor.fetchone()
+        anterior = (str(fila[0]), int(fila[1])) if fila else None
+
+        subconsulta, params = _saldos_desde_corte(fecha_corte, anterior, [], hasta_movimiento=ultimo_movimiento)
+        cursor.execute("DELETE FROM cierre_stock WHERE fecha_corte = %s;", (fecha_corte,))
+        cursor.execute("DELETE FROM cierre_stock_corte WHERE fecha_corte = %s;", (fecha_corte,))
+        cursor.execute(
+            f"INSERT INTO cierre_stock (fecha_corte, id_producto, id_lote, id_entorno, cantidad) "
+            f"SELECT %s, id_producto, id_lote, id_entorno, SUM(cantidad) FROM ({subconsulta}) AS saldos "
+            f"GROUP BY id_producto, id_lote, id_entorno HAVING SUM(cantidad) <> 0;",
+            (fecha_corte, *params))
+        filas = cursor.rowcount
+        cursor.execute(
+            "INSERT INTO cierre_stock_corte (fecha_corte, ultimo_movimiento, creado) VALUES (%s, %s, NOW());",
+            (fecha_corte, ultimo_movimiento))
+    return filas
+
+def _fin_de_mes(anio: int, mes: int) -> date:
+    return date(anio, mes, calendar.monthrange(anio, mes)[1])
+
+def crear_cierres_mensuales(hasta: Optional[date] = None, espera: float = ESPERA_CIERRE) -> List[date]:
+    """Crea el cierre de cada mes terminado antes de `hasta` (hoy por defecto) que todavía no lo tenga.
+
+    Empieza por el mes siguiente al último cierre o, si no hay ninguno, por
+    el mes del primer movimiento. Devuelve las fechas de corte creadas.
+    Todos usan el mismo tope, leído una vez con marca_estable(espera): con
+    espera=0 solo es seguro si no hay cargas en curso.
+    """
+    hasta = hasta or date.today()
+    ultimo = ejecutar_query("SELECT MAX(fecha_corte) FROM cierre_stock_corte;")
+    if ultimo and ultimo[0][0] is not None:
+        desde = datetime.strptime(str(ultimo[0][0]), "%Y-%m-%d").date()
+        anio, mes = (desde.year + 1, 1) if desde.month == 12 else (desde.year, desde.month + 1)
+    else:
+        primero = ejecutar_query("SELECT MIN(fecha) FROM movimiento_kardex;")
+        if not primero or primero[0][0] is None:
+            return []
+        desde = datetime.strptime(str(primero[0][0]), "%Y-%m-%d").date()
+        anio, mes = desde.year, desde.month
+
+    creados = []
+    ultimo_movimiento = marca_estable(espera) if _fin_de_mes(anio, mes) < hasta else 0
+    while _fin_de_mes(anio, mes) < hasta:
+        fecha_corte = _fin_de_mes(anio, mes)
+        crear_cierre(str(fecha_corte), ultimo_movimiento)
+        creados.append(fecha_corte)
+        anio, mes = (anio + 1, 1) if mes == 12 else (anio, mes + 1)
+    return creados
+
+def reconstruir_cierres(hasta: Optional[date] = None, espera: float = ESPERA_CIERRE) -> List[date]:
+    # Necesario si se modificaron o borraron movimientos anteriores a algún cierre
+    with transaccion() as cursor:
+        cursor.execute("DELETE FROM cierre_stock;")
+        cursor.execute("DELETE FROM cierre_stock_corte;")
+    return crear_cierres_mensuales(hasta, espera)
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Cierres mensuales de stock y consultas de stock a una fecha.")
+    subcomandos = parser.add_subparsers(dest="comando", required=True)
+    crear = subcomandos.add_parser("crear", help="Crea los cierres de los meses terminados que falten")
+    crear.add_argument("--fecha", help="Crear (o rehacer) un único cierre en esta fecha YYYY-MM-DD")
+    reconstruir = subcomandos.add_parser("reconstruir", help="Borra y recalcula todos los cierres")
+    for subcomando in (crear, reconstruir):
+        subcomando.add_argument("--espera", type=float, default=ESPERA_CIERRE,
+                                help="Segundos a esperar antes de fijar el último movimiento incluido (0 sin cargas en curso)")
+    consulta = subcomandos.add_parser("consultar", help="Stock al final de una fecha")
+    consulta.add_argument("fecha", help="Fecha YYYY-MM-DD")
+    consulta.add_argument("--producto")
+    consulta.add_argument("--entorno")
+    args = parser.parse_args()
+
+    if args.comando == "crear":
+        if args.fecha:
+            print(f"Cierre del {args.fecha} creado con {crear_cierre(args.fecha, marca_estable(args.espera))} saldos.")
+        else:
+            creados = crear_cierres_mensuales(espera=args.espera)
+            print(f"Cierres creados: {', '.join(map(str, creados)) if creados else 'ninguno (ya estaban al día)'}")
+    elif args.comando == "reconstruir":
+        print(f"Cierres recalculados: {len(reconstruir_cierres(espera=args.espera))}")
+    else:
+        filas = obtener_saldos_a_fecha(args.fecha, args.producto, args.entorno)
+        if not filas:
+            print(f"No había stock al {args.fecha}.")
+        for id_producto, id_lote, id_entorno, cantidad in filas:
+            print(f"{id_producto:<8} {id_lote:<12} {id_entorno:<12} {cantidad:>8}")
@@ -1,12 +1,7 @@
-import mysql.connector
+from oficial import motor
 
-# Establecer conexión
-conexion = mysql.connector.connect(
-    host="localhost",         # O dirección IP del servidor
-    user="root",
-    password="Pata2021.",
-    database="BD_proyecto"
-)
+# Establecer conexión (MySQL o SQLite según la variable BD_MOTOR)
+conexion = motor.conectar()
 
 # Crear cursor para ejecutar queries
 cursor = conexion.cursor()
@@ -0,0 +1,138 @@
+import argparse
+import os
+import random
+import time
+from datetime import date, datetime
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+from oficial import DatabaseError, cache_sim, transaccion
+from motores_bd import es_conflicto_de_bloqueo
+from ingesta_movimientos import COLUMNAS, ESTADOS, SQL_INSERTAR_MOVIMIENTO, TIPOS_MOVIMIENTO
+
+REINTENTOS_BLOQUEO = int(os.environ.get("BD_REINTENTOS_BLOQUEO", "5"))
+ESPERA_BASE_REINTENTO = 0.05 # Segundos; se duplica en cada reintento, con variación aleatoria
+
+ClaveSaldo = Tuple[str, str, str] # (id_producto, id_lote, id_entorno)
+
+# Bloquea la fila del lote hasta el fin de la transacción. Es la que serializa los despachos:
+# las filas de saldo_stock pueden no existir todavía (la primera salida de un lote en un
+# entorno) y un FOR UPDATE sin filas no bloquea nada. Otro despacho del mismo lote espera
+# aquí; los de otros lotes siguen de largo.
+SQL_BLOQUEAR_LOTE = "SELECT id_lote FROM lote WHERE id_lote = %s FOR UPDATE;"
+
+# Saldo del lote en el entorno (una fila por estado), leído con el lote ya bloqueado
+SQL_LEER_SALDO = """
+SELECT cantidad
+FROM saldo_stock
+WHERE id_producto = %s AND id_lote = %s AND id_entorno = %s
+FOR UPDATE;
+"""
+
+
+class StockInsuficiente(Exception):
+    """Una SALIDA pide más unidades de las que tiene el lote en ese entorno."""
+
+    def __init__(self, clave: ClaveSaldo, disponible: int, pedido: int):
+        super().__init__(f"Stock insuficiente para {clave[0]} lote {clave[1]} en {clave[2]}: "
+                         f"hay {disponible}, se piden {pedido}")
+        self.clave = clave
+        self.disponible = disponible
+        self.pedido = pedido
+
+
+def _normalizar(movimiento: Dict[str, Any]) -> tuple:
+    # Mismas reglas que CatalogoValidacion, sin cargar catálogos: las FK las comprueba la BD
+    tipo = str(movimiento["tipo_movimiento"]).strip().upper()
+    if tipo not in TIPOS_MOVIMIENTO:
+        raise ValueError(f"tipo_movimiento inválido: {movimiento['tipo_movimiento']}")
+    estado = movimiento.get("estado_post_movimiento")
+    estado = str(estado).strip().upper() if estado else None
+    if estado is not None and estado not in ESTADOS:
+        raise ValueError(f"estado_post_movimiento inválido: {estado}")
+    cantidad = int(movimiento["cantidad"])
+    if cantidad <= 0:
+        raise ValueError(f"cantidad debe ser positiva: {movimiento['cantidad']}")
+    fecha = movimiento.get("fecha") or date.today()
+    if not isinstance(fecha, date):
+        fecha = datetime.strptime(str(fecha).strip(), "%Y-%m-%d").date()
+    return (fecha, tipo, str(movimiento["id_producto"]).strip(), str(movimiento["id_lote"]).strip(),
+            cantidad, str(movimiento["id_entorno"]).strip(), estado)
+
+def _registrar_en_transaccion(filas: List[tuple]) -> List[int]:
+    with transaccion() as cursor:
+        # Solo las SALIDA descuentan saldo (igual que los triggers). Los lotes se bloquean
+        # siempre en el mismo orden, así dos despachos con varios lotes no se cruzan.
+        salidas = sorted({(fila[2], fila[3], fila[5]) for fila in filas if fila[1] == "SALIDA"})
+        for id_lote in sorted({clave[1] for clave in salidas}):
+            cursor.execute(SQL_BLOQUEAR_LOTE, (id_lote,))
+            cursor.fetchall()
+        disponible: Dict[ClaveSaldo, int] = {}
+        for clave in salidas:
+            cursor.execute(SQL_LEER_SALDO, clave)
+            disponible[clave] = sum(int(cantidad) for (cantidad,) in cursor.fetchall())
+        for fila in filas: # En orden: una ENTRADA previa del mismo lote cuenta para las salidas siguientes
+            clave = (fila[2], fila[3], fila[5])
+            if fila[1] == "ENTRADA" and clave in disponible:
+                disponible[clave] += fila[4]
+            elif fila[1] == "SALIDA":
+                if fila[4] > disponible[clave]:
+                    raise StockInsuficiente(clave, disponible[clave], fila[4])
+                disponible[clave] -= fila[4]
+        numeros = []
+        for fila in filas:
+            cursor.execute(SQL_INSERTAR_MOVIMIENTO, fila)
+            numeros.append(cursor.lastrowid)
+        return numeros
+
+def registrar_movimientos(movimientos: Iterable[Dict[str, Any]], reintentos: int = REINTENTOS_BLOQUEO) -> List[int]:
+    """Registra varios movimientos en una sola transacción corta; todos o ninguno.
+
+    Cada movimiento es un dict con las claves de COLUMNAS (la fecha es hoy
+    si falta). Antes de insertar se bloquea cada lote con SALIDA, se lee su
+    saldo y se rechaza con StockInsuficiente cualquier salida que lo deje negativo.
+    Un deadlock o una espera de bloqueo agotada deshace la transacción, que
+    se repite hasta `reintentos` veces. Devuelve los num_movimiento asignados.
+    """
+    filas = [_normalizar(movimiento) for movimiento in movimientos]
+    if not filas:
+        return []
+    intento = 0
+    while True:
+        try:
+            numeros = _registrar_en_transaccion(filas)
+            cache_sim.limpiar() # Ya confirmado: el stock de SIMs cacheado quedó viejo
+            return numeros
+        except DatabaseError as err:
+            if intento >= reintentos or not es_conflicto_de_bloqueo(err):
+                raise
+            time.sleep(ESPERA_BASE_REINTENTO * (2 ** intento) * random.uniform(0.5, 1.5))
+            intento += 1
+
+def registrar_movimiento(tipo_movimiento: str, id_producto: str, id_lote: str, cantidad: int, id_entorno: str,
+                         estado_post_movimiento: Optional[str] = None, fecha: Optional[date] = None) -> int:
+    valores = (fecha, tipo_movimiento, id_producto, id_lote, cantidad, id_entorno, estado_post_movimiento)
+    return registrar_movimientos([dict(zip(COLUMNAS, valores))])[0]
+
+def registrar_salida(id_producto: str, id_lote: str, id_entorno: str, cantidad: int,
+                     estado_post_movimiento: Optional[str] = None, fecha: Optional[date] = None) -> int:
+    return registrar_movimiento("SALIDA", id_producto, id_lote, cantidad, id_entorno, estado_post_movimiento, fecha)
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Registra un movimiento controlando el stock del lote.")
+    parser.add_argument("tipo", choices=sorted(TIPOS_MOVIMIENTO))
+    parser.add_argument("producto")
+    parser.add_argument("lote")
+    parser.add_argument("entorno")
+    parser.add_argument("cantidad", type=int)
+    parser.add_argument("--estado", choices=sorted(ESTADOS))
+    parser.add_argument("--fecha", help="YYYY-MM-DD (por defecto, hoy)")
+    args = parser.parse_args()
+
+    try:
+        numero = registrar_movimiento(args.tipo, args.producto, args.lote, args.cantidad, args.entorno,
+                                      args.estado, args.fecha)
+        print(f"Movimiento {numero} registrado.")
+    except (StockInsuficiente, ValueError) as err:
+        print(f"❌ {err}")
+    except DatabaseError as err:
+        print(f"❌ No se pudo registrar el movimiento: {err}")
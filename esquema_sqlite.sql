@@ -0,0 +1,166 @@
+-- Esquema para el motor SQLite (BD_MOTOR=sqlite): trabah_actualizado.sql con
+-- las migraciones 001, 002, 004, 005, 006, 007 y 008 ya aplicadas. La 003 no tiene
+-- equivalente (SQLite no particiona tablas).
+-- Diferencias de dialecto:
+--   * ENUM(...)  ->  TEXT con CHECK sobre los mismos valores. Ojo: MySQL ordena
+--     un ENUM por la posición del valor en la lista, SQLite por el texto.
+--   * BIGINT UNSIGNED AUTO_INCREMENT  ->  INTEGER PRIMARY KEY AUTOINCREMENT.
+--   * ON DUPLICATE KEY UPDATE de los triggers  ->  ON CONFLICT ... DO UPDATE.
+-- motores_bd.py lo ejecuta al crear una base nueva.
+
+CREATE TABLE entorno_almacenamiento (
+    id_entorno VARCHAR(10) PRIMARY KEY NOT NULL,
+    nombre VARCHAR(100),
+    ubicacion_fisica VARCHAR(100),
+    temperatura_min DECIMAL(5,2),
+    temperatura_max DECIMAL(5,2),
+    humedad_min DECIMAL(5,2),
+    humedad_max DECIMAL(5,2),
+    ventilacion VARCHAR(5)
+);
+
+CREATE TABLE producto (
+    id_producto VARCHAR(8) PRIMARY KEY NOT NULL,
+    descripcion VARCHAR(100),
+    tipo TEXT CHECK (tipo IN ('SIM', 'DISPOSITIVO')),
+    modelo VARCHAR(50),
+    operador TEXT CHECK (operador IN ('ENTEL', 'MOVISTAR', 'CLARO', 'BITEL')),
+    numero_serie VARCHAR(100),
+    iccid VARCHAR(25),
+    direccion_mac VARCHAR(50),
+    tecnologia VARCHAR(50),
+    propiedad TEXT CHECK (propiedad IN ('ALQUILADO', 'EN ALMACEN', 'VENDIDO')),
+    estado TEXT CHECK (estado IN ('NUEVO', 'ACTIVO', 'USADO', 'REACONDICIONADO', 'DAÑADO')),
+    ruta VARCHAR(200),
+    nombre VARCHAR(260)
+);
+
+CREATE TABLE lote (
+    id_lote VARCHAR(12) PRIMARY KEY NOT NULL,
+    id_producto VARCHAR(8) NOT NULL,
+    fecha_ingreso DATE,
+    FOREIGN KEY (id_producto) REFERENCES producto(id_producto)
+);
+
+CREATE TABLE movimiento_kardex (
+    num_movimiento INTEGER PRIMARY KEY AUTOINCREMENT,
+    fecha DATE,
+    tipo_movimiento TEXT CHECK (tipo_movimiento IN ('ENTRADA', 'SALIDA', 'DEVOLUCION', 'MANTENIMIENTO')),
+    id_producto VARCHAR(8) NOT NULL,
+    id_lote VARCHAR(12) NOT NULL,
+    cantidad INT,
+    id_entorno VARCHAR(12) NOT NULL,
+    estado_post_movimiento TEXT CHECK (estado_post_movimiento IN ('NUEVO', 'ACTIVO', 'USADO', 'REACONDICIONADO', 'DAÑADO')),
+    num_movimiento_legado VARCHAR(8),
+    FOREIGN KEY (id_producto) REFERENCES producto(id_producto),
+    FOREIGN KEY (id_entorno) REFERENCES entorno_almacenamiento(id_entorno),
+    FOREIGN KEY (id_lote) REFERENCES lote(id_lote)
+);
+
+-- 002 y 005: índices de las consultas de oficial.py
+CREATE INDEX idx_kardex_entorno_producto_mov ON movimiento_kardex (id_entorno, id_producto, num_movimiento);
+CREATE INDEX idx_kardex_producto_lote_entorno ON movimiento_kardex (id_producto, id_lote, id_entorno, tipo_movimiento, cantidad);
+CREATE INDEX idx_kardex_tipo_fecha ON movimiento_kardex (tipo_movimiento, fecha, id_producto, cantidad, id_lote, id_entorno, estado_post_movimiento);
+CREATE INDEX idx_kardex_estado ON movimiento_kardex (estado_post_movimiento);
+CREATE INDEX idx_kardex_num_movimiento_legado ON movimiento_kardex (num_movimiento_legado);
+CREATE INDEX idx_producto_tipo_operador ON producto (tipo, operador);
+
+-- 001 y 004: saldo materializado y sus triggers
+CREATE TABLE saldo_stock (
+    id_producto VARCHAR(8) NOT NULL,
+    id_lote VARCHAR(12) NOT NULL,
+    id_entorno VARCHAR(12) NOT NULL,
+    estado VARCHAR(15) NOT NULL DEFAULT '',
+    cantidad INT NOT NULL DEFAULT 0,
+    PRIMARY KEY (id_producto, id_lote, id_entorno, estado)
+);
+
+CREATE TRIGGER trg_kardex_saldo_ai AFTER INSERT ON movimiento_kardex
+BEGIN
+    INSERT INTO saldo_stock (id_producto, id_lote, id_entorno, estado, cantidad)
+    VALUES (NEW.id_producto, NEW.id_lote, NEW.id_entorno, COALESCE(NEW.estado_post_movimiento, ''),
+            CASE NEW.tipo_movimiento WHEN 'ENTRADA' THEN NEW.cantidad WHEN 'SALIDA' THEN -NEW.cantidad ELSE 0 END)
+    ON CONFLICT (id_producto, id_lote, id_entorno, estado) DO UPDATE SET cantidad = cantidad + excluded.cantidad;
+END;
+
+CREATE TRIGGER trg_kardex_saldo_ad AFTER DELETE ON movimiento_kardex
+BEGIN
+    INSERT INTO saldo_stock (id_producto, id_lote, id_entorno, estado, cantidad)
+    VALUES (OLD.id_producto, OLD.id_lote, OLD.id_entorno, COALESCE(OLD.estado_post_movimiento, ''),
+            CASE OLD.tipo_movimiento WHEN 'ENTRADA' THEN -OLD.cantidad WHEN 'SALIDA' THEN OLD.cantidad ELSE 0 END)
+    ON CONFLICT (id_producto, id_lote, id_entorno, estado) DO UPDATE SET cantidad = cantidad + excluded.cantidad;
+END;
+
+-- IS es la comparación que acepta NULL, como <=> en MySQL
+CREATE TRIGGER trg_kardex_saldo_au AFTER UPDATE ON movimiento_kardex
+WHEN NOT (OLD.id_producto IS NEW.id_producto AND OLD.id_lote IS NEW.id_lote
+          AND OLD.id_entorno IS NEW.id_entorno AND OLD.tipo_movimiento IS NEW.tipo_movimiento
+          AND OLD.cantidad IS NEW.cantidad
+          AND OLD.estado_post_movimiento IS NEW.estado_post_movimiento)
+BEGIN
+    INSERT INTO saldo_stock (id_producto, id_lote, id_entorno, estado, cantidad)
+    VALUES (OLD.id_producto, OLD.id_lote, OLD.id_entorno, COALESCE(OLD.estado_post_movimiento, ''),
+            CASE OLD.tipo_movimiento WHEN 'ENTRADA' THEN -OLD.cantidad WHEN 'SALIDA' THEN OLD.cantidad ELSE 0 END)
+    ON CONFLICT (id_producto, id_lote, id_entorno, estado) DO UPDATE SET cantidad = cantidad + excluded.cantidad;
+    INSERT INTO saldo_stock (id_producto, id_lote, id_entorno, estado, cantidad)
+    VALUES (NEW.id_producto, NEW.id_lote, NEW.id_entorno, COALESCE(NEW.estado_post_movimiento, ''),
+            CASE NEW.tipo_movimiento WHEN 'ENTRADA' THEN NEW.cantidad WHEN 'SALIDA' THEN -NEW.cantidad ELSE 0 END)
+    ON CONFLICT (id_producto, id_lote, id_entorno, estado) DO UPDATE SET cantidad = cantidad + excluded.cantidad;
+END;
+
+-- 006: resumen diario y marcas de agua de los procesos incrementales
+CREATE TABLE resumen_diario_kardex (
+    fecha DATE NOT NULL,
+    id_producto VARCHAR(8) NOT NULL,
+    id_entorno VARCHAR(12) NOT NULL,
+    id_lote VARCHAR(12) NOT NULL,
+    tipo_movimiento VARCHAR(15) NOT NULL,
+    cantidad_total BIGINT NOT NULL DEFAULT 0,
+    num_movimientos INT NOT NULL DEFAULT 0,
+    PRIMARY KEY (fecha, id_producto, id_entorno, id_lote, tipo_movimiento)
+);
+CREATE INDEX idx_resumen_producto_fecha ON resumen_diario_kardex (id_producto, fecha);
+CREATE INDEX idx_resumen_entorno_fecha ON resumen_diario_kardex (id_entorno, fecha);
+
+CREATE TABLE marca_agua_proceso (
+    proceso VARCHAR(40) PRIMARY KEY NOT NULL,
+    ultimo_movimiento BIGINT NOT NULL DEFAULT 0,
+    actualizado DATETIME
+);
+INSERT INTO marca_agua_proceso (proceso, ultimo_movimiento, actualizado) VALUES ('resumen_diario', 0, CURRENT_TIMESTAMP);
+
+-- 007: cierres de stock para las consultas "a una fecha"
+CREATE TABLE cierre_stock (
+    fecha_corte DATE NOT NULL,
+    id_producto VARCHAR(8) NOT NULL,
+    id_lote VARCHAR(12) NOT NULL,
+    id_entorno VARCHAR(12) NOT NULL,
+    cantidad INT NOT NULL,
+    PRIMARY KEY (fecha_corte, id_producto, id_lote, id_entorno)
+);
+CREATE INDEX idx_cierre_producto_fecha ON cierre_stock (id_producto, fecha_corte);
+
+CREATE TABLE cierre_stock_corte (
+    fecha_corte DATE PRIMARY KEY NOT NULL,
+    ultimo_movimiento BIGINT NOT NULL,
+    creado DATETIME
+);
+CREATE INDEX idx_kardex_producto_fecha ON movimiento_kardex (id_producto, fecha, tipo_movimiento, cantidad, id_lote, id_entorno);
+
+-- 008: huecos de la numeración pendientes para el resumen diario
+CREATE TABLE hueco_resumen_diario (
+    num_movimiento BIGINT PRIMARY KEY NOT NULL,
+    detectado DATETIME NOT NULL
+);
+CREATE INDEX idx_hueco_detectado ON hueco_resumen_diario (detectado);
+
+-- 009: páginas por num_movimiento de los movimientos de un día
+CREATE INDEX idx_kardex_tipo_fecha_mov ON movimiento_kardex (tipo_movimiento, fecha, num_movimiento);
+
+-- 010: avance de las cargas masivas de ingesta_movimientos.py
+CREATE TABLE avance_ingesta (
+    proceso VARCHAR(64) PRIMARY KEY NOT NULL,
+    huella VARCHAR(64),
+    registros_procesados BIGINT NOT NULL DEFAULT 0,
+    actualizado DATETIME
+);
@@ -0,0 +1,173 @@
+import argparse
+import csv
+import gzip
+import os
+import time
+from typing import Any, Callable, Dict, Iterator, List, Optional, Tuple
+
+import cierres_stock
+import registros
+from feed_kardex import COLUMNAS_FEED
+from oficial import ERRORES_CONSULTA, iterar_query
+
+TAMANO_BLOQUE_EXPORTACION = int(os.environ.get("BD_EXPORTACION_BLOQUE", "50000")) # Filas por bloque leído y escrito
+
+# Columnas de cada reporte con su tipo, que solo usa Parquet ("texto", "entero" o "fecha")
+REPORTES: Dict[str, Tuple[Tuple[str, str], ...]] = {
+    "kardex": tuple(zip(COLUMNAS_FEED, ("entero", "fecha", "texto", "texto", "texto", "entero", "texto", "texto"))),
+    "productos": tuple((campo, "texto") for campo in registros.Producto.CAMPOS),
+    "lotes": tuple(zip(registros.Lote.CAMPOS, ("texto", "texto", "fecha"))),
+    "stock": (("id_producto", "texto"), ("id_lote", "texto"), ("id_entorno", "texto"), ("cantidad", "entero")),
+}
+FORMATOS = ("csv", "parquet")
+COMPRESIONES = {"csv": ("ninguna", "gzip"), "parquet": ("ninguna", "snappy", "gzip", "zstd")}
+
+def consulta_reporte(reporte: str, desde: Optional[str] = None, hasta: Optional[str] = None,
+                     id_entorno: Optional[str] = None) -> Tuple[str, tuple]:
+    """(query, params) del reporte con los filtros que admite.
+
+    kardex filtra por fecha y entorno; lotes, por fecha de ingreso y por
+    entorno (los que tuvieron movimientos ahí); productos, solo por entorno.
+    stock es el saldo por producto, lote y entorno: el actual o, con
+    `hasta`, el del final de ese día (a partir del último cierre).
+    """
+    columnas = ", ".join(columna for columna, _ in REPORTES[reporte])
+    condiciones: List[str] = []
+    params: List[Any] = []
+
+    def filtrar(condicion: str, valor: Any) -> None:
+        if valor:
+            condiciones.append(condicion)
+            params.append(valor)
+
+    if reporte in ("productos", "stock") and desde:
+        raise ValueError(f"El reporte {reporte} no admite fecha de inicio")
+    if reporte == "productos" and hasta:
+        raise ValueError("El reporte productos no admite fechas")
+
+    if reporte == "kardex":
+        filtrar("fecha >= %s", desde)
+        filtrar("fecha <= %s", hasta)
+        filtrar("id_entorno = %s", id_entorno)
+        orden = "num_movimiento" # La PK: el servidor lee en orden, sin ordenar 10M de filas
+    elif reporte == "lotes":
+        filtrar("fecha_ingreso >= %s", desde)
+        filtrar("fecha_ingreso <= %s", hasta)
+        filtrar("id_lote IN (SELECT id_lote FROM saldo_stock WHERE id_entorno = %s)", id_entorno)
+        orden = "id_lote"
+    elif reporte == "productos":
+        filtrar("id_producto IN (SELECT id_producto FROM saldo_stock WHERE id_entorno = %s)", id_entorno)
+        orden = "id_producto"
+    elif hasta: # stock a una fecha
+        return cierres_stock.consulta_saldos_a_fecha(hasta, id_entorno=id_entorno)
+    else:
+        filtrar("id_entorno = %s", id_entorno)
+        donde = f"WHERE {' AND '.join(condiciones)} " if condiciones else ""
+        return (f"SELECT id_producto, id_lote, id_entorno, SUM(cantidad) FROM saldo_stock {donde}"
+                f"GROUP BY id_producto, id_lote, id_entorno HAVING SUM(cantidad) <> 0 "
+                f"ORDER BY id_producto, id_lote, id_entorno;", tuple(params))
+
+    tabla = {"kardex": "movimiento_kardex", "lotes": "lote", "productos": "producto"}[reporte]
+    donde = f" WHERE {' AND '.join(condiciones)}" if condiciones else ""
+    return f"SELECT {columnas} FROM {tabla}{donde} ORDER BY {orden};", tuple(params)
+
+def _escribir_csv(ruta: str, columnas: List[str], bloques: Iterator[list], compresion: str) -> None:
+    abrir = gzip.open if compresion == "gzip" else open
+    with abrir(ruta, "wt", newline="", encoding="utf-8") as archivo:
+        escritor = csv.writer(archivo)
+        escritor.writerow(columnas)
+        for filas in bloques:
+            escritor.writerows(filas)
+
+def _escribir_parquet(ruta: str, columnas: List[str], tipos: List[str], bloques: Iterator[list], compresion: str) -> None:
+    # pyarrow solo hace falta para Parquet
+    try:
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+    except ImportError as err:
+        raise RuntimeError("Exportar a Parquet requiere pyarrow (pip install pyarrow)") from err
+
+    tipos_arrow = {"texto": pa.string(), "entero": pa.int64(), "fecha": pa.date32()}
+    esquema = pa.schema([(columna, tipos_arrow[tipo]) for columna, tipo in zip(columnas, tipos)])
+    # Cada bloque es un row group: en memoria nunca hay más de un bloque
+    with pq.ParquetWriter(ruta, esquema, compression=None if compresion == "ninguna" else compresion) as escritor:
+        for filas in bloques:
+            # Fechas como texto (SQLite) o SUM como DECIMAL (MySQL) se convierten al tipo del esquema
+            arreglos = [pa.array(valores).cast(campo.type) for valores, campo in zip(zip(*filas), esquema)]
+            escritor.write_table(pa.Table.from_arrays(arreglos, schema=esquema))
+
+def exportar(reporte: str, ruta: str, formato: Optional[str] = None, desde: Optional[str] = None,
+             hasta: Optional[str] = None, id_entorno: Optional[str] = None, compresion: Optional[str] = None,
+             tamano_bloque: int = TAMANO_BLOQUE_EXPORTACION,
+             al_avanzar: Optional[Callable[[int], None]] = None) -> int:
+    """Escribe el reporte en `ruta` leyéndolo en bloques con un cursor sin buffer. Devuelve las filas escritas.
+
+    El formato sale de la extensión si no se indica (.parquet o CSV); la
+    compresión por defecto es gzip para .gz y snappy para Parquet. Se
+    escribe en `ruta`.parcial y se renombra al terminar, así un error de la
+    BD a mitad de camino no deja un archivo incompleto con el nombre final.
+    `al_avanzar` recibe el total de filas escritas después de cada bloque.
+    """
+    if reporte not in REPORTES:
+        raise ValueError(f"Reporte desconocido: {reporte}")
+    formato = formato or ("parquet" if ".parquet" in os.path.basename(ruta) else "csv")
+    if formato not in FORMATOS:
+        raise ValueError(f"Formato desconocido: {formato}")
+    if compresion is None:
+        compresion = "snappy" if formato == "parquet" else ("gzip" if ruta.endswith(".gz") else "ninguna")
+    if compresion not in COMPRESIONES[formato]:
+        raise ValueError(f"Compresión {compresion} no disponible para {formato}")
+
+    query, params = consulta_reporte(reporte, desde, hasta, id_entorno)
+    columnas = [columna for columna, _ in REPORTES[reporte]]
+    escritas = 0
+
+    def contar(bloques: Iterator[list]) -> Iterator[list]:
+        nonlocal escritas
+        for filas in bloques:
+            yield filas
+            escritas += len(filas)
+            if al_avanzar is not None:
+                al_avanzar(escritas)
+
+    bloques = iterar_query(query, params, tamano_bloque, propagar_errores=True)
+    temporal = ruta + ".parcial"
+    try:
+        if formato == "parquet":
+            _escribir_parquet(temporal, columnas, [tipo for _, tipo in REPORTES[reporte]], contar(bloques), compresion)
+        else:
+            _escribir_csv(temporal, columnas, contar(bloques), compresion)
+        os.replace(temporal, ruta)
+    except BaseException:
+        if os.path.exists(temporal):
+            os.remove(temporal)
+        raise
+    finally:
+        bloques.close() # Libera la conexión si la escritura falló a mitad del listado
+    return escritas
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Exporta el kardex, productos, lotes o stock a CSV o Parquet en streaming.")
+    parser.add_argument("reporte", choices=sorted(REPORTES))
+    parser.add_argument("salida", help="Archivo de destino (.csv, .csv.gz o .parquet)")
+    parser.add_argument("--formato", choices=FORMATOS, help="Por defecto, según la extensión de salida")
+    parser.add_argument("--desde", help="Fecha inicial YYYY-MM-DD (kardex, lotes)")
+    parser.add_argument("--hasta", help="Fecha final YYYY-MM-DD (kardex, lotes; en stock, saldo a esa fecha)")
+    parser.add_argument("--entorno", help="ID de entorno de almacenamiento")
+    parser.add_argument("--compresion", choices=sorted({c for opciones in COMPRESIONES.values() for c in opciones}))
+    parser.add_argument("--bloque", type=int, default=TAMANO_BLOQUE_EXPORTACION, help="Filas por bloque")
+    args = parser.parse_args()
+
+    inicio = time.perf_counter()
+    try:
+        filas = exportar(args.reporte, args.salida, args.formato, args.desde, args.hasta, args.entorno,
+                         args.compresion, args.bloque,
+                         al_avanzar=lambda total: print(f"  {total} filas...", end="\r", flush=True))
+    except (ValueError, RuntimeError) as err:
+        parser.error(str(err))
+    except ERRORES_CONSULTA as err:
+        print(f"\n❌ La exportación falló y no se escribió {args.salida}: {err}")
+        raise SystemExit(1)
+    segundos = time.perf_counter() - inicio
+    print(f"Exportadas {filas} filas de {args.reporte} a {args.salida} "
+          f"en {segundos:.2f} s ({filas / max(segundos, 1e-9):.0f} filas/s)")
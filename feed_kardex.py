@@ -0,0 +1,226 @@
+import argparse
+import os
+import threading
+import time
+import traceback
+from typing import Callable, Dict, Iterator, List, Optional, Tuple
+
+from oficial import TAMANO_BLOQUE_IN, ejecutar_query, transaccion
+
+# Cada cambio es un movimiento insertado; num_movimiento (AUTO_INCREMENT) hace de marca de agua
+COLUMNAS_FEED = ("num_movimiento", "fecha", "tipo_movimiento", "id_producto", "id_lote", "cantidad",
+                 "id_entorno", "estado_post_movimiento")
+SQL_CAMBIOS = f"""
+SELECT {', '.join(COLUMNAS_FEED)}
+FROM movimiento_kardex
+WHERE num_movimiento > %s
+ORDER BY num_movimiento
+LIMIT %s;
+"""
+
+INTERVALO_FEED = float(os.environ.get("BD_FEED_INTERVALO", "2")) # Segundos entre consultas cuando no hay novedades
+HUECOS_MAXIMOS = int(os.environ.get("BD_FEED_HUECOS_MAXIMOS", "10000")) # Tope de huecos que sigue cada suscriptor
+
+Oyente = Callable[[List[Tuple]], None]
+
+def ultima_marca() -> int:
+    # Lanza RuntimeError si la consulta falla: arrancar en 0 repetiría todo el kardex
+    resultado = ejecutar_query("SELECT MAX(num_movimiento) FROM movimiento_kardex;")
+    if resultado is None:
+        raise RuntimeError("No se pudo leer el último movimiento del kardex")
+    if resultado and resultado[0][0] is not None:
+        return int(resultado[0][0])
+    return 0 # Kardex vacío
+
+def leer_cambios(desde: int, tamano_lote: int = 1000) -> Optional[List[Tuple]]:
+    # Movimientos con num_movimiento > desde, en orden; None si la consulta falló
+    return ejecutar_query(SQL_CAMBIOS, (desde, tamano_lote))
+
+def leer_marca(proceso: str) -> Optional[int]: # None si el proceso todavía no guardó ninguna marca
+    resultado = ejecutar_query("SELECT ultimo_movimiento FROM marca_agua_proceso WHERE proceso = %s;", (proceso,))
+    if resultado is None: # Confundir un error con "sin marca" haría arrancar desde otro punto
+        raise RuntimeError(f"No se pudo leer la marca del proceso {proceso}")
+    return int(resultado[0][0]) if resultado else None
+
+# Para guardar la marca dentro de otra transacción (p. ej. junto con los datos que la avanzan)
+SQL_GUARDAR_MARCA = (
+    "INSERT INTO marca_agua_proceso (proceso, ultimo_movimiento, actualizado) VALUES (%s, %s, NOW()) "
+    "ON DUPLICATE KEY UPDATE ultimo_movimiento = VALUES(ultimo_movimiento), actualizado = NOW();"
+)
+
+def guardar_marca(proceso: str, marca: int) -> None:
+    with transaccion() as cursor:
+        cursor.execute(SQL_GUARDAR_MARCA, (proceso, marca))
+
+def productos_afectados(cambios: List[Tuple]) -> set: # Para invalidar solo lo que cambió
+    return {fila[3] for fila in cambios}
+
+class SuscriptorKardex:
+    """Lee los movimientos nuevos desde una marca de agua, de a bloques.
+
+    Con `proceso` la marca se guarda en marca_agua_proceso (ver confirmar())
+    y el suscriptor retoma donde quedó; la primera vez, o sin proceso,
+    arranca en `desde` o, por defecto, en el último movimiento actual (solo
+    ve lo que llegue después).
+
+    En MySQL un AUTO_INCREMENT se asigna al insertar pero la fila se ve al
+    confirmar, así que puede aparecer un número menor después de uno mayor.
+    Los huecos de la numeración se vuelven a consultar durante
+    `espera_huecos` segundos; pasado ese tiempo se dan por descartados
+    (un insert deshecho también deja un hueco). Si un salto de numeración
+    deja más de `max_huecos` pendientes, solo se siguen los más cercanos a
+    la marca. Si no se puede leer la marca inicial se lanza RuntimeError.
+    Solo se informan inserciones:
+    los UPDATE y DELETE sobre el kardex no pasan por el feed.
+    """
+
+    def __init__(self, desde: Optional[int] = None, proceso: Optional[str] = None,
+                 tamano_lote: int = 1000, espera_huecos: float = 60.0, max_huecos: int = HUECOS_MAXIMOS):
+        self.proceso = proceso
+        guardada = leer_marca(proceso) if proceso is not None else None
+        if guardada is not None:
+            desde = guardada
+        self.marca = ultima_marca() if desde is None else desde
+        self.tamano_lote = tamano_lote
+        self.espera_huecos = espera_huecos
+        self.max_huecos = max_huecos
+        self._huecos: Dict[int, float] = {} # num_movimiento faltante -> momento en que se detectó
+
+    def _revisar_huecos(self) -> List[Tuple]:
+        ahora = time.monotonic()
+        for numero, desde in list(self._huecos.items()):
+            if ahora - desde > self.espera_huecos:
+                del self._huecos[numero]
+        if not self._huecos:
+            return []
+        numeros = sorted(self._huecos)
+        encontrados: List[Tuple] = []
+        for inicio in range(0, len(numeros), TAMANO_BLOQUE_IN):
+            bloque = numeros[inicio:inicio + TAMANO_BLOQUE_IN]
+            marcadores = ", ".join(["%s"] * len(bloque))
+            query = f"SELECT {', '.join(COLUMNAS_FEED)} FROM movimiento_kardex WHERE num_movimiento IN ({marcadores}) ORDER BY num_movimiento;"
+            encontrados.extend(ejecutar_query(query, tuple(bloque)) or [])
+        for fila in encontrados:
+            del self._huecos[fila[0]]
+        return encontrados
+
+    def sondear(self) -> List[Tuple]:
+        """Devuelve el siguiente bloque de cambios (puede estar vacío) y avanza la marca."""
+        cambios = self._revisar_huecos()
+        nuevos = leer_cambios(self.marca, self.tamano_lote)
+        if nuevos:
+            ahora = time.monotonic()
+            esperado = self.marca + 1
+            for fila in nuevos:
+                libres = self.max_huecos - len(self._huecos)
+                if fila[0] > esperado and libres > 0: # Un salto grande no llena la memoria de números faltantes
+                    for numero in range(esperado, min(fila[0], esperado + libres)):
+                        self._huecos[numero] = ahora
+                esperado = fila[0] + 1
+            self.marca = nuevos[-1][0]
+            cambios.extend(nuevos)
+        return cambios
+
+    def confirmar(self) -> None:
+        # Guarda la marca del proceso; los huecos pendientes no se guardan
+        if self.proceso is not None:
+            guardar_marca(self.proceso, self.marca)
+
+    def iterar(self, intervalo: float = 1.0, detener: Optional[threading.Event] = None) -> Iterator[List[Tuple]]:
+        """Sigue el kardex indefinidamente: entrega cada bloque no vacío de cambios.
+
+        Si el bloque vino lleno se pide el siguiente enseguida; si no, espera
+        `intervalo` segundos. Termina cuando se activa `detener`.
+        """
+        detener = detener or threading.Event()
+        while not detener.is_set():
+            cambios = self.sondear()
+            if cambios:
+                yield cambios
+            if len(cambios) < self.tamano_lote:
+                detener.wait(intervalo)
+
+class FeedKardex:
+    """Hilo de fondo que sigue el kardex y avisa a los oyentes registrados.
+
+    Cada oyente recibe la lista de cambios (filas con COLUMNAS_FEED) en el
+    hilo del feed: lo que haga debe ser rápido o delegarse (la GUI, por
+    ejemplo, debe pasar el aviso al hilo de Tk con root.after).
+    """
+
+    def __init__(self, suscriptor: Optional[SuscriptorKardex] = None, intervalo: float = INTERVALO_FEED):
+        self._suscriptor = suscriptor
+        self.intervalo = intervalo
+        self._oyentes: List[Oyente] = []
+        self._lock = threading.Lock()
+        self._detener = threading.Event()
+        self._hilo: Optional[threading.Thread] = None
+
+    def agregar_oyente(self, oyente: Oyente) -> None:
+        with self._lock:
+            self._oyentes.append(oyente)
+
+    def quitar_oyente(self, oyente: Oyente) -> None:
+        with self._lock:
+            if oyente in self._oyentes:
+                self._oyentes.remove(oyente)
+
+    def _avisar(self, cambios: List[Tuple]) -> None:
+        with self._lock:
+            oyentes = list(self._oyentes)
+        for oyente in oyentes:
+            try:
+                oyente(cambios)
+            except Exception: # Un oyente con errores no detiene el feed ni a los demás
+                traceback.print_exc()
+
+    def _ejecutar(self) -> None:
+        while self._suscriptor is None: # Se crea acá: leer la marca inicial ya es una consulta
+            try:
+                self._suscriptor = SuscriptorKardex()
+            except RuntimeError as e: # Sin marca no se puede empezar: reintenta en vez de repetir el kardex
+                print(f"Feed del kardex: {e}; se reintenta en {self.intervalo} s")
+                if self._detener.wait(self.intervalo):
+                    return
+        for cambios in self._suscriptor.iterar(self.intervalo, self._detener):
+            self._avisar(cambios)
+            self._suscriptor.confirmar()
+
+    def iniciar(self) -> None:
+        if self._hilo is not None and self._hilo.is_alive():
+            return
+        self._detener.clear()
+        self._hilo = threading.Thread(target=self._ejecutar, name="feed-kardex", daemon=True)
+        self._hilo.start()
+
+    def detener(self, esperar: float = 5.0) -> None:
+        self._detener.set()
+        if self._hilo is not None:
+            self._hilo.join(esperar)
+
+_feed: Optional[FeedKardex] = None
+_feed_lock = threading.Lock()
+
+def obtener_feed() -> FeedKardex: # Feed único del proceso, compartido por caches, resúmenes y la GUI
+    global _feed
+    with _feed_lock:
+        if _feed is None:
+            _feed = FeedKardex()
+        return _feed
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Muestra los movimientos del kardex a medida que se insertan.")
+    parser.add_argument("--desde", type=int, help="Marca inicial (num_movimiento); por defecto, solo los nuevos")
+    parser.add_argument("--proceso", help="Guardar y retomar la marca con este nombre en marca_agua_proceso")
+    parser.add_argument("--intervalo", type=float, default=1.0, help="Segundos entre consultas sin novedades")
+    args = parser.parse_args()
+
+    suscriptor = SuscriptorKardex(args.desde, args.proceso)
+    print(f"Siguiendo movimiento_kardex desde el movimiento {suscriptor.marca} (Ctrl+C para salir)")
+    try:
+        for cambios in suscriptor.iterar(args.intervalo):
+            for fila in cambios:
+                print("  ".join(str(valor) for valor in fila))
+            suscriptor.confirmar()
+    except KeyboardInterrupt:
+        pass
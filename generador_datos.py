@@ -0,0 +1,153 @@
+import argparse
+import random
+import time
+from datetime import date, timedelta
+from itertools import islice
+from typing import Iterable, Iterator, List, Tuple
+
+from oficial import transaccion
+from ingesta_movimientos import SQL_INSERTAR_MOVIMIENTO
+
+# Los ids generados usan prefijos propios (SG/DG, LG, ENT-G) para no chocar con los datos semilla
+OPERADORES = ["ENTEL", "MOVISTAR", "CLARO", "BITEL"]
+PROPIEDADES = ["ALQUILADO", "EN ALMACEN", "VENDIDO"]
+MODELOS = [("Router", "HG8245H", "FTTH"), ("ONT", "F660", "FTTH"), ("Módem", "B310s-518", "4G LTE"),
+           ("Router", "Archer C6", "WiFi 5"), ("ONT", "HG8010H", "FTTH"), ("Módem", "E8372h-320", "4G LTE")]
+# Reparto de los movimientos que no son entradas
+TIPOS_SALIDA = [("SALIDA", 0.8), ("DEVOLUCION", 0.1), ("MANTENIMIENTO", 0.1)]
+ESTADOS_POR_TIPO = {
+    "SALIDA": ["USADO", "ACTIVO"],
+    "DEVOLUCION": ["REACONDICIONADO", "USADO"],
+    "MANTENIMIENTO": ["DAÑADO", "REACONDICIONADO"],
+}
+
+class CatalogoSintetico:
+    """Entornos, productos y lotes generados a partir de una semilla.
+
+    La misma semilla y los mismos tamaños producen siempre las mismas filas.
+    Cada lote vive en un entorno fijo y tiene un peso de popularidad
+    (distribución tipo Zipf): unos pocos lotes concentran la mayoría de los
+    movimientos, como en un almacén real.
+    """
+
+    def __init__(self, semilla: int = 42, productos: int = 1000, lotes_por_producto: int = 3,
+                 entornos: int = 10, fecha_inicio: date = date(2023, 1, 1)):
+        rng = random.Random(semilla)
+        self.entornos: List[Tuple] = []
+        for i in range(1, entornos + 1):
+            regulado = rng.random() < 0.7
+            self.entornos.append((f"ENT-G{i:03d}", f"Almacén sintético {i}", f"Sector {rng.randint(1, 20)}",
+                                  18.0 if regulado else None, 27.0 if regulado else None,
+                                  40.0 if regulado else None, 60.0 if regulado else None,
+                                  "SI" if regulado else "NO"))
+
+        self.productos: List[Tuple] = []
+        self.lotes: List[Tuple] = []
+        self.entorno_de_lote: List[str] = []
+        for i in range(1, productos + 1):
+            if rng.random() < 0.6:
+                operador = rng.choice(OPERADORES)
+                id_producto = f"SG{i:06d}"
+                self.productos.append((id_producto, f"SIM {operador.title()} {i}", "SIM", None, operador, None,
+                                       f"8957{rng.randrange(10**15):015d}", None, None,
+                                       rng.choice(PROPIEDADES), "NUEVO"))
+            else:
+                clase, modelo, tecnologia = rng.choice(MODELOS)
+                id_producto = f"DG{i:06d}"
+                mac = ":".join(f"{rng.randrange(256):02X}" for _ in range(6))
+                self.productos.append((id_producto, f"{clase} {modelo} {i}", "DISPOSITIVO", modelo, None,
+                                       f"SN{rng.randrange(16**10):010X}", None, mac, tecnologia,
+                                       rng.choice(PROPIEDADES), "NUEVO"))
+            for n in range(1, lotes_por_producto + 1):
+                ingreso = fecha_inicio + timedelta(days=rng.randrange(30))
+                self.lotes.append((f"LG{i:06d}{n:03d}", id_producto, ingreso))
+                self.entorno_de_lote.append(rng.choice(self.entornos)[0])
+
+        # Pesos acumulados para elegir lotes con random.choices sin recalcularlos en cada movimiento
+        pesos = [1.0 / (rango ** 0.8) for rango in range(1, len(self.lotes) + 1)]
+        rng.shuffle(pesos)
+        self.pesos_acumulados: List[float] = []
+        total = 0.0
+        for peso in pesos:
+            total += peso
+            self.pesos_acumulados.append(total)
+        self.fecha_inicio = fecha_inicio
+
+def iterar_movimientos(catalogo: CatalogoSintetico, semilla: int = 42,
+                       movimientos_por_dia: int = 2000) -> Iterator[Tuple]:
+    """Flujo infinito y determinista de movimientos, en el orden de COLUMNAS de la ingesta.
+
+    Los primeros N movimientos son siempre los mismos, pida uno N o más, así
+    que un conjunto grande se puede construir agregando bloques a uno chico.
+    Nunca se despacha más de lo que hay en el lote, por lo que el saldo de
+    cada lote es siempre positivo o cero.
+    """
+    rng = random.Random(semilla + 1)
+    saldos = [0] * len(catalogo.lotes)
+    indices = range(len(catalogo.lotes))
+    tipos, pesos_tipos = zip(*TIPOS_SALIDA)
+    numero = 0
+    while True:
+        fecha = catalogo.fecha_inicio + timedelta(days=numero // movimientos_por_dia)
+        indice = rng.choices(indices, cum_weights=catalogo.pesos_acumulados)[0]
+        id_lote, id_producto, _ = catalogo.lotes[indice]
+        id_entorno = catalogo.entorno_de_lote[indice]
+        saldo = saldos[indice]
+        if saldo < 10 or rng.random() < 0.3:
+            cantidad = rng.randint(10, 500)
+            saldos[indice] += cantidad
+            yield (fecha, "ENTRADA", id_producto, id_lote, cantidad, id_entorno, "NUEVO")
+        else:
+            tipo = rng.choices(tipos, weights=pesos_tipos)[0]
+            cantidad = rng.randint(1, min(saldo, 50))
+            if tipo == "SALIDA": # DEVOLUCION y MANTENIMIENTO no mueven el saldo (ver saldo_stock)
+                saldos[indice] -= cantidad
+            yield (fecha, tipo, id_producto, id_lote, cantidad, id_entorno, rng.choice(ESTADOS_POR_TIPO[tipo]))
+        numero += 1
+
+def _insertar_en_lotes(query: str, filas: Iterable[Tuple], tamano_lote: int) -> int:
+    total = 0
+    filas = iter(filas)
+    while True:
+        bloque = list(islice(filas, tamano_lote))
+        if not bloque:
+            return total
+        with transaccion() as cursor:
+            cursor.executemany(query, bloque)
+        total += len(bloque)
+
+def cargar_catalogo(catalogo: CatalogoSintetico, tamano_lote: int = 5000) -> None:
+    _insertar_en_lotes(
+        "INSERT INTO entorno_almacenamiento (id_entorno, nombre, ubicacion_fisica, temperatura_min, temperatura_max, "
+        "humedad_min, humedad_max, ventilacion) VALUES (%s, %s, %s, %s, %s, %s, %s, %s)",
+        catalogo.entornos, tamano_lote)
+    _insertar_en_lotes(
+        "INSERT INTO producto (id_producto, nombre, tipo, modelo, operador, numero_serie, iccid, direccion_mac, "
+        "tecnologia, propiedad, estado) VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s)",
+        catalogo.productos, tamano_lote)
+    _insertar_en_lotes("INSERT INTO lote (id_lote, id_producto, fecha_ingreso) VALUES (%s, %s, %s)",
+                       catalogo.lotes, tamano_lote)
+
+def cargar_movimientos(movimientos: Iterator[Tuple], cantidad: int, tamano_lote: int = 5000) -> int:
+    # Inserta los siguientes `cantidad` movimientos del flujo; el flujo queda listo para continuar
+    return _insertar_en_lotes(SQL_INSERTAR_MOVIMIENTO, islice(movimientos, cantidad), tamano_lote)
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Genera datos sintéticos y deterministas para el kardex.")
+    parser.add_argument("--movimientos", type=int, default=1_000_000)
+    parser.add_argument("--productos", type=int, default=1000)
+    parser.add_argument("--lotes-por-producto", type=int, default=3)
+    parser.add_argument("--entornos", type=int, default=10)
+    parser.add_argument("--movimientos-por-dia", type=int, default=2000)
+    parser.add_argument("--semilla", type=int, default=42)
+    parser.add_argument("--lote", type=int, default=5000, help="Filas por transacción")
+    args = parser.parse_args()
+
+    catalogo = CatalogoSintetico(args.semilla, args.productos, args.lotes_por_producto, args.entornos)
+    inicio = time.perf_counter()
+    cargar_catalogo(catalogo, args.lote)
+    flujo = iterar_movimientos(catalogo, args.semilla, args.movimientos_por_dia)
+    insertados = cargar_movimientos(flujo, args.movimientos, args.lote)
+    segundos = time.perf_counter() - inicio
+    print(f"Cargados {len(catalogo.productos)} productos, {len(catalogo.lotes)} lotes, "
+          f"{len(catalogo.entornos)} entornos y {insertados} movimientos en {segundos:.1f} s.")
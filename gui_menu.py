@@ -1,22 +1,51 @@
 import tkinter as tk
-from tkinter import ttk, messagebox, scrolledtext
-import menu_interactivo_2 as db_logic
+from tkinter import ttk, messagebox, scrolledtext, filedialog
+import oficial as db_logic
+import resumen_diario
+import feed_kardex
+import metricas
+import oficial_async
+import registros
+from tabla_virtual import TablaVirtual
 import re # Para validación de fecha
-from PIL import Image, ImageTk
+import time
+from concurrent.futures import ThreadPoolExecutor
+from PIL import ImageTk
 from datetime import datetime # Para validación de fecha
 
 # Constantes para nombres de columnas (para asegurar consistencia)
-COLUMN_NAMES_PRODUCTO = ["ID Producto", "Descripción", "Tipo", "Modelo", "Operador",
-                         "No. Serie", "ICCID", "MAC", "Tecnología", "Propiedad",
-                         "Estado", "Ruta Archivo", "Nombre Archivo"]
-COLUMN_NAMES_MOVIMIENTOS = ["No. Movimiento", "ID Producto", "Cantidad", "ID Lote",
-                            "ID Entorno", "Estado Post Movimiento"]
+COLUMN_NAMES_MOVIMIENTOS = registros.Movimiento.etiquetas(db_logic.CAMPOS_MOVIMIENTOS_DEL_DIA)
+COLUMN_NAMES_STOCK = ["ID Producto", "Nombre", "Stock"]
+
+# Las consultas corren en hilos de trabajo para que la ventana nunca se congele
+HILOS_CONSULTA = 4
+TIMEOUT_CONSULTA = 30 # Segundos antes de dar por perdida una consulta
+INTERVALO_SONDEO_MS = 50
+TAMANO_PAGINA_TABLA = 2000 # Filas por página que pide la tabla de resultados al desplazarse
+INTERVALO_TABLERO_S = 15 # Auto-actualización del tablero; solo se vuelven a consultar las cifras que cambiaron
 
 class InventarioApp:
     def __init__(self, root):
         self.root = root
         self.root.title("Gestor de Inventario BD")
         self.root.geometry("900x700") # Tamaño inicial
+        self.root.protocol("WM_DELETE_WINDOW", self.cerrar)
+        self._stream_activo = None # Generador de páginas del listado que muestra la tabla
+        self._executor = ThreadPoolExecutor(max_workers=HILOS_CONSULTA, thread_name_prefix="consulta-bd")
+        self._generacion = 0 # Se incrementa con cada consulta; los resultados de generaciones viejas se descartan
+        self._futuro_actual = None
+        # Tablero (opción 15): versión de los datos de cada cifra según el feed y versión de lo que se muestra
+        self._tablero_activo = False
+        self._tablero_tarea = None # root.after de la próxima auto-actualización
+        self._tablero_valores = {}
+        self._tablero_cambios = {nombre: 0 for nombre in oficial_async.METRICAS_TABLERO}
+        self._tablero_vistos = {nombre: -1 for nombre in oficial_async.METRICAS_TABLERO}
+        # Movimientos nuevos del kardex: mantienen al día el resumen diario sin esperar a una consulta
+        self._feed = feed_kardex.obtener_feed()
+        self._feed.agregar_oyente(resumen_diario.refrescar_al_recibir_cambios)
+        self._feed.agregar_oyente(db_logic.invalidar_sim_al_recibir_cambios)
+        self._feed.agregar_oyente(self._marcar_metricas_cambiadas)
+        self._feed.iniciar()
 
         # Aplicar un tema de ttk si está disponible para mejorar la estética
         style = ttk.Style()
@@ -44,11 +73,23 @@ class InventarioApp:
         results_frame = ttk.LabelFrame(main_area_frame, text="Resultados")
         results_frame.pack(expand=True, fill=tk.BOTH)
 
+        # Los listados largos van a la tabla virtual; los mensajes y resultados cortos, al texto
+        btn_clear_results = ttk.Button(results_frame, text="Limpiar Resultados", command=self.clear_results_area)
+        btn_clear_results.pack(side=tk.BOTTOM, pady=5)
+
         self.results_text = scrolledtext.ScrolledText(results_frame, wrap=tk.WORD, state=tk.DISABLED, height=15)
+        self.results_table = TablaVirtual(results_frame, self._pedir_pagina_tabla)
+        self.results_image = ttk.Label(results_frame, anchor=tk.CENTER, compound=tk.TOP)
+        self._widget_resultados = self.results_text
         self.results_text.pack(expand=True, fill=tk.BOTH, padx=5, pady=5)
 
-        btn_clear_results = ttk.Button(results_frame, text="Limpiar Resultados", command=self.clear_results_area)
-        btn_clear_results.pack(pady=5)
+        # Barra de estado con indicador de actividad
+        status_frame = ttk.Frame(main_area_frame)
+        status_frame.pack(fill=tk.X, pady=(5,0))
+        self.status_var = tk.StringVar(value="Listo")
+        ttk.Label(status_frame, textvariable=self.status_var).pack(side=tk.LEFT)
+        self.busy_bar = ttk.Progressbar(status_frame, mode="indeterminate", length=120)
+        self.busy_bar.pack(side=tk.RIGHT)
 
         # --- Botones de Opciones ---
         opciones = [
@@ -63,7 +104,10 @@ class InventarioApp:
             ("9. Salidas en un Día", self.show_op9_inputs),
             ("10. SIMs por Operador", self.show_op10_inputs),
             ("11. Total SIMs", self.execute_op11_direct), # Sin inputs
-            ("12. Mostrar imagen del producto", self.mostrar_entrada_op12)
+            ("12. Mostrar imagen del producto", self.mostrar_entrada_op12),
+            ("13. Movimientos por Rango de Fechas", self.show_op13_inputs),
+            ("14. Métricas de Consultas", self.show_op14_metricas),
+            ("15. Tablero de Inventario", self.show_op15_tablero)
         ]
 
         for texto, comando in opciones:
@@ -71,43 +115,155 @@ class InventarioApp:
             btn.pack(pady=3, padx=5, fill=tk.X)
 
         # Botón de Salir
-        btn_salir = ttk.Button(options_frame, text="Salir", command=self.root.quit)
+        btn_salir = ttk.Button(options_frame, text="Salir", command=self.cerrar)
         btn_salir.pack(pady=10, padx=5, fill=tk.X, side=tk.BOTTOM)
 
     def _clear_input_frame(self):
+        self._detener_tablero() # Cualquier otra opción deja de auto-actualizar el tablero
         for widget in self.input_frame.winfo_children():
             widget.destroy()
 
+    def _mostrar_widget_resultados(self, widget):
+        # Texto, tabla o imagen: solo uno ocupa el área de resultados a la vez
+        if widget is self._widget_resultados:
+            return
+        if self._widget_resultados is self.results_table:
+            self.results_table.detener()
+        elif self._widget_resultados is self.results_image:
+            self.results_image.config(image="", text="")
+            self.results_image.image = None # Libera la imagen anterior
+        self._widget_resultados.pack_forget()
+        widget.pack(expand=True, fill=tk.BOTH, padx=5, pady=5)
+        self._widget_resultados = widget
+
     def _display_results(self, content: str):
+        self._mostrar_widget_resultados(self.results_text)
         self.results_text.config(state=tk.NORMAL)
         self.results_text.delete(1.0, tk.END)
         self.results_text.insert(tk.END, content)
         self.results_text.config(state=tk.DISABLED)
-    
-    def _mostrar_imagen(self, ruta_image):
-        image = Image.open(ruta_image)
-        image = image.resize((300, 300))  # Ajustar tamaño si es necesario
-        image_tk = ImageTk.PhotoImage(image)  
-        
-        self.results_frame.config(image=image_tk)
-        self.results_frame.image = image_tk  # Mantener referencia 
 
+    def _mostrar_tabla(self, columnas, paginas, mensaje_vacio: str):
+        # Muestra en la tabla virtual las filas de un generador de páginas; las páginas
+        # se piden a medida que el usuario se desplaza, nunca el listado entero de una vez.
+        self._cerrar_stream_activo()
+        self._mostrar_widget_resultados(self.results_table)
+        self._stream_activo = paginas
+        self.results_table.cargar(columnas, paginas, al_quedar_vacia=lambda: self._display_results(mensaje_vacio))
+
+    def _pedir_pagina_tabla(self, func, al_terminar, al_fallar):
+        # La tabla pide su siguiente página por el mismo ejecutor que el resto de las consultas;
+        # si falla, el error lo muestra la tabla (con la opción de reintentar) y no un diálogo
+        def recibir(pagina):
+            if not pagina:
+                self._stream_activo = None
+            al_terminar(pagina)
+        self._handle_db_call(func, continuar_stream=True, al_terminar=recibir, al_fallar=al_fallar)
+
+    def _mostrar_imagen(self, miniatura, titulo: str = ""):
+        # La miniatura llega ya decodificada desde el hilo de trabajo; aquí solo se pasa a Tk
+        image_tk = ImageTk.PhotoImage(miniatura)
+        self._mostrar_widget_resultados(self.results_image)
+        self.results_image.config(image=image_tk, text=titulo)
+        self.results_image.image = image_tk  # Mantener referencia
 
     def clear_results_area(self):
+        self._cerrar_stream_activo() # Devuelve al pool la conexión del listado que mostraba la tabla
         self._display_results("")
 
-    def _handle_db_call(self, func, *args):
-        self.clear_results_area() # Limpiar antes de nueva consulta
+    def _mostrar_ocupado(self, ocupado: bool, mensaje: str = "Consultando..."):
+        if ocupado:
+            self.status_var.set(mensaje)
+            self.busy_bar.start(10)
+            self.root.config(cursor="watch")
+        else:
+            self.status_var.set("Listo")
+            self.busy_bar.stop()
+            self.root.config(cursor="")
+
+    def _cerrar_stream_activo(self):
+        # El generador puede estar leyendo en un hilo de trabajo: se cierra cuando ese bloque termine
+        lotes, self._stream_activo = self._stream_activo, None
+        if lotes is None:
+            return
+        if self._futuro_actual is not None:
+            self._futuro_actual.add_done_callback(lambda _futuro: lotes.close())
+        else:
+            lotes.close()
+
+    def _handle_db_call(self, func, *args, al_terminar=None, al_fallar=None, timeout: float = TIMEOUT_CONSULTA,
+                        continuar_stream: bool = False):
+        # Ejecuta func(*args) en un hilo de trabajo y, cuando termina, llama a al_terminar(resultado)
+        # desde el hilo de Tk (vía root.after). Una consulta nueva reemplaza a la anterior: su
+        # resultado se descarta y, si todavía no había empezado, ni siquiera se ejecuta.
+        # Con al_fallar, los errores y el tiempo agotado se informan con al_fallar(mensaje, reintentable).
+        if not continuar_stream:
+            self._cerrar_stream_activo() # Cualquier listado en curso deja de mostrarse
+            self.clear_results_area() # Limpiar antes de nueva consulta
+        if self._futuro_actual is not None:
+            self._futuro_actual.cancel()
+        self._generacion += 1
+        # Punto de partida para informar cuántas consultas y cuánto tiempo llevó este clic
+        inicio = (time.monotonic(), db_logic.metricas_consultas.total_llamadas())
+        futuro = self._executor.submit(func, *args)
+        self._futuro_actual = futuro
+        self._mostrar_ocupado(True)
+        self.root.after(INTERVALO_SONDEO_MS, self._sondear_consulta, futuro, self._generacion,
+                        al_terminar, al_fallar, time.monotonic() + timeout, inicio)
+
+    def _sondear_consulta(self, futuro, generacion: int, al_terminar, al_fallar, limite: float, inicio):
+        if generacion != self._generacion: # Reemplazada por otra consulta
+            return
+        if not futuro.done():
+            if time.monotonic() < limite:
+                self.root.after(INTERVALO_SONDEO_MS, self._sondear_consulta, futuro, generacion, al_terminar, al_fallar,
+                                limite, inicio)
+                return
+            # El hilo no se puede interrumpir: su resultado se ignorará cuando llegue
+            self._generacion += 1
+            self._cerrar_stream_activo() # Se cierra cuando ese hilo termine: no se puede volver a pedir
+            self._futuro_actual = None
+            self._mostrar_ocupado(False)
+            if al_fallar is not None:
+                al_fallar("la base de datos no respondió a tiempo", False)
+                return
+            messagebox.showerror("Tiempo Agotado", "La base de datos no respondió a tiempo. Intente nuevamente.")
+            self._display_results("Tiempo de espera agotado: la base de datos no respondió.")
+            return
+
+        self._futuro_actual = None
+        self._mostrar_ocupado(False)
+        momento, consultas = inicio
+        self.status_var.set(f"Listo: {db_logic.metricas_consultas.total_llamadas() - consultas} consulta(s) a la BD "
+                            f"en {(time.monotonic() - momento) * 1000:.0f} ms")
         try:
-            return func(*args)
-        except db_logic.DatabaseError as e:
+            resultado = futuro.result()
+        except db_logic.DatabaseError + (db_logic.ListadoIncompleto,) as e:
+            if al_fallar is not None:
+                al_fallar(f"error de base de datos: {e}", True)
+                return
+            self._stream_activo = None
             messagebox.showerror("Error de Base de Datos", str(e))
             self._display_results(f"Error de Base de Datos:\n{e}")
-            return None
+            return
         except Exception as e:
+            if al_fallar is not None:
+                al_fallar(f"error inesperado: {e}", True)
+                return
+            self._stream_activo = None
             messagebox.showerror("Error Inesperado", f"Ocurrió un error inesperado: {e}")
             self._display_results(f"Error Inesperado:\n{e}")
-            return None
+            return
+        if al_terminar is not None:
+            al_terminar(resultado)
+
+    def cerrar(self):
+        self._detener_tablero()
+        self._generacion += 1
+        self._cerrar_stream_activo()
+        self._executor.shutdown(wait=False, cancel_futures=True)
+        self._feed.detener(esperar=0)
+        self.root.quit()
 
     def _validate_date_format(self, date_string: str) -> bool:
         """Valida que el string de fecha esté en formato YYYY-MM-DD."""
@@ -119,6 +275,12 @@ class InventarioApp:
         except ValueError:
             return False
 
+    def _si_existe_producto(self, pid, func, *args):
+        # Para ejecutar en segundo plano: None si el producto no existe, (True, resultado) si existe
+        if not db_logic.obtener_detalles_producto(pid):
+            return None
+        return True, func(*args)
+
     # --- Funciones para configurar inputs y ejecutar acciones ---
 
     def show_op1_inputs(self):
@@ -134,23 +296,29 @@ class InventarioApp:
             messagebox.showwarning("Entrada Inválida", "Por favor, ingrese un ID de Producto.")
             return
 
-        detalles_producto = self._handle_db_call(db_logic.obtener_detalles_producto, pid)
-        if detalles_producto:
-            resultado_str = "--- Detalles del Producto ---\n"
-            for i, col_name in enumerate(COLUMN_NAMES_PRODUCTO):
-                if i < len(detalles_producto):
-                    resultado_str += f"{col_name}: {detalles_producto[i]}\n"
-
-            resultado_str += "\n--- Stock por Lote (asociado al producto) ---\n"
-            stock_lotes = self._handle_db_call(db_logic.obtener_stock_producto_desglosado_por_lote, pid)
-            if stock_lotes:
-                for id_lote, stock_lote_val in stock_lotes:
-                    resultado_str += f"  Lote {id_lote}: {stock_lote_val}\n"
-            else:
-                resultado_str += "  No hay información de stock por lote para este producto o no tiene lotes con stock."
-            self._display_results(resultado_str)
-        elif detalles_producto is None and self.results_text.get(1.0, tk.END).strip() == "": # Solo si no hubo error previo de BD
-             self._display_results(f"Producto con ID '{pid}' no encontrado.")
+        def consultar():
+            detalles_producto = db_logic.obtener_detalles_producto(pid, como_objeto=True)
+            if not detalles_producto:
+                return None, None
+            return detalles_producto, db_logic.obtener_stock_producto_desglosado_por_lote(pid)
+
+        self._handle_db_call(consultar, al_terminar=lambda resultado: self._mostrar_op1(pid, *resultado))
+
+    def _mostrar_op1(self, pid, detalles_producto, stock_lotes):
+        if not detalles_producto:
+            self._display_results(f"Producto con ID '{pid}' no encontrado.")
+            return
+        resultado_str = "--- Detalles del Producto ---\n"
+        for col_name, valor in detalles_producto.campos():
+            resultado_str += f"{col_name}: {valor}\n"
+
+        resultado_str += "\n--- Stock por Lote (asociado al producto) ---\n"
+        if stock_lotes:
+            for id_lote, stock_lote_val in stock_lotes:
+                resultado_str += f"  Lote {id_lote}: {stock_lote_val}\n"
+        else:
+            resultado_str += "  No hay información de stock por lote para este producto o no tiene lotes con stock."
+        self._display_results(resultado_str)
 
     def show_op2_inputs(self):
         self._clear_input_frame()
@@ -166,17 +334,14 @@ class InventarioApp:
             return
 
         # Verificar si el producto existe antes de obtener stock para dar mensaje más claro
-        producto_existe = self._handle_db_call(db_logic.obtener_detalles_producto, pid)
-        if producto_existe is None and self.results_text.get(1.0, tk.END).strip() == "":
-             self._display_results(f"Producto con ID '{pid}' no encontrado.")
-             return
-        elif producto_existe is None: # Error de BD ya mostrado
-            return
-
-        stock = self._handle_db_call(db_logic.obtener_stock, pid)
-        if stock is not None: # Puede ser 0, lo cual es válido
+        def mostrar(resultado):
+            if resultado is None:
+                self._display_results(f"Producto con ID '{pid}' no encontrado.")
+                return
+            _, stock = resultado
             self._display_results(f"Stock general actual del producto {pid}: {stock}")
-        # Si stock es None, el error ya fue manejado por _handle_db_call
+
+        self._handle_db_call(self._si_existe_producto, pid, db_logic.obtener_stock, pid, al_terminar=mostrar)
 
     def show_op3_inputs(self):
         self._clear_input_frame()
@@ -191,22 +356,21 @@ class InventarioApp:
             messagebox.showwarning("Entrada Inválida", "Por favor, ingrese un ID de Producto.")
             return
 
-        producto_existe = self._handle_db_call(db_logic.obtener_detalles_producto, pid)
-        if producto_existe is None and self.results_text.get(1.0, tk.END).strip() == "":
-             self._display_results(f"Producto con ID '{pid}' no encontrado.")
-             return
-        elif producto_existe is None:
-            return
+        def mostrar(resultado):
+            if resultado is None:
+                self._display_results(f"Producto con ID '{pid}' no encontrado.")
+                return
+            _, stock_por_lote = resultado
+            if stock_por_lote:
+                resultado_str = f"Stock desglosado por lote para el producto {pid}:\n"
+                for id_lote, stock_lote_val in stock_por_lote:
+                    resultado_str += f"  Lote {id_lote}: {stock_lote_val}\n"
+                self._display_results(resultado_str)
+            else:
+                self._display_results(f"El producto {pid} existe, pero no tiene lotes con stock activo registrado.")
 
-        stock_por_lote = self._handle_db_call(db_logic.obtener_stock_producto_desglosado_por_lote, pid)
-        if stock_por_lote:
-            resultado_str = f"Stock desglosado por lote para el producto {pid}:\n"
-            for id_lote, stock_lote_val in stock_por_lote:
-                resultado_str += f"  Lote {id_lote}: {stock_lote_val}\n"
-            self._display_results(resultado_str)
-        elif isinstance(stock_por_lote, list) and not stock_por_lote: # Lista vacía, no error
-            self._display_results(f"El producto {pid} existe, pero no tiene lotes con stock activo registrado.")
-        # Si stock_por_lote es None, el error ya fue manejado
+        self._handle_db_call(self._si_existe_producto, pid, db_logic.obtener_stock_producto_desglosado_por_lote, pid,
+                             al_terminar=mostrar)
 
     def show_op4_inputs(self):
         self._clear_input_frame()
@@ -216,25 +380,28 @@ class InventarioApp:
         ttk.Label(self.input_frame, text="ID Lote Proveedor:").grid(row=1, column=0, padx=5, pady=5, sticky="w")
         self.entry_op4_lid = ttk.Entry(self.input_frame, width=30)
         self.entry_op4_lid.grid(row=1, column=1, padx=5, pady=5)
-        ttk.Button(self.input_frame, text="Consultar", command=self.execute_op4).grid(row=2, column=0, columnspan=2, pady=10)
+        ttk.Label(self.input_frame, text="ID Entorno:").grid(row=2, column=0, padx=5, pady=5, sticky="w")
+        self.entry_op4_eid = ttk.Entry(self.input_frame, width=30)
+        self.entry_op4_eid.grid(row=2, column=1, padx=5, pady=5)
+        ttk.Button(self.input_frame, text="Consultar", command=self.execute_op4).grid(row=3, column=0, columnspan=2, pady=10)
 
     def execute_op4(self):
         pid = self.entry_op4_pid.get()
         lid = self.entry_op4_lid.get()
-        if not pid or not lid:
-            messagebox.showwarning("Entrada Inválida", "Por favor, ingrese ID de Producto e ID de Lote.")
+        eid = self.entry_op4_eid.get()
+        if not pid or not lid or not eid:
+            messagebox.showwarning("Entrada Inválida", "Por favor, ingrese ID de Producto, ID de Lote e ID de Entorno.")
             return
 
-        producto_existe = self._handle_db_call(db_logic.obtener_detalles_producto, pid)
-        if producto_existe is None and self.results_text.get(1.0, tk.END).strip() == "":
-             self._display_results(f"Producto con ID '{pid}' no encontrado.")
-             return
-        elif producto_existe is None:
-            return
+        def mostrar(resultado):
+            if resultado is None:
+                self._display_results(f"Producto con ID '{pid}' no encontrado.")
+                return
+            _, stock_lote_val = resultado
+            self._display_results(f"Stock del lote '{lid}' para el producto '{pid}': {stock_lote_val} en el entorno: {eid}")
 
-        stock_lote_val = self._handle_db_call(db_logic.obtener_stock_producto_lote, pid, lid)
-        if stock_lote_val is not None:
-            self._display_results(f"Stock del lote '{lid}' para el producto '{pid}': {stock_lote_val}")
+        self._handle_db_call(self._si_existe_producto, pid, db_logic.obtener_stock_producto_lote, pid, lid, eid,
+                             al_terminar=mostrar)
 
     def show_op5_inputs(self):
         self._clear_input_frame()
@@ -249,31 +416,27 @@ class InventarioApp:
             messagebox.showwarning("Entrada Inválida", "Por favor, ingrese un ID de Entorno.")
             return
 
-        productos_en_entorno = self._handle_db_call(db_logic.producto_entorno, entorno_id)
-        if productos_en_entorno:
-            resultado_str = f"Productos presentes en el entorno {entorno_id}:\n"
-            for p_info in productos_en_entorno:
-                resultado_str += f"  ID Producto: {p_info[0]}\n" # p_info es una tupla con un solo elemento
-            self._display_results(resultado_str)
-        elif isinstance(productos_en_entorno, list) and not productos_en_entorno:
-            self._display_results(f"No se encontraron productos en el entorno {entorno_id}, el entorno no existe o no tiene movimientos.")
+        def mostrar(productos_en_entorno):
+            if productos_en_entorno:
+                resultado_str = f"Productos presentes en el entorno {entorno_id}:\n"
+                for p_info in productos_en_entorno:
+                    resultado_str += f"  ID Producto: {p_info[0]}\n"
+                self._display_results(resultado_str)
+            else:
+                self._display_results(f"No se encontraron productos en el entorno {entorno_id}, el entorno no existe o no tiene movimientos.")
+
+        self._handle_db_call(db_logic.producto_entorno, entorno_id, al_terminar=mostrar)
 
     def execute_op6_direct(self): # No necesita show_inputs
         self._clear_input_frame() # Limpiar por si había algo
-        stock_productos = self._handle_db_call(db_logic.obtener_stock_todos_productos)
-        if stock_productos:
-            resultado_str = "--- STOCK DE TODOS LOS PRODUCTOS ---\n"
-            for id_p, nombre_p, stock_p in stock_productos:
-                resultado_str += f"ID: {id_p}, Nombre: {nombre_p}, Stock: {stock_p}\n"
-            self._display_results(resultado_str)
-        elif isinstance(stock_productos, list) and not stock_productos:
-             self._display_results("No hay productos en la base de datos o no se pudo obtener el stock.")
+        # Paginación por clave: cada página es una consulta corta, aunque haya cientos de miles de productos
+        self._mostrar_tabla(COLUMN_NAMES_STOCK, db_logic.iterar_paginas_stock_productos(tamano_pagina=TAMANO_PAGINA_TABLA),
+                            "No hay productos en la base de datos o no se pudo obtener el stock.")
 
     def execute_op7_direct(self): # No necesita show_inputs
         self._clear_input_frame()
-        total_dañados = self._handle_db_call(db_logic.cantidad_productos_dañados)
-        if total_dañados is not None:
-            self._display_results(f"Total de dispositivos (tipo 'DISPOSITIVO') en estado 'DAÑADO': {total_dañados}")
+        self._handle_db_call(db_logic.cantidad_productos_dañados, al_terminar=lambda total_dañados: self._display_results(
+            f"Total de dispositivos (tipo 'DISPOSITIVO') en estado 'DAÑADO': {total_dañados}"))
 
     def show_op8_inputs(self):
         self._clear_input_frame()
@@ -291,16 +454,9 @@ class InventarioApp:
             messagebox.showwarning("Formato Inválido", "El formato de fecha debe ser YYYY-MM-DD.")
             return
 
-        detalles_entradas = self._handle_db_call(db_logic.obtener_detalles_entradas_en_un_dia, fecha)
-        if detalles_entradas:
-            resultado_str = f"--- Detalles de Entradas en {fecha} ---\n"
-            for entrada in detalles_entradas:
-                for i, col_name in enumerate(COLUMN_NAMES_MOVIMIENTOS):
-                    resultado_str += f"  {col_name}: {entrada[i]}\n"
-                resultado_str += "-" * 20 + "\n"
-            self._display_results(resultado_str)
-        elif isinstance(detalles_entradas, list) and not detalles_entradas:
-            self._display_results(f"No se encontraron entradas para la fecha {fecha}.")
+        # No consulta hasta que la tabla pide la primera página; cada página es una consulta aparte
+        lotes_entradas = db_logic.iterar_paginas_entradas_en_un_dia(fecha, TAMANO_PAGINA_TABLA)
+        self._mostrar_tabla(COLUMN_NAMES_MOVIMIENTOS, lotes_entradas, f"No se encontraron entradas para la fecha {fecha}.")
 
     def show_op9_inputs(self):
         self._clear_input_frame()
@@ -318,23 +474,17 @@ class InventarioApp:
             messagebox.showwarning("Formato Inválido", "El formato de fecha debe ser YYYY-MM-DD.")
             return
 
-        detalles_salidas = self._handle_db_call(db_logic.obtener_detalles_salidas_en_un_dia, fecha)
-        if detalles_salidas:
-            resultado_str = f"--- Detalles de Salidas en {fecha} ---\n"
-            for salida in detalles_salidas:
-                for i, col_name in enumerate(COLUMN_NAMES_MOVIMIENTOS):
-                     resultado_str += f"  {col_name}: {salida[i]}\n"
-                resultado_str += "-" * 20 + "\n"
-            self._display_results(resultado_str)
-        elif isinstance(detalles_salidas, list) and not detalles_salidas:
-            self._display_results(f"No se encontraron salidas para la fecha {fecha}.")
+        # No consulta hasta que la tabla pide la primera página; cada página es una consulta aparte
+        lotes_salidas = db_logic.iterar_paginas_salidas_en_un_dia(fecha, TAMANO_PAGINA_TABLA)
+        self._mostrar_tabla(COLUMN_NAMES_MOVIMIENTOS, lotes_salidas, f"No se encontraron salidas para la fecha {fecha}.")
 
     def show_op10_inputs(self):
         self._clear_input_frame()
         ttk.Label(self.input_frame, text="Nombre Operador:").grid(row=0, column=0, padx=5, pady=5, sticky="w")
         self.entry_op10_operador = ttk.Entry(self.input_frame, width=30)
         self.entry_op10_operador.grid(row=0, column=1, padx=5, pady=5)
-        ttk.Button(self.input_frame, text="Consultar", command=self.execute_op10).grid(row=1, column=0, columnspan=2, pady=10)
+        ttk.Button(self.input_frame, text="Consultar", command=self.execute_op10).grid(row=1, column=0, pady=10)
+        ttk.Button(self.input_frame, text="Todos los operadores", command=self.execute_op10_todos).grid(row=1, column=1, pady=10)
 
     def execute_op10(self):
         operador_nombre = self.entry_op10_operador.get()
@@ -342,15 +492,24 @@ class InventarioApp:
             messagebox.showwarning("Entrada Inválida", "Por favor, ingrese un nombre de operador.")
             return
 
-        num_sim_operador = self._handle_db_call(db_logic.obtener_sim_de_operador, operador_nombre)
-        if num_sim_operador is not None:
-            self._display_results(f"Total de SIM cards (stock) del operador '{operador_nombre}': {num_sim_operador}")
+        self._handle_db_call(db_logic.obtener_sim_de_operador, operador_nombre, al_terminar=lambda num_sim_operador: self._display_results(
+            f"Total de SIM cards (stock) del operador '{operador_nombre}': {num_sim_operador}"))
+
+    def execute_op10_todos(self):
+        def mostrar(por_operador):
+            if por_operador is None:
+                self._display_results("No se pudo consultar el stock de SIM cards.")
+                return
+            lineas = ["--- Stock de SIM cards por operador ---\n"]
+            lineas.extend(f"{operador:<10} {stock}\n" for operador, stock in por_operador.items())
+            self._display_results("".join(lineas))
+
+        self._handle_db_call(db_logic.obtener_sim_por_operador, al_terminar=mostrar)
 
     def execute_op11_direct(self): # No necesita show_inputs
         self._clear_input_frame()
-        total_sims = self._handle_db_call(db_logic.obtener_sim_total)
-        if total_sims is not None:
-            self._display_results(f"Total de SIM cards (tipo 'SIM') registradas en la tabla producto: {total_sims}")
+        self._handle_db_call(db_logic.obtener_sim_total, al_terminar=lambda total_sims: self._display_results(
+            f"Total de SIM cards (tipo 'SIM') registradas en la tabla producto: {total_sims}"))
 
     def mostrar_entrada_op12(self):
         self._clear_input_frame()
@@ -360,44 +519,183 @@ class InventarioApp:
         ttk.Button(self.input_frame, text="Consultar", command=self.ejecutar_op12).grid(row=1, column=0, columnspan=2, pady=10)
 
     def ejecutar_op12(self):
-        id_imagen = self.entry_op12.get
+        id_imagen = self.entry_op12.get().strip()
         if not id_imagen:
+            messagebox.showwarning("Entrada Inválida", "Por favor, ingrese un ID de producto.")
+            return
+
+        def mostrar(miniatura):
+            if miniatura is not None:
+                self._mostrar_imagen(miniatura, f"Producto {id_imagen}")
+            else:
+                self._display_results(f"El producto {id_imagen} no existe, no tiene imagen o el archivo ya no está en el disco.")
+
+        # Consulta, decodificación y miniatura (o lectura de la caché) corren en el hilo de trabajo
+        self._handle_db_call(db_logic.obtener_miniatura_producto, id_imagen, al_terminar=mostrar)
 
-            return 
-        
-        ruta_imagen = self._handle_db_call(db_logic.mostrar_ruta_imagen, id_imagen) 
-        if ruta_imagen is not None: 
-            image = Image.open(ruta_imagen)
-            image = image.resize((300, 300))
-            image_tk = ImageTk.PhotoImage()  
-            self.results_frame.config(image=image_tk)
-            self.results_frame.image = image_tk  # Mantener referencia
+    def show_op13_inputs(self):
+        self._clear_input_frame()
+        etiquetas = ["Fecha inicio (YYYY-MM-DD):", "Fecha fin (YYYY-MM-DD):", "ID Producto (opcional):", "ID Entorno (opcional):"]
+        self.entries_op13 = []
+        for fila, texto in enumerate(etiquetas):
+            ttk.Label(self.input_frame, text=texto).grid(row=fila, column=0, padx=5, pady=5, sticky="w")
+            entry = ttk.Entry(self.input_frame, width=30)
+            entry.grid(row=fila, column=1, padx=5, pady=5)
+            self.entries_op13.append(entry)
+        ttk.Label(self.input_frame, text="Tipo (opcional):").grid(row=4, column=0, padx=5, pady=5, sticky="w")
+        self.combo_op13_tipo = ttk.Combobox(self.input_frame, values=["", "ENTRADA", "SALIDA", "DEVOLUCION", "MANTENIMIENTO"],
+                                            state="readonly", width=27)
+        self.combo_op13_tipo.grid(row=4, column=1, padx=5, pady=5)
+        ttk.Button(self.input_frame, text="Consultar", command=self.execute_op13).grid(row=5, column=0, columnspan=2, pady=10)
+
+    def execute_op13(self):
+        inicio, fin, pid, eid = [entry.get().strip() for entry in self.entries_op13]
+        tipo = self.combo_op13_tipo.get()
+        if not self._validate_date_format(inicio) or not self._validate_date_format(fin):
+            messagebox.showwarning("Formato Inválido", "Las fechas deben tener formato YYYY-MM-DD.")
+            return
+        if inicio > fin:
+            messagebox.showwarning("Rango Inválido", "La fecha inicial no puede ser posterior a la final.")
+            return
+
+        def mostrar(filas):
+            if filas:
+                lineas = [f"--- Movimientos entre {inicio} y {fin} ---\n"]
+                for fecha, id_producto, id_entorno, tipo_mov, cantidad, movimientos in filas:
+                    lineas.append(f"{fecha}  {id_producto}  {id_entorno}  {tipo_mov}: {cantidad} ({movimientos} movimientos)\n")
+                self._display_results("".join(lineas))
+            else:
+                self._display_results(f"No se encontraron movimientos entre {inicio} y {fin}.")
+
+        self._handle_db_call(resumen_diario.obtener_resumen_movimientos, inicio, fin,
+                             pid or None, None, eid or None, tipo or None, al_terminar=mostrar)
+
+    def show_op14_metricas(self):
+        self._clear_input_frame()
+        ttk.Button(self.input_frame, text="Actualizar", command=self.show_op14_metricas).grid(row=0, column=0, padx=5, pady=10)
+        ttk.Button(self.input_frame, text="Exportar (Prometheus)...", command=self.exportar_metricas).grid(row=0, column=1, padx=5, pady=10)
+        # Las métricas están en memoria: no hace falta pasar por el hilo de trabajo
+        self._cerrar_stream_activo()
+        estadisticas = db_logic.estadisticas_pool()
+        self._display_results(
+            "--- Métricas de consultas (por plantilla, desde que se abrió la aplicación) ---\n"
+            + metricas.resumen_texto(db_logic.metricas_consultas.instantanea())
+            + f"\n\nPool: {estadisticas['en_uso']} en uso, {estadisticas['libres']} libres, "
+              f"{estadisticas['esperas']} esperas, {estadisticas['reconexiones']} reconexiones")
+
+    def exportar_metricas(self):
+        ruta = filedialog.asksaveasfilename(title="Exportar métricas", defaultextension=".prom",
+                                            filetypes=[("Prometheus", "*.prom"), ("Texto", "*.txt")])
+        if ruta:
+            db_logic.exportar_metricas(ruta)
+            messagebox.showinfo("Métricas Exportadas", f"Métricas guardadas en {ruta}")
+
+    def show_op15_tablero(self):
+        self._clear_input_frame()
+        ttk.Button(self.input_frame, text="Actualizar ahora", command=lambda: self._refrescar_tablero(forzar=True)).grid(
+            row=0, column=0, padx=5, pady=10)
+        self.var_tablero_auto = tk.BooleanVar(value=True)
+        ttk.Checkbutton(self.input_frame, text="Actualizar automáticamente cada", variable=self.var_tablero_auto,
+                        command=self._programar_tablero).grid(row=0, column=1, padx=5, pady=10)
+        self.var_tablero_intervalo = tk.IntVar(value=INTERVALO_TABLERO_S)
+        ttk.Spinbox(self.input_frame, from_=5, to=600, increment=5, width=5, textvariable=self.var_tablero_intervalo,
+                    command=self._programar_tablero).grid(row=0, column=2, pady=10)
+        ttk.Label(self.input_frame, text="segundos").grid(row=0, column=3, padx=5, pady=10, sticky="w")
+        self._tablero_activo = True
+        self._refrescar_tablero(forzar=True) # Al abrir, todas las cifras en una sola tanda
+
+    def _marcar_metricas_cambiadas(self, cambios):
+        # Oyente del feed (corre en su hilo): solo anota qué cifras quedaron viejas, la consulta la hace el tablero
+        if not self._tablero_activo: # Al volver a abrirse, el tablero consulta todo de nuevo
+            return
+        if any(fila[2] in ("ENTRADA", "SALIDA") for fila in cambios): # Los únicos que mueven el saldo
+            self._tablero_cambios["stock_entornos"] += 1
+        if any(fila[7] == "DAÑADO" for fila in cambios):
+            self._tablero_cambios["danados"] += 1
+        if self._tablero_vistos["sim"] == self._tablero_cambios["sim"] and db_logic.cambios_tocan_sims(cambios):
+            self._tablero_cambios["sim"] += 1
+
+    def _refrescar_tablero(self, forzar: bool = False):
+        self._tablero_tarea = None
+        if not self._tablero_activo:
+            return
+        if forzar: # También cubre lo que el feed no ve (UPDATE y DELETE sobre el kardex)
+            pendientes = list(self._tablero_cambios)
+        else:
+            pendientes = [nombre for nombre, version in self._tablero_cambios.items() if version != self._tablero_vistos[nombre]]
+        if pendientes:
+            versiones = {nombre: self._tablero_cambios[nombre] for nombre in pendientes}
+
+            def recibir(valores):
+                for nombre, valor in valores.items():
+                    if valor is not None: # Si la consulta falló, la cifra sigue pendiente para la próxima vuelta
+                        self._tablero_valores[nombre] = valor
+                        self._tablero_vistos[nombre] = versiones[nombre]
+                if self._tablero_activo:
+                    self._mostrar_tablero()
+
+            # Las cifras pendientes salen en una sola tanda concurrente (oficial_async)
+            self._handle_db_call(oficial_async.obtener_metricas, pendientes, al_terminar=recibir)
+        self._programar_tablero()
+
+    def _programar_tablero(self):
+        if self._tablero_tarea is not None:
+            self.root.after_cancel(self._tablero_tarea)
+            self._tablero_tarea = None
+        if not self._tablero_activo or not self.var_tablero_auto.get():
+            return
+        try:
+            segundos = max(int(self.var_tablero_intervalo.get()), 1)
+        except (tk.TclError, ValueError): # Texto no numérico en el selector
+            segundos = INTERVALO_TABLERO_S
+        self._tablero_tarea = self.root.after(segundos * 1000, self._refrescar_tablero)
+
+    def _detener_tablero(self):
+        self._tablero_activo = False
+        if self._tablero_tarea is not None:
+            self.root.after_cancel(self._tablero_tarea)
+            self._tablero_tarea = None
+
+    def _mostrar_tablero(self):
+        stock_entornos = self._tablero_valores.get("stock_entornos")
+        sims = self._tablero_valores.get("sim")
+        lineas = [f"--- Tablero de inventario (actualizado {datetime.now():%H:%M:%S}) ---\n\n"]
+        if stock_entornos is None:
+            lineas.append("Stock total: sin datos\n")
+        else:
+            stock_total = sum(stock for _id, _nombre, stock in stock_entornos)
+            lineas.append(f"Stock total: {stock_total} unidades\n")
+        lineas.append(f"Dispositivos en estado 'DAÑADO': {self._tablero_valores.get('danados', 'sin datos')}\n")
+        if sims is None:
+            lineas.append("\nSIM cards: sin datos\n")
+        else:
+            lineas.append(f"\nSIM cards en stock: {sum(sims.values())}\n")
+            lineas.extend(f"  {operador:<10} {stock}\n" for operador, stock in sims.items())
+        if stock_entornos:
+            lineas.append("\n--- Ocupación por entorno ---\n")
+            for id_entorno, nombre, stock in stock_entornos:
+                porcentaje = stock * 100 / stock_total if stock_total else 0
+                lineas.append(f"  {id_entorno:<12} {nombre or '':<30} {stock:>10} ({porcentaje:.1f}%)\n")
+        self._display_results("".join(lineas))
 
 if __name__ == "__main__":
     # Test de conexión inicial para feedback temprano si la BD no está accesible
     try:
-        # Intentar una conexión simple para ver si la BD está arriba
-        # Esto no es parte de db_logic.conexion_BD() para no acoplarlo tanto al inicio
-        conn_test = db_logic.mysql.connector.connect(
-            host=db_logic.DB_HOST,
-            user=db_logic.DB_USER,
-            password=db_logic.DB_PASSWORD,
-            database=db_logic.DB_NAME,
-            connection_timeout=5 # Timeout corto
-        )
+        # Intentar una conexión simple para ver si la BD está arriba, sin pasar por el pool
+        conn_test = db_logic.motor.conectar()
         conn_test.close()
 
         app_root = tk.Tk()
         app = InventarioApp(app_root)
         app_root.mainloop()
 
-    except db_logic.mysql.connector.Error as err:
+    except db_logic.DatabaseError as err:
         # Crear una ventana raíz temporal solo para mostrar el error si la conexión inicial falla
         error_root = tk.Tk()
         error_root.withdraw() # Ocultar la ventana principal vacía
         messagebox.showerror("Error Crítico de Conexión",
-                             f"No se pudo conectar a la base de datos '{db_logic.DB_NAME}' en {db_logic.DB_HOST}.\n"
-                             f"Verifique que el servidor MySQL esté en ejecución y las credenciales sean correctas.\n\n"
+                             f"No se pudo conectar a la base de datos ({db_logic.motor.descripcion()}).\n"
+                             f"Verifique que el servidor esté en ejecución y las credenciales sean correctas.\n\n"
                              f"Detalle: {err}")
         error_root.destroy()
     except Exception as e:
@@ -0,0 +1,203 @@
+import argparse
+import csv
+import hashlib
+import json
+import os
+import time
+from datetime import date, datetime
+from itertools import islice
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Tuple
+
+from oficial import cache_sim, ejecutar_query, transaccion
+
+TIPOS_MOVIMIENTO = {"ENTRADA", "SALIDA", "DEVOLUCION", "MANTENIMIENTO"}
+ESTADOS = {"NUEVO", "ACTIVO", "USADO", "REACONDICIONADO", "DAÑADO"}
+COLUMNAS = ("fecha", "tipo_movimiento", "id_producto", "id_lote", "cantidad", "id_entorno", "estado_post_movimiento")
+
+# num_movimiento se omite: lo asigna el AUTO_INCREMENT (migración 005)
+SQL_INSERTAR_MOVIMIENTO = (
+    "INSERT INTO movimiento_kardex (" + ", ".join(COLUMNAS) + ") "
+    "VALUES (" + ", ".join(["%s"] * len(COLUMNAS)) + ")"
+)
+
+# Avance de una carga (migración 010): se guarda en la misma transacción que cada lote
+SQL_GUARDAR_AVANCE = (
+    "INSERT INTO avance_ingesta (proceso, huella, registros_procesados, actualizado) VALUES (%s, %s, %s, NOW()) "
+    "ON DUPLICATE KEY UPDATE huella = VALUES(huella), registros_procesados = VALUES(registros_procesados), "
+    "actualizado = NOW();"
+)
+
+class CatalogoValidacion:
+    """Conjuntos en memoria de productos, lotes y entornos válidos.
+
+    Se cargan una sola vez por ingesta para no consultar la BD por cada fila.
+    """
+
+    def __init__(self):
+        productos = ejecutar_query("SELECT id_producto FROM producto;")
+        lotes = ejecutar_query("SELECT id_lote, id_producto FROM lote;")
+        entornos = ejecutar_query("SELECT id_entorno FROM entorno_almacenamiento;")
+        if productos is None or lotes is None or entornos is None:
+            raise RuntimeError("No se pudieron cargar los catálogos de validación")
+        self.productos = {fila[0] for fila in productos}
+        self.lote_producto = {id_lote: id_producto for id_lote, id_producto in lotes}
+        self.entornos = {fila[0] for fila in entornos}
+
+    def validar(self, registro: Dict[str, Any]) -> Tuple[Optional[tuple], Optional[str]]:
+        """Devuelve (fila lista para insertar, None) o (None, motivo del rechazo)."""
+        faltantes = [col for col in COLUMNAS if col != "estado_post_movimiento" and not registro.get(col)]
+        if faltantes:
+            return None, f"faltan columnas: {', '.join(faltantes)}"
+
+        tipo = str(registro["tipo_movimiento"]).strip().upper()
+        if tipo not in TIPOS_MOVIMIENTO:
+            return None, f"tipo_movimiento inválido: {registro['tipo_movimiento']}"
+        estado = registro.get("estado_post_movimiento")
+        estado = str(estado).strip().upper() if estado else None
+        if estado is not None and estado not in ESTADOS:
+            return None, f"estado_post_movimiento inválido: {estado}"
+
+        fecha = registro["fecha"]
+        if not isinstance(fecha, date):
+            try:
+                fecha = datetime.strptime(str(fecha).strip(), "%Y-%m-%d").date()
+            except ValueError:
+                return None, f"fecha inválida: {registro['fecha']}"
+        try:
+            cantidad = int(registro["cantidad"])
+        except (TypeError, ValueError):
+            return None, f"cantidad inválida: {registro['cantidad']}"
+        if cantidad <= 0:
+            return None, f"la cantidad debe ser positiva: {cantidad}"
+
+        id_producto = str(registro["id_producto"]).strip()
+        id_lote = str(registro["id_lote"]).strip()
+        id_entorno = str(registro["id_entorno"]).strip()
+        if id_producto not in self.productos:
+            return None, f"producto inexistente: {id_producto}"
+        if id_entorno not in self.entornos:
+            return None, f"entorno inexistente: {id_entorno}"
+        if self.lote_producto.get(id_lote) != id_producto:
+            return None, f"el lote {id_lote} no existe o no pertenece al producto {id_producto}"
+
+        return (fecha, tipo, id_producto, id_lote, cantidad, id_entorno, estado), None
+
+def leer_csv(ruta: str) -> Iterator[Dict[str, Any]]:
+    with open(ruta, newline="", encoding="utf-8") as archivo:
+        yield from csv.DictReader(archivo)
+
+def leer_jsonl(ruta: str) -> Iterator[Dict[str, Any]]:
+    with open(ruta, encoding="utf-8") as archivo:
+        for linea in archivo:
+            if linea.strip():
+                yield json.loads(linea)
+
+def leer_archivo(ruta: str) -> Iterator[Dict[str, Any]]:
+    if ruta.lower().endswith((".jsonl", ".ndjson")):
+        return leer_jsonl(ruta)
+    return leer_csv(ruta)
+
+def proceso_de_archivo(ruta: str) -> str:
+    # Nombre del avance de una carga: el hash de la ruta absoluta, así dos archivos con el mismo nombre
+    # en distintas carpetas (o con nombres largos que empiezan igual) no comparten avance
+    return "ingesta:" + hashlib.sha1(os.path.abspath(ruta).encode("utf-8")).hexdigest()
+
+def huella_de_archivo(ruta: str) -> str: # Tamaño y fecha de modificación: si cambian, el avance guardado ya no vale
+    info = os.stat(ruta)
+    return f"{info.st_size}:{info.st_mtime_ns}"
+
+def leer_avance(proceso: str) -> Optional[Tuple[int, Optional[str]]]:
+    # (registros ya procesados, huella del archivo) o None si el proceso no tiene avance guardado
+    resultado = ejecutar_query("SELECT registros_procesados, huella FROM avance_ingesta WHERE proceso = %s;", (proceso,))
+    if resultado is None: # Tomarlo como "sin avance" volvería a cargar lo ya confirmado
+        raise RuntimeError(f"No se pudo leer el avance de la carga {proceso}")
+    return (int(resultado[0][0]), resultado[0][1]) if resultado else None
+
+def borrar_avance(proceso: str) -> None:
+    with transaccion() as cursor:
+        cursor.execute("DELETE FROM avance_ingesta WHERE proceso = %s;", (proceso,))
+
+def ingestar_movimientos(registros: Iterable[Dict[str, Any]], tamano_lote: int = 1000,
+                         proceso: Optional[str] = None,
+                         catalogo: Optional[CatalogoValidacion] = None,
+                         huella: Optional[str] = None) -> Dict[str, Any]:
+    """Valida e inserta movimientos en lotes de `tamano_lote`, uno por transacción.
+
+    Con `proceso`, cada lote guarda en avance_ingesta cuántos registros de
+    la entrada ya se procesaron, en la misma transacción que sus filas: o
+    se confirman ambos o ninguno. Al reintentar con la misma entrada se
+    saltan esos registros y no se vuelve a cargar ningún lote confirmado.
+    Si el avance se guardó con otra `huella` (ver huella_de_archivo) la
+    entrada no es la misma y se lanza ValueError en lugar de saltar
+    registros. Las filas inválidas se rechazan sin detener la carga.
+    """
+    avance = leer_avance(proceso) if proceso else None
+    if avance is not None and huella is not None and avance[1] is not None and avance[1] != huella:
+        raise ValueError(f"La entrada cambió desde la carga interrumpida ({avance[0]} registros procesados): "
+                         f"no se puede reanudar")
+    catalogo = catalogo or CatalogoValidacion()
+    ya_procesados = avance[0] if avance is not None else 0
+    entrada = islice(iter(registros), ya_procesados, None)
+
+    procesados = ya_procesados
+    insertados = 0
+    rechazados: List[Tuple[int, str]] = []
+    inicio = time.perf_counter()
+    while True:
+        bloque = list(islice(entrada, tamano_lote))
+        if not bloque:
+            break
+        filas = []
+        for posicion, registro in enumerate(bloque, start=procesados + 1):
+            fila, motivo = catalogo.validar(registro)
+            if fila is None:
+                rechazados.append((posicion, motivo))
+            else:
+                filas.append(fila)
+        if filas or proceso:
+            with transaccion() as cursor:
+                if filas:
+                    cursor.executemany(SQL_INSERTAR_MOVIMIENTO, filas)
+                if proceso:
+                    cursor.execute(SQL_GUARDAR_AVANCE, (proceso, huella, procesados + len(bloque)))
+            if filas: # El stock de SIMs cacheado ya no vale; no esperar a que lo note el feed
+                cache_sim.limpiar()
+        insertados += len(filas)
+        procesados += len(bloque)
+
+    segundos = time.perf_counter() - inicio
+    return {
+        "procesados": procesados - ya_procesados,
+        "insertados": insertados,
+        "rechazados": rechazados,
+        "reanudado_desde": ya_procesados,
+        "segundos": segundos,
+        "filas_por_segundo": insertados / segundos if segundos > 0 else 0.0,
+    }
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Carga masiva de movimientos al kardex desde CSV o JSONL.")
+    parser.add_argument("archivo", help="Ruta del archivo .csv o .jsonl con los movimientos")
+    parser.add_argument("--lote", type=int, default=1000, help="Filas por transacción (por defecto 1000)")
+    parser.add_argument("--proceso", help="Nombre del avance en avance_ingesta para reanudar (por defecto, uno por ruta del archivo)")
+    parser.add_argument("--desde-cero", action="store_true", help="Descarta el avance guardado y carga el archivo completo")
+    args = parser.parse_args()
+
+    proceso = args.proceso or proceso_de_archivo(args.archivo)
+    if args.desde_cero:
+        borrar_avance(proceso)
+    try:
+        resumen = ingestar_movimientos(leer_archivo(args.archivo), args.lote, proceso,
+                                       huella=huella_de_archivo(args.archivo))
+    except ValueError as err:
+        parser.error(f"{err}. Use --desde-cero para cargarlo completo (las filas ya cargadas se repetirían).")
+    if resumen["reanudado_desde"]:
+        print(f"Reanudado después de {resumen['reanudado_desde']} registros ya cargados.")
+    print(f"Procesados: {resumen['procesados']}  Insertados: {resumen['insertados']}  "
+          f"Rechazados: {len(resumen['rechazados'])}")
+    print(f"Tiempo: {resumen['segundos']:.2f} s  ({resumen['filas_por_segundo']:.0f} filas/s)")
+    for posicion, motivo in resumen["rechazados"][:20]:
+        print(f"  Registro {posicion}: {motivo}")
+    if len(resumen["rechazados"]) > 20:
+        print(f"  ... y {len(resumen['rechazados']) - 20} rechazos más")
+    borrar_avance(proceso) # La carga terminó: una nueva ejecución empieza desde cero
@@ -1,38 +1,62 @@
-import mysql.connector
-from typing import List, Tuple, Any, Optional
+from typing import List, Tuple, Any, Optional, Dict, Iterable, Iterator
+import atexit
+import os
+import threading
+from pool_conexiones import PoolConexiones, PoolAgotado
+import motores_bd
+
+DB_HOST = "localhost"
+DB_USER = "root"
+DB_PASSWORD = "Pata2021."
+DB_NAME = "BD_proyecto_2"
+POOL_TAMANO = int(os.environ.get("BD_POOL_TAMANO", "5"))
+MOTOR_BD = os.environ.get("BD_MOTOR", "mysql").lower() # "mysql" o "sqlite"
+SQLITE_RUTA = os.environ.get("BD_SQLITE_RUTA", os.path.join(os.path.dirname(os.path.abspath(__file__)), "inventario.sqlite3"))
+
+
+class ListadoIncompleto(Exception):
+    """Falló la consulta de una página a mitad de un listado paginado: lo ya entregado no es el listado completo."""
+
+
+motor = motores_bd.crear_motor(MOTOR_BD, SQLITE_RUTA, DB_HOST, DB_USER, DB_PASSWORD, DB_NAME) # Misma validación que oficial.py
 
 def conexion_BD():
     try:
-        conexion = mysql.connector.connect(
-            host="localhost",
-            user="root",
-            password="Pata2021.",
-            database="BD_proyecto_2"
-        )
-        return conexion
-    except mysql.connector.Error as err:
+        return motor.conectar()
+    except motores_bd.ERRORES_BD as err:
         print(f"Conexión con la BD fallida: {err}")
         return None
 
+_pool: Optional[PoolConexiones] = None
+_pool_lock = threading.Lock()
+
+def obtener_pool() -> PoolConexiones:
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            _pool = PoolConexiones(motor.conectar, tamano=POOL_TAMANO, verificar=motor.verificar)
+        return _pool
+
+def estadisticas_pool() -> Dict[str, int]:
+    return obtener_pool().estadisticas()
+
+@atexit.register
+def cerrar_pool() -> None:
+    if _pool is not None:
+        _pool.cerrar()
+
 def ejecutar_query(query_string: str, params: Optional[tuple] = None) -> Optional[List[Tuple[Any, ...]]]:
-    conexion = None
     try:
-        conexion = conexion_BD()
-        if conexion is None:
-            return None
-
-        cursor = conexion.cursor()
-        cursor.execute(query_string, params)
-        results = cursor.fetchall()
-        return results
-    except mysql.connector.Error as err:
+        with obtener_pool().conexion() as conexion:
+            cursor = conexion.cursor()
+            try:
+                cursor.execute(query_string, params)
+                return cursor.fetchall()
+            finally:
+                cursor.close()
+    except motores_bd.ERRORES_BD + (PoolAgotado,) as err:
         print(f"Error al ejecutar el query: {err}\nQuery: {query_string}\nParams: {params}")
         return None
-    finally:
-        if conexion and conexion.is_connected():
-            cursor.close()
-            conexion.close()
-            print("Conexión cerrada.")
 
 def obtener_detalles_producto(product_id: str) -> Optional[Tuple[Any, ...]]:
     query = "SELECT * FROM producto WHERE id_producto = %s"
@@ -105,19 +129,65 @@ def obtener_sim_de_operador(operator_name: str
 
 
 
-def obtener_stock_todos_productos() -> List[Tuple[str, str, int]]:
-    query_productos = "SELECT id_producto, nombre FROM producto;"
-    productos = ejecutar_query(query_productos)
-    
-    if not productos:
-        return []
-        
-    stock_total = []
-    for id_producto, nombre_producto in productos:
-        stock = obtener_stock(id_producto)
-        stock_total.append((id_producto, nombre_producto, stock))
-        
-    return stock_total
+SQL_STOCK_PRODUCTOS = """
+SELECT p.id_producto, p.nombre,
+       COALESCE(SUM(CASE mk.tipo_movimiento
+                     WHEN 'ENTRADA' THEN mk.cantidad
+                     WHEN 'SALIDA' THEN -mk.cantidad
+                     ELSE 0
+                    END), 0) AS stock_actual
+FROM producto p
+LEFT JOIN movimiento_kardex mk ON mk.id_producto = p.id_producto
+WHERE {filtro}
+GROUP BY p.id_producto, p.nombre
+ORDER BY p.id_producto
+LIMIT %s;
+"""
+
+def obtener_pagina_stock_productos(desde_id: str = "", tamano_pagina: int = 1000, ids: Optional[List[str]] = None) -> Optional[List[Tuple[str, str, int]]]:
+    # Una sola consulta agrupada por página; paginación por clave (id_producto > último id visto)
+    if ids is None:
+        query = SQL_STOCK_PRODUCTOS.format(filtro="p.id_producto > %s")
+        params = (desde_id, tamano_pagina)
+    else:
+        if not ids:
+            return []
+        marcadores = ", ".join(["%s"] * len(ids))
+        query = SQL_STOCK_PRODUCTOS.format(filtro=f"p.id_producto > %s AND p.id_producto IN ({marcadores})")
+        params = (desde_id, *ids, tamano_pagina)
+    resultados = ejecutar_query(query, params)
+    if resultados is None:
+        return None
+    return [(id_producto, nombre, int(stock)) for id_producto, nombre, stock in resultados]
+
+def iterar_stock_productos(ids: Optional[Iterable[str]] = None, tamano_pagina: int = 1000) -> Iterator[Tuple[str, str, int]]:
+    # Recorre el stock de todos los productos (o solo de `ids`) página a página, sin cargarlo entero en memoria
+    if ids is None:
+        ultimo_id = ""
+        while True:
+            pagina = obtener_pagina_stock_productos(ultimo_id, tamano_pagina)
+            if pagina is None:
+                raise ListadoIncompleto(f"No se pudo leer la página de stock después del producto '{ultimo_id}'")
+            if not pagina:
+                return
+            yield from pagina
+            if len(pagina) < tamano_pagina:
+                return
+            ultimo_id = pagina[-1][0]
+    else:
+        ids_ordenados = sorted(set(ids))
+        for inicio in range(0, len(ids_ordenados), tamano_pagina):
+            pagina = obtener_pagina_stock_productos("", tamano_pagina, ids_ordenados[inicio:inicio + tamano_pagina])
+            if pagina is None:
+                raise ListadoIncompleto(f"No se pudo leer la página {inicio // tamano_pagina + 1} del stock por ids")
+            yield from pagina
+
+def obtener_stock_todos_productos(ids: Optional[Iterable[str]] = None, tamano_pagina: int = 1000) -> Optional[List[Tuple[str, str, int]]]:
+    try:
+        return list(iterar_stock_productos(ids, tamano_pagina))
+    except ListadoIncompleto as err: # None ante un error, nunca una lista a medias
+        print(err)
+        return None
 
 
 if __name__ == "__main__":
@@ -0,0 +1,168 @@
+import logging
+import os
+import re
+import threading
+from functools import lru_cache
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Callable, Dict, List, Optional, Sequence
+
+logger_lentas = logging.getLogger("consultas_lentas")
+
+CAMPOS = ("llamadas", "errores", "lentas", "segundos_conexion", "segundos_ejecucion", "segundos_lectura", "filas", "bytes")
+
+# Nombre, tipo y descripción de cada campo en el formato de Prometheus
+METRICAS_PROMETHEUS = [
+    ("llamadas", "bd_consultas_total", "counter", "Consultas ejecutadas"),
+    ("errores", "bd_consultas_errores_total", "counter", "Consultas que terminaron en error"),
+    ("lentas", "bd_consultas_lentas_total", "counter", "Consultas por encima del umbral de consulta lenta"),
+    ("segundos_conexion", "bd_consulta_conexion_segundos_total", "counter", "Tiempo esperando una conexión del pool"),
+    ("segundos_ejecucion", "bd_consulta_ejecucion_segundos_total", "counter", "Tiempo de execute en el servidor"),
+    ("segundos_lectura", "bd_consulta_lectura_segundos_total", "counter", "Tiempo leyendo las filas del resultado"),
+    ("filas", "bd_consulta_filas_total", "counter", "Filas devueltas"),
+    ("bytes", "bd_consulta_bytes_total", "counter", "Tamaño aproximado de las filas devueltas"),
+]
+
+@lru_cache(maxsize=1024)
+def normalizar_query(query: str) -> str:
+    """Plantilla de la consulta: espacios colapsados y listas IN (%s, %s, ...) reducidas a una.
+
+    Así las llamadas con distinta cantidad de ids caen en la misma plantilla.
+    """
+    plantilla = " ".join(query.split()).rstrip(";")
+    return re.sub(r"%s(?:\s*,\s*%s)+", "%s, ...", plantilla)
+
+def bytes_aproximados(filas: Optional[Sequence[Sequence[Any]]], muestra: int = 100) -> int:
+    # Estima el tamaño con las primeras `muestra` filas para no recorrer resultados enormes
+    if not filas:
+        return 0
+    parte = filas[:muestra]
+    total = 0
+    for fila in parte:
+        for valor in fila:
+            if valor is None:
+                continue
+            total += len(valor) if isinstance(valor, (str, bytes)) else 8
+    return total * len(filas) // len(parte)
+
+
+class RegistroMetricas:
+    """Acumula tiempos, filas y bytes por plantilla de consulta. Seguro entre hilos."""
+
+    def __init__(self, umbral_lenta: float = 0.5):
+        self.umbral_lenta = umbral_lenta
+        self._lock = threading.Lock()
+        self._por_plantilla: Dict[str, Dict[str, float]] = {}
+        self._total_llamadas = 0
+
+    def es_lenta(self, segundos: float) -> bool:
+        return self.umbral_lenta > 0 and segundos >= self.umbral_lenta
+
+    def registrar(self, query: str, segundos_conexion: float, segundos_ejecucion: float, segundos_lectura: float,
+                  filas: int, bytes_: int, error: bool = False) -> None:
+        plantilla = normalizar_query(query)
+        lenta = self.es_lenta(segundos_conexion + segundos_ejecucion + segundos_lectura)
+        with self._lock:
+            datos = self._por_plantilla.get(plantilla)
+            if datos is None:
+                datos = self._por_plantilla[plantilla] = dict.fromkeys(CAMPOS, 0)
+            datos["llamadas"] += 1
+            datos["errores"] += int(error)
+            datos["lentas"] += int(lenta)
+            datos["segundos_conexion"] += segundos_conexion
+            datos["segundos_ejecucion"] += segundos_ejecucion
+            datos["segundos_lectura"] += segundos_lectura
+            datos["filas"] += filas
+            datos["bytes"] += bytes_
+            self._total_llamadas += 1
+
+    def total_llamadas(self) -> int: # Sirve para contar cuántas consultas disparó una acción (diferencia antes/después)
+        with self._lock:
+            return self._total_llamadas
+
+    def instantanea(self) -> Dict[str, Dict[str, float]]:
+        with self._lock:
+            return {plantilla: dict(datos) for plantilla, datos in self._por_plantilla.items()}
+
+    def reiniciar(self) -> None:
+        with self._lock:
+            self._por_plantilla.clear()
+
+
+def _escapar_etiqueta(valor: str) -> str:
+    return valor.replace("\\", "\\\\").replace("\"", "\\\"").replace("\n", "\\n")
+
+def formato_prometheus(instantanea: Dict[str, Dict[str, float]], indicadores: Optional[Dict[str, float]] = None) -> str:
+    """Texto en el formato de exposición de Prometheus (versión 0.0.4).
+
+    `indicadores` agrega métricas sueltas de tipo gauge (por ejemplo, el
+    estado del pool), con el nombre ya completo.
+    """
+    lineas: List[str] = []
+    for campo, nombre, tipo, ayuda in METRICAS_PROMETHEUS:
+        lineas.append(f"# HELP {nombre} {ayuda}")
+        lineas.append(f"# TYPE {nombre} {tipo}")
+        for plantilla, datos in sorted(instantanea.items()):
+            lineas.append(f'{nombre}{{consulta="{_escapar_etiqueta(plantilla)}"}} {datos[campo]:g}')
+    for nombre, valor in sorted((indicadores or {}).items()):
+        lineas.append(f"# TYPE {nombre} gauge")
+        lineas.append(f"{nombre} {valor:g}")
+    return "\n".join(lineas) + "\n"
+
+def exportar_archivo(texto: str, ruta: str) -> None:
+    # Escritura atómica: el colector de archivos de texto nunca lee un archivo a medias
+    temporal = ruta + ".tmp"
+    with open(temporal, "w", encoding="utf-8") as archivo:
+        archivo.write(texto)
+    os.replace(temporal, ruta)
+
+def servir_http(obtener_texto: Callable[[], str], puerto: int, host: str = "127.0.0.1") -> ThreadingHTTPServer:
+    """Publica GET /metrics en un hilo de fondo y devuelve el servidor (llamar a shutdown() para detenerlo)."""
+
+    class Manejador(BaseHTTPRequestHandler):
+        def do_GET(self):
+            if self.path.rstrip("/") not in ("", "/metrics"):
+                self.send_error(404)
+                return
+            cuerpo = obtener_texto().encode("utf-8")
+            self.send_response(200)
+            self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+            self.send_header("Content-Length", str(len(cuerpo)))
+            self.end_headers()
+            self.wfile.write(cuerpo)
+
+        def log_message(self, formato, *args): # Sin una línea en consola por cada scrape
+            pass
+
+    servidor = ThreadingHTTPServer((host, puerto), Manejador)
+    threading.Thread(target=servidor.serve_forever, name="metricas-http", daemon=True).start()
+    return servidor
+
+def resumen_texto(instantanea: Dict[str, Dict[str, float]], limite: int = 15) -> str:
+    # Tabla legible para el menú de consola y la GUI, ordenada por tiempo total
+    if not instantanea:
+        return "Todavía no se ejecutaron consultas."
+    filas = sorted(instantanea.items(),
+                   key=lambda item: item[1]["segundos_conexion"] + item[1]["segundos_ejecucion"] + item[1]["segundos_lectura"],
+                   reverse=True)
+    lineas = [f"{'Llamadas':>8} {'Total ms':>10} {'Prom. ms':>9} {'Conex.':>8} {'Ejec.':>8} {'Lect.':>8} "
+              f"{'Filas':>9} {'KB':>8} {'Lentas':>6}  Consulta"]
+    for plantilla, datos in filas[:limite]:
+        total = datos["segundos_conexion"] + datos["segundos_ejecucion"] + datos["segundos_lectura"]
+        lineas.append(
+            f"{datos['llamadas']:>8.0f} {total * 1000:>10.1f} {total * 1000 / datos['llamadas']:>9.2f} "
+            f"{datos['segundos_conexion'] * 1000:>8.1f} {datos['segundos_ejecucion'] * 1000:>8.1f} "
+            f"{datos['segundos_lectura'] * 1000:>8.1f} {datos['filas']:>9.0f} {datos['bytes'] / 1024:>8.1f} "
+            f"{datos['lentas']:>6.0f}  {plantilla[:120]}"
+        )
+    if len(filas) > limite:
+        lineas.append(f"... y {len(filas) - limite} plantillas más")
+    return "\n".join(lineas)
+
+def configurar_log_lentas(ruta: Optional[str]) -> None:
+    # Sin ruta, las consultas lentas salen por stderr (handler por defecto de logging para WARNING)
+    if not ruta:
+        return
+    manejador = logging.FileHandler(ruta, encoding="utf-8")
+    manejador.setFormatter(logging.Formatter("%(asctime)s %(message)s"))
+    logger_lentas.addHandler(manejador)
+    logger_lentas.setLevel(logging.WARNING)
@@ -0,0 +1,56 @@
+-- Saldo de stock materializado por (producto, lote, entorno, estado).
+-- Los triggers de movimiento_kardex lo mantienen al día con cada movimiento,
+-- de modo que las lecturas de stock ya no recorren todo el historial.
+-- Para reconstruirlo o verificarlo: python saldos.py reconstruir | verificar
+
+use BD_proyecto_2;
+CREATE TABLE saldo_stock (
+    id_producto VARCHAR(8) NOT NULL,
+    id_lote VARCHAR(12) NOT NULL,
+    id_entorno VARCHAR(12) NOT NULL,
+    estado VARCHAR(15) NOT NULL DEFAULT '', -- estado_post_movimiento ('' si vino NULL)
+    cantidad INT NOT NULL DEFAULT 0,
+    PRIMARY KEY (id_producto, id_lote, id_entorno, estado)
+);
+
+use BD_proyecto_2;
+DELIMITER $$
+CREATE TRIGGER trg_kardex_saldo_ai AFTER INSERT ON movimiento_kardex
+FOR EACH ROW
+BEGIN
+    INSERT INTO saldo_stock (id_producto, id_lote, id_entorno, estado, cantidad)
+    VALUES (NEW.id_producto, NEW.id_lote, NEW.id_entorno, COALESCE(NEW.estado_post_movimiento, ''),
+            CASE NEW.tipo_movimiento WHEN 'ENTRADA' THEN NEW.cantidad WHEN 'SALIDA' THEN -NEW.cantidad ELSE 0 END)
+    ON DUPLICATE KEY UPDATE cantidad = cantidad + VALUES(cantidad);
+END$$
+
+CREATE TRIGGER trg_kardex_saldo_ad AFTER DELETE ON movimiento_kardex
+FOR EACH ROW
+BEGIN
+    INSERT INTO saldo_stock (id_producto, id_lote, id_entorno, estado, cantidad)
+    VALUES (OLD.id_producto, OLD.id_lote, OLD.id_entorno, COALESCE(OLD.estado_post_movimiento, ''),
+            CASE OLD.tipo_movimiento WHEN 'ENTRADA' THEN -OLD.cantidad WHEN 'SALIDA' THEN OLD.cantidad ELSE 0 END)
+    ON DUPLICATE KEY UPDATE cantidad = cantidad + VALUES(cantidad);
+END$$
+
+CREATE TRIGGER trg_kardex_saldo_au AFTER UPDATE ON movimiento_kardex
+FOR EACH ROW
+BEGIN
+    INSERT INTO saldo_stock (id_producto, id_lote, id_entorno, estado, cantidad)
+    VALUES (OLD.id_producto, OLD.id_lote, OLD.id_entorno, COALESCE(OLD.estado_post_movimiento, ''),
+            CASE OLD.tipo_movimiento WHEN 'ENTRADA' THEN -OLD.cantidad WHEN 'SALIDA' THEN OLD.cantidad ELSE 0 END)
+    ON DUPLICATE KEY UPDATE cantidad = cantidad + VALUES(cantidad);
+    INSERT INTO saldo_stock (id_producto, id_lote, id_entorno, estado, cantidad)
+    VALUES (NEW.id_producto, NEW.id_lote, NEW.id_entorno, COALESCE(NEW.estado_post_movimiento, ''),
+            CASE NEW.tipo_movimiento WHEN 'ENTRADA' THEN NEW.cantidad WHEN 'SALIDA' THEN -NEW.cantidad ELSE 0 END)
+    ON DUPLICATE KEY UPDATE cantidad = cantidad + VALUES(cantidad);
+END$$
+DELIMITER ;
+
+-- Carga inicial a partir del historial existente
+use BD_proyecto_2;
+INSERT INTO saldo_stock (id_producto, id_lote, id_entorno, estado, cantidad)
+SELECT id_producto, id_lote, id_entorno, COALESCE(estado_post_movimiento, ''),
+       SUM(CASE tipo_movimiento WHEN 'ENTRADA' THEN cantidad WHEN 'SALIDA' THEN -cantidad ELSE 0 END)
+FROM movimiento_kardex
+GROUP BY id_producto, id_lote, id_entorno, COALESCE(estado_post_movimiento, '');
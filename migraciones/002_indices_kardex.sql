@@ -0,0 +1,36 @@
+-- Índices compuestos para los patrones de consulta de oficial.py.
+-- Cada índice indica qué consultas atiende. Después de aplicarlos,
+-- python verificar_planes.py comprueba con EXPLAIN que ninguna consulta
+-- vuelva a un recorrido completo de tabla.
+
+use BD_proyecto_2;
+
+-- producto_entorno: MAX(num_movimiento) por producto dentro de un entorno.
+-- Cubre el subquery completo (num_movimiento va en el índice por ser la PK).
+CREATE INDEX idx_kardex_entorno_producto_mov
+    ON movimiento_kardex (id_entorno, id_producto, num_movimiento);
+
+-- Filtros por producto y por (producto, lote, entorno): recálculo de saldos
+-- por producto y verificaciones. Cubre la suma sin leer la fila completa.
+CREATE INDEX idx_kardex_producto_lote_entorno
+    ON movimiento_kardex (id_producto, id_lote, id_entorno, tipo_movimiento, cantidad);
+
+-- obtener_detalles_entradas_en_un_dia / obtener_detalles_salidas_en_un_dia:
+-- igualdad sobre (tipo_movimiento, fecha) y el resto de columnas del SELECT
+-- incluidas para que el reporte se resuelva solo con el índice.
+CREATE INDEX idx_kardex_tipo_fecha
+    ON movimiento_kardex (tipo_movimiento, fecha, id_producto, cantidad, id_lote, id_entorno, estado_post_movimiento);
+
+-- cantidad_productos_dañados: COUNT(*) sobre un estado concreto.
+CREATE INDEX idx_kardex_estado
+    ON movimiento_kardex (estado_post_movimiento);
+
+-- obtener_sim_total / obtener_sim_de_operador: filtro de SIMs por operador
+-- antes del join con saldo_stock (que usa su PK por id_producto).
+CREATE INDEX idx_producto_tipo_operador
+    ON producto (tipo, operador);
+
+-- Los índices implícitos que MySQL creó para las FK de id_producto e
+-- id_entorno quedan cubiertos por los prefijos de los índices anteriores y
+-- pueden eliminarse para abaratar las inserciones (revisar sus nombres con
+-- SHOW INDEX FROM movimiento_kardex antes de hacerlo).
@@ -0,0 +1,38 @@
+-- OPCIONAL: particionado de movimiento_kardex por rango de fecha.
+-- Solo conviene con historiales muy grandes: los reportes por día o por
+-- rango de fechas leen únicamente las particiones implicadas y las
+-- particiones antiguas se pueden archivar con ALTER TABLE ... DROP/EXCHANGE.
+--
+-- Restricciones de MySQL/InnoDB que este script asume:
+--   * Una tabla particionada no admite FOREIGN KEY: se eliminan las tres FK
+--     (la integridad queda a cargo de la aplicación).
+--   * Toda clave única debe incluir la columna de particionado, así que la PK
+--     pasa a ser (num_movimiento, fecha) y fecha deja de admitir NULL.
+-- Aplicar después de 002_indices_kardex.sql.
+
+use BD_proyecto_2;
+ALTER TABLE movimiento_kardex
+    DROP FOREIGN KEY movimiento_kardex_ibfk_1,
+    DROP FOREIGN KEY movimiento_kardex_ibfk_2,
+    DROP FOREIGN KEY movimiento_kardex_ibfk_3;
+
+use BD_proyecto_2;
+ALTER TABLE movimiento_kardex
+    MODIFY fecha DATE NOT NULL,
+    DROP PRIMARY KEY,
+    ADD PRIMARY KEY (num_movimiento, fecha);
+
+use BD_proyecto_2;
+ALTER TABLE movimiento_kardex
+PARTITION BY RANGE COLUMNS (fecha) (
+    PARTITION p2024 VALUES LESS THAN ('2025-01-01'),
+    PARTITION p2025 VALUES LESS THAN ('2026-01-01'),
+    PARTITION p2026 VALUES LESS THAN ('2027-01-01'),
+    PARTITION pmax VALUES LESS THAN (MAXVALUE)
+);
+
+-- Para abrir el año siguiente sin reescribir la tabla completa:
+-- ALTER TABLE movimiento_kardex REORGANIZE PARTITION pmax INTO (
+--     PARTITION p2027 VALUES LESS THAN ('2028-01-01'),
+--     PARTITION pmax VALUES LESS THAN (MAXVALUE)
+-- );
@@ -0,0 +1,36 @@
+-- Paso 1 de 2: movimiento numérico para num_movimiento.
+-- num_movimiento es VARCHAR(8), por lo que MAX(num_movimiento) compara texto
+-- ('9' > '30') y producto_entorno devolvía un "último movimiento" incorrecto.
+--
+-- 1. Aplicar este script (agrega la columna nueva, vacía).
+-- 2. python backfill_movimientos.py    (la llena por bloques; se puede reanudar)
+-- 3. Aplicar 005_num_movimiento_finalizar.sql en una ventana de mantenimiento.
+
+use BD_proyecto_2;
+ALTER TABLE movimiento_kardex
+    ADD COLUMN num_movimiento_nuevo BIGINT UNSIGNED NULL,
+    ADD UNIQUE INDEX uq_kardex_num_movimiento_nuevo (num_movimiento_nuevo);
+
+-- El backfill actualiza millones de filas sin tocar cantidades ni claves;
+-- el trigger de saldos solo debe actuar cuando cambia algo que afecta el saldo.
+use BD_proyecto_2;
+DROP TRIGGER IF EXISTS trg_kardex_saldo_au;
+DELIMITER $$
+CREATE TRIGGER trg_kardex_saldo_au AFTER UPDATE ON movimiento_kardex
+FOR EACH ROW
+BEGIN
+    IF NOT (OLD.id_producto <=> NEW.id_producto AND OLD.id_lote <=> NEW.id_lote
+            AND OLD.id_entorno <=> NEW.id_entorno AND OLD.tipo_movimiento <=> NEW.tipo_movimiento
+            AND OLD.cantidad <=> NEW.cantidad
+            AND OLD.estado_post_movimiento <=> NEW.estado_post_movimiento) THEN
+        INSERT INTO saldo_stock (id_producto, id_lote, id_entorno, estado, cantidad)
+        VALUES (OLD.id_producto, OLD.id_lote, OLD.id_entorno, COALESCE(OLD.estado_post_movimiento, ''),
+                CASE OLD.tipo_movimiento WHEN 'ENTRADA' THEN -OLD.cantidad WHEN 'SALIDA' THEN OLD.cantidad ELSE 0 END)
+        ON DUPLICATE KEY UPDATE cantidad = cantidad + VALUES(cantidad);
+        INSERT INTO saldo_stock (id_producto, id_lote, id_entorno, estado, cantidad)
+        VALUES (NEW.id_producto, NEW.id_lote, NEW.id_entorno, COALESCE(NEW.estado_post_movimiento, ''),
+                CASE NEW.tipo_movimiento WHEN 'ENTRADA' THEN NEW.cantidad WHEN 'SALIDA' THEN -NEW.cantidad ELSE 0 END)
+        ON DUPLICATE KEY UPDATE cantidad = cantidad + VALUES(cantidad);
+    END IF;
+END$$
+DELIMITER ;
@@ -0,0 +1,27 @@
+-- Paso 2 de 2: num_movimiento pasa a ser BIGINT UNSIGNED AUTO_INCREMENT.
+-- Requiere que backfill_movimientos.py haya terminado: volver a ejecutarlo
+-- justo antes de este script para cubrir los movimientos insertados mientras
+-- tanto (python backfill_movimientos.py --verificar debe reportar 0 pendientes).
+-- El identificador de texto original se conserva en num_movimiento_legado.
+
+use BD_proyecto_2;
+ALTER TABLE movimiento_kardex DROP INDEX idx_kardex_entorno_producto_mov;
+
+use BD_proyecto_2;
+ALTER TABLE movimiento_kardex
+    DROP PRIMARY KEY,
+    CHANGE num_movimiento num_movimiento_legado VARCHAR(8) NULL;
+
+-- Si se aplicó 003_particion_kardex.sql la PK debe incluir fecha:
+-- ADD PRIMARY KEY (num_movimiento, fecha) en lugar de ADD PRIMARY KEY (num_movimiento).
+use BD_proyecto_2;
+ALTER TABLE movimiento_kardex
+    DROP INDEX uq_kardex_num_movimiento_nuevo,
+    CHANGE num_movimiento_nuevo num_movimiento BIGINT UNSIGNED NOT NULL AUTO_INCREMENT,
+    ADD PRIMARY KEY (num_movimiento);
+
+use BD_proyecto_2;
+CREATE INDEX idx_kardex_entorno_producto_mov
+    ON movimiento_kardex (id_entorno, id_producto, num_movimiento);
+CREATE INDEX idx_kardex_num_movimiento_legado
+    ON movimiento_kardex (num_movimiento_legado);
@@ -0,0 +1,29 @@
+-- Resumen diario precalculado del kardex: totales por día, producto, lote,
+-- entorno y tipo de movimiento. Los reportes por rango de fechas leen esta
+-- tabla (unas pocas filas por día) en lugar de recorrer movimiento_kardex.
+-- Se refresca de forma incremental con: python resumen_diario.py refrescar
+
+use BD_proyecto_2;
+CREATE TABLE resumen_diario_kardex (
+    fecha DATE NOT NULL,
+    id_producto VARCHAR(8) NOT NULL,
+    id_entorno VARCHAR(12) NOT NULL,
+    id_lote VARCHAR(12) NOT NULL,
+    tipo_movimiento VARCHAR(15) NOT NULL,
+    cantidad_total BIGINT NOT NULL DEFAULT 0,
+    num_movimientos INT NOT NULL DEFAULT 0,
+    PRIMARY KEY (fecha, id_producto, id_entorno, id_lote, tipo_movimiento),
+    INDEX idx_resumen_producto_fecha (id_producto, fecha),
+    INDEX idx_resumen_entorno_fecha (id_entorno, fecha)
+);
+
+-- Hasta qué num_movimiento llegó cada proceso incremental
+use BD_proyecto_2;
+CREATE TABLE marca_agua_proceso (
+    proceso VARCHAR(40) PRIMARY KEY NOT NULL,
+    ultimo_movimiento BIGINT UNSIGNED NOT NULL DEFAULT 0,
+    actualizado DATETIME
+);
+
+use BD_proyecto_2;
+INSERT INTO marca_agua_proceso (proceso, ultimo_movimiento, actualizado) VALUES ('resumen_diario', 0, NOW());
@@ -0,0 +1,32 @@
+-- Cierres de stock: saldo de cada (producto, lote, entorno) al final de una
+-- fecha de corte (normalmente el último día de cada mes). El stock a una
+-- fecha pasada D se calcula como el cierre anterior más cercano más los
+-- movimientos entre ese corte y D, en lugar de sumar todo el historial.
+-- Se generan con: python cierres_stock.py crear
+
+use BD_proyecto_2;
+CREATE TABLE cierre_stock (
+    fecha_corte DATE NOT NULL,
+    id_producto VARCHAR(8) NOT NULL,
+    id_lote VARCHAR(12) NOT NULL,
+    id_entorno VARCHAR(12) NOT NULL,
+    cantidad INT NOT NULL,
+    PRIMARY KEY (fecha_corte, id_producto, id_lote, id_entorno),
+    INDEX idx_cierre_producto_fecha (id_producto, fecha_corte)
+);
+
+-- Un registro por corte (un corte sin saldos no deja filas en cierre_stock).
+-- ultimo_movimiento es el mayor num_movimiento incluido: los movimientos
+-- cargados después con una fecha anterior al corte se suman aparte.
+use BD_proyecto_2;
+CREATE TABLE cierre_stock_corte (
+    fecha_corte DATE PRIMARY KEY NOT NULL,
+    ultimo_movimiento BIGINT UNSIGNED NOT NULL,
+    creado DATETIME
+);
+
+-- Movimientos de un producto entre el corte y la fecha consultada.
+-- Cubre la suma sin leer la fila completa.
+use BD_proyecto_2;
+CREATE INDEX idx_kardex_producto_fecha
+    ON movimiento_kardex (id_producto, fecha, tipo_movimiento, cantidad, id_lote, id_entorno);
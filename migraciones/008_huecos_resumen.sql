@@ -0,0 +1,13 @@
+-- Huecos de la numeración que vio el refresco del resumen diario. En MySQL un
+-- AUTO_INCREMENT se asigna al insertar pero la fila se ve al confirmar: con
+-- varias cargas a la vez, un num_movimiento menor puede aparecer después de
+-- que la marca de agua ya lo pasó. El refresco anota aquí los números que
+-- faltaban y los suma al resumen cuando aparecen (o los descarta pasado un
+-- tiempo: un insert deshecho también deja un hueco).
+
+use BD_proyecto_2;
+CREATE TABLE hueco_resumen_diario (
+    num_movimiento BIGINT UNSIGNED PRIMARY KEY NOT NULL,
+    detectado DATETIME NOT NULL,
+    INDEX idx_hueco_detectado (detectado)
+);
@@ -0,0 +1,7 @@
+-- Páginas de los movimientos de un día para la tabla de la GUI: tipo y fecha
+-- por igualdad y num_movimiento > último visto, en orden. Con este índice cada
+-- página lee solo sus filas en lugar de ordenar todos los movimientos del día.
+
+use BD_proyecto_2;
+CREATE INDEX idx_kardex_tipo_fecha_mov
+    ON movimiento_kardex (tipo_movimiento, fecha, num_movimiento);
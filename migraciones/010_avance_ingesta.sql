@@ -0,0 +1,15 @@
+-- Avance de las cargas masivas de ingesta_movimientos.py: cuántos registros
+-- del archivo ya se confirmaron, guardado en la misma transacción que cada
+-- lote. proceso es un hash de la ruta del archivo y huella su tamaño y fecha
+-- de modificación: un archivo distinto no reanuda el avance de otro.
+-- Antes usaban marca_agua_proceso, cuya columna es un num_movimiento. Terminar
+-- las cargas interrumpidas antes de migrar: su avance no se traslada.
+
+use BD_proyecto_2;
+CREATE TABLE avance_ingesta (
+    proceso VARCHAR(64) PRIMARY KEY NOT NULL,
+    huella VARCHAR(64),
+    registros_procesados BIGINT UNSIGNED NOT NULL DEFAULT 0,
+    actualizado DATETIME
+);
+DELETE FROM marca_agua_proceso WHERE proceso LIKE 'ingesta:%';
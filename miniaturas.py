@@ -0,0 +1,157 @@
+import argparse
+import hashlib
+import os
+import tempfile
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+from PIL import Image
+
+DIRECTORIO_MINIATURAS = os.environ.get(
+    "BD_MINIATURAS_DIR", os.path.join(os.path.dirname(os.path.abspath(__file__)), ".miniaturas"))
+LIMITE_CACHE_BYTES = int(os.environ.get("BD_MINIATURAS_MAX_MB", "200")) * 1024 * 1024
+TAMANO_MINIATURA = (300, 300)
+
+# Bytes ocupados por cada directorio de caché, llevados en memoria para no recorrerlo en cada miniatura nueva.
+# Se recalcula al recortar, que corrige lo que hayan agregado otros procesos
+_bytes_cache: Dict[str, int] = {}
+_bytes_cache_lock = threading.Lock()
+
+def ruta_miniatura(ruta_imagen: str, tamano: Tuple[int, int] = TAMANO_MINIATURA,
+                   directorio: str = DIRECTORIO_MINIATURAS) -> str:
+    # La clave incluye mtime y tamaño del original: si la imagen cambia en disco, la miniatura vieja deja de usarse
+    info = os.stat(ruta_imagen)
+    clave = f"{os.path.abspath(ruta_imagen)}|{info.st_mtime_ns}|{info.st_size}|{tamano[0]}x{tamano[1]}"
+    return os.path.join(directorio, hashlib.sha1(clave.encode("utf-8")).hexdigest() + ".png")
+
+def generar_miniatura(ruta_imagen: str, tamano: Tuple[int, int] = TAMANO_MINIATURA,
+                      directorio: str = DIRECTORIO_MINIATURAS, recortar: bool = True) -> str:
+    """Devuelve la ruta de la miniatura de `ruta_imagen`, creándola si no está en la caché.
+
+    En un acierto solo se actualiza la fecha de modificación del archivo, que
+    es lo que usa recortar_cache() para desalojar primero las menos usadas.
+    """
+    destino = ruta_miniatura(ruta_imagen, tamano, directorio)
+    if os.path.exists(destino):
+        os.utime(destino)
+        return destino
+
+    os.makedirs(directorio, exist_ok=True)
+    # Un temporal único por llamada: dos hilos del mismo proceso pueden estar generando la misma miniatura
+    with tempfile.NamedTemporaryFile(dir=directorio, suffix=".tmp", delete=False) as archivo:
+        temporal = archivo.name
+        try:
+            with Image.open(ruta_imagen) as imagen:
+                imagen.draft(imagen.mode, tamano) # En JPEG decodifica directamente a 1/2, 1/4 u 1/8 de la resolución
+                imagen.thumbnail(tamano)
+                miniatura = imagen if imagen.mode in ("1", "L", "LA", "P", "RGB", "RGBA") else imagen.convert("RGB") # PNG no admite CMYK
+                miniatura.save(archivo, format="PNG")
+        except BaseException:
+            archivo.close()
+            os.remove(temporal)
+            raise
+    # Si otro hilo ya la dejó en su lugar, reemplazarla no agrega bytes a la caché
+    tamano_archivo = 0 if os.path.exists(destino) else os.path.getsize(temporal)
+    os.replace(temporal, destino) # Otro proceso nunca ve una miniatura a medio escribir
+    if recortar and _sumar_a_cache(directorio, tamano_archivo) > LIMITE_CACHE_BYTES:
+        recortar_cache(directorio)
+    return destino
+
+def _sumar_a_cache(directorio: str, tamano: int) -> int:
+    # Suma `tamano` al total en memoria del directorio y lo devuelve; la primera vez lo mide en disco
+    with _bytes_cache_lock:
+        if directorio in _bytes_cache:
+            _bytes_cache[directorio] += tamano
+            return _bytes_cache[directorio]
+    total = sum(tamano for _, tamano, _ in _listar_cache(directorio)) # Ya incluye la miniatura recién escrita
+    with _bytes_cache_lock:
+        _bytes_cache[directorio] = total
+    return total
+
+def cargar_miniatura(ruta_imagen: str, tamano: Tuple[int, int] = TAMANO_MINIATURA) -> Image.Image:
+    # Pensada para un hilo de trabajo: devuelve la miniatura ya decodificada en memoria
+    with Image.open(generar_miniatura(ruta_imagen, tamano)) as imagen:
+        imagen.load()
+        return imagen.copy()
+
+def _listar_cache(directorio: str) -> List[Tuple[float, int, str]]:
+    # (mtime, bytes, ruta) de cada miniatura del directorio
+    try:
+        entradas = [entrada for entrada in os.scandir(directorio) if entrada.name.endswith(".png")]
+    except FileNotFoundError:
+        return []
+    archivos = []
+    for entrada in entradas:
+        try:
+            info = entrada.stat()
+        except FileNotFoundError: # Otro proceso la borró mientras se listaba
+            continue
+        archivos.append((info.st_mtime, info.st_size, entrada.path))
+    return archivos
+
+def recortar_cache(directorio: str = DIRECTORIO_MINIATURAS, limite_bytes: int = LIMITE_CACHE_BYTES) -> int:
+    # Borra las miniaturas usadas hace más tiempo hasta quedar bajo el límite; devuelve cuántas se borraron
+    archivos = _listar_cache(directorio)
+    total = sum(tamano for _, tamano, _ in archivos)
+    borradas = 0
+    for _, tamano, ruta in sorted(archivos):
+        if total <= limite_bytes:
+            break
+        try:
+            os.remove(ruta)
+        except FileNotFoundError:
+            pass
+        total -= tamano
+        borradas += 1
+    with _bytes_cache_lock:
+        _bytes_cache[directorio] = total
+    return borradas
+
+def _generar_en_proceso(ruta_imagen: str) -> Tuple[str, Optional[str]]:
+    # Se ejecuta en otro proceso: devuelve (ruta, None) o (ruta, motivo del error)
+    try:
+        generar_miniatura(ruta_imagen, recortar=False)
+        return ruta_imagen, None
+    except Exception as e:
+        return ruta_imagen, str(e)
+
+def precalentar_miniaturas(rutas: Iterable[str], procesos: Optional[int] = None) -> Dict[str, Any]:
+    """Genera en paralelo las miniaturas de `rutas` que todavía no estén en la caché.
+
+    Decodificar imágenes es trabajo de CPU, así que se reparte en un pool de
+    procesos en lugar de hilos. La caché se recorta una sola vez al final.
+    """
+    pendientes = sorted({ruta for ruta in rutas if ruta})
+    faltantes = [ruta for ruta in pendientes if not os.path.exists(ruta)]
+    existentes = [ruta for ruta in pendientes if os.path.exists(ruta)]
+    fallidas: List[Tuple[str, str]] = [(ruta, "el archivo no existe") for ruta in faltantes]
+    procesadas = 0
+    with ProcessPoolExecutor(max_workers=procesos) as pool:
+        for ruta, error in pool.map(_generar_en_proceso, existentes, chunksize=16):
+            if error is None:
+                procesadas += 1
+            else:
+                fallidas.append((ruta, error))
+    return {
+        "procesadas": procesadas,
+        "fallidas": fallidas,
+        "desalojadas": recortar_cache(),
+    }
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Caché de miniaturas de las imágenes de productos.")
+    subcomandos = parser.add_subparsers(dest="comando", required=True)
+    precalentar = subcomandos.add_parser("precalentar", help="Genera las miniaturas de todos los productos")
+    precalentar.add_argument("--procesos", type=int, help="Procesos en paralelo (por defecto, uno por CPU)")
+    subcomandos.add_parser("recortar", help="Desaloja miniaturas hasta quedar bajo BD_MINIATURAS_MAX_MB")
+    args = parser.parse_args()
+
+    if args.comando == "precalentar":
+        from oficial import obtener_rutas_imagenes
+        resumen = precalentar_miniaturas(obtener_rutas_imagenes(), args.procesos)
+        print(f"Miniaturas listas: {resumen['procesadas']}  Fallidas: {len(resumen['fallidas'])}  "
+              f"Desalojadas: {resumen['desalojadas']}")
+        for ruta, motivo in resumen["fallidas"][:20]:
+            print(f"  {ruta}: {motivo}")
+    else:
+        print(f"Miniaturas desalojadas: {recortar_cache()}")
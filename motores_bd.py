@@ -0,0 +1,263 @@
+import os
+import re
+import sqlite3
+import threading
+from datetime import date, datetime
+from functools import lru_cache
+from typing import Any, List, Optional, Sequence, Tuple
+
+try:
+    import mysql.connector
+except ImportError: # Sin el conector solo queda disponible el motor SQLite
+    mysql = None
+
+DIRECTORIO = os.path.dirname(os.path.abspath(__file__))
+ESQUEMA_SQLITE = os.path.join(DIRECTORIO, "esquema_sqlite.sql")
+DATOS_EJEMPLO = os.path.join(DIRECTORIO, "trabah_actualizado.sql")
+
+# Clases de error de los motores disponibles; sirve tal cual en un `except`
+ERRORES_BD: Tuple[type, ...] = (sqlite3.Error,) if mysql is None else (mysql.connector.Error, sqlite3.Error)
+# ER_LOCK_DEADLOCK y ER_LOCK_WAIT_TIMEOUT: la transacción se deshizo y se puede repetir entera
+ERRNO_CONFLICTO_BLOQUEO = (1213, 1205)
+
+def es_conflicto_de_bloqueo(error: BaseException) -> bool:
+    if isinstance(error, sqlite3.OperationalError): # SQLite: otra conexión tiene la base tomada para escribir
+        return "locked" in str(error) or "busy" in str(error)
+    return getattr(error, "errno", None) in ERRNO_CONFLICTO_BLOQUEO
+
+
+class MotorMySQL:
+    """Conexiones a un servidor MySQL con mysql.connector."""
+
+    nombre = "mysql"
+
+    def __init__(self, host: str, usuario: str, password: str, base: str, timeout: int = 10):
+        self.host = host
+        self.usuario = usuario
+        self.password = password
+        self.base = base
+        self.timeout = timeout
+
+    def descripcion(self) -> str:
+        return f"MySQL '{self.base}' en {self.host}"
+
+    def conectar(self):
+        if mysql is None:
+            raise RuntimeError("mysql-connector-python no está instalado; use BD_MOTOR=sqlite")
+        return mysql.connector.connect(
+            host=self.host,
+            user=self.usuario,
+            password=self.password,
+            database=self.base,
+            autocommit=True, # Las conexiones se reutilizan: sin autocommit cada lectura vería una foto vieja
+            connection_timeout=self.timeout
+        )
+
+    def verificar(self, conexion) -> bool:
+        try:
+            conexion.ping(reconnect=False)
+            return True
+        except mysql.connector.Error:
+            return False
+
+    def explicar(self, conexion, query: str, params: Optional[Sequence[Any]] = None) -> List[str]:
+        cursor = conexion.cursor(dictionary=True)
+        try:
+            cursor.execute("EXPLAIN " + query.strip().rstrip(";"), params)
+            return [", ".join(f"{clave}={valor}" for clave, valor in paso.items()) for paso in cursor.fetchall()]
+        finally:
+            cursor.close()
+
+
+# --- Traducción del dialecto MySQL usado por el proyecto a SQLite ---
+
+_VALUES_COLUMNA = re.compile(r"\bVALUES\s*\(\s*(\w+)\s*\)", re.IGNORECASE)
+_REEMPLAZOS_SQLITE = [
+    (re.compile(r"%s"), "?"),
+    (re.compile(r"\s+FOR\s+UPDATE\b", re.IGNORECASE), ""), # BEGIN IMMEDIATE ya bloquea la base para escribir
+    (re.compile(r"\bNOW\(\)", re.IGNORECASE), "CURRENT_TIMESTAMP"),
+    (re.compile(r"\bAS\s+UNSIGNED\b", re.IGNORECASE), "AS INTEGER"),
+]
+
+@lru_cache(maxsize=512)
+def traducir_a_sqlite(query: str) -> str:
+    """Convierte una consulta escrita para MySQL a su equivalente SQLite.
+
+    Cubre lo que usan los módulos del proyecto: marcadores %s, FOR UPDATE,
+    NOW(), CAST(... AS UNSIGNED) e INSERT ... ON DUPLICATE KEY UPDATE con
+    VALUES(col). REGEXP se resuelve con una función registrada en la conexión.
+    """
+    for patron, reemplazo in _REEMPLAZOS_SQLITE:
+        query = patron.sub(reemplazo, query)
+    partes = re.split(r"\bON\s+DUPLICATE\s+KEY\s+UPDATE\b", query, maxsplit=1, flags=re.IGNORECASE)
+    if len(partes) == 2:
+        query = partes[0] + "ON CONFLICT DO UPDATE SET" + _VALUES_COLUMNA.sub(r"excluded.\1", partes[1])
+    return query
+
+def _regexp(patron: str, valor: Any) -> bool: # SQLite evalúa `valor REGEXP patron` como regexp(patron, valor)
+    return valor is not None and re.search(patron, str(valor)) is not None
+
+# Fechas con el mismo tipo Python que devuelve mysql.connector
+sqlite3.register_adapter(date, date.isoformat)
+sqlite3.register_adapter(datetime, lambda valor: valor.isoformat(" "))
+sqlite3.register_converter("DATE", lambda valor: date.fromisoformat(valor.decode()))
+sqlite3.register_converter("DATETIME", lambda valor: datetime.fromisoformat(valor.decode()))
+
+
+class CursorSQLite:
+    """Cursor sqlite3 que acepta las consultas y opciones de mysql.connector."""
+
+    def __init__(self, cursor: sqlite3.Cursor, dictionary: bool = False):
+        self._cursor = cursor
+        self._diccionario = dictionary
+
+    def execute(self, query: str, params: Optional[Sequence[Any]] = None):
+        self._cursor.execute(traducir_a_sqlite(query), tuple(params or ()))
+        return self
+
+    def executemany(self, query: str, filas):
+        self._cursor.executemany(traducir_a_sqlite(query), filas)
+        return self
+
+    def _convertir(self, fila):
+        if fila is None or not self._diccionario:
+            return fila
+        return {columna[0]: valor for columna, valor in zip(self._cursor.description, fila)}
+
+    def fetchone(self):
+        return self._convertir(self._cursor.fetchone())
+
+    def fetchmany(self, tamano: int = 1) -> List[Any]:
+        return [self._convertir(fila) for fila in self._cursor.fetchmany(tamano)]
+
+    def fetchall(self) -> List[Any]:
+        return [self._convertir(fila) for fila in self._cursor.fetchall()]
+
+    @property
+    def rowcount(self) -> int:
+        return self._cursor.rowcount
+
+    @property
+    def lastrowid(self):
+        return self._cursor.lastrowid
+
+    @property
+    def description(self):
+        return self._cursor.description
+
+    def close(self) -> None:
+        self._cursor.close()
+
+
+class ConexionSQLite:
+    """Conexión sqlite3 con la interfaz de mysql.connector que usa el proyecto."""
+
+    def __init__(self, ruta: str, timeout: float):
+        # check_same_thread=False: el pool presta la conexión a distintos hilos, de a uno por vez
+        self._conexion = sqlite3.connect(ruta, timeout=timeout, isolation_level=None,
+                                         detect_types=sqlite3.PARSE_DECLTYPES, check_same_thread=False)
+        self._conexion.create_function("REGEXP", 2, _regexp, deterministic=True)
+        self._conexion.execute("PRAGMA foreign_keys = ON;")
+        self._conexion.execute("PRAGMA journal_mode = WAL;") # Lectores concurrentes mientras alguien escribe
+        self._conexion.execute("PRAGMA synchronous = NORMAL;")
+
+    def cursor(self, buffered: Optional[bool] = None, dictionary: bool = False) -> CursorSQLite:
+        return CursorSQLite(self._conexion.cursor(), dictionary) # sqlite3 siempre lee fila a fila
+
+    def start_transaction(self) -> None:
+        self._conexion.execute("BEGIN IMMEDIATE;")
+
+    def commit(self) -> None:
+        self._conexion.commit()
+
+    def rollback(self) -> None:
+        self._conexion.rollback()
+
+    def ping(self, reconnect: bool = False) -> None:
+        self._conexion.execute("SELECT 1;")
+
+    def close(self) -> None:
+        self._conexion.close()
+
+
+class MotorSQLite:
+    """Base SQLite embebida en un archivo, sin servidor ni red.
+
+    Si el archivo no existe se crea con esquema_sqlite.sql (el esquema de
+    trabah_actualizado.sql más las migraciones) y, con `datos_ejemplo`, se
+    cargan los INSERT de trabah_actualizado.sql.
+    """
+
+    nombre = "sqlite"
+
+    def __init__(self, ruta: str, timeout: float = 10, datos_ejemplo: bool = True):
+        self.ruta = ruta
+        self.timeout = timeout
+        self.datos_ejemplo = datos_ejemplo
+        self._inicializada = False
+        self._lock = threading.Lock()
+
+    def descripcion(self) -> str:
+        return f"SQLite en {self.ruta}"
+
+    def conectar(self) -> ConexionSQLite:
+        with self._lock:
+            if not self._inicializada:
+                inicializar_sqlite(self.ruta, self.datos_ejemplo)
+                self._inicializada = True
+        return ConexionSQLite(self.ruta, self.timeout)
+
+    def verificar(self, conexion: ConexionSQLite) -> bool:
+        try:
+            conexion.ping()
+            return True
+        except sqlite3.Error:
+            return False
+
+    def explicar(self, conexion: ConexionSQLite, query: str, params: Optional[Sequence[Any]] = None) -> List[str]:
+        cursor = conexion.cursor()
+        try:
+            cursor.execute("EXPLAIN QUERY PLAN " + query.strip().rstrip(";"), params)
+            return [str(paso[-1]) for paso in cursor.fetchall()] # La última columna es el detalle del paso
+        finally:
+            cursor.close()
+
+
+def crear_motor(nombre: str, ruta_sqlite: str, host: str, usuario: str, password: str, base: str,
+                timeout: int = 10):
+    # Motor según BD_MOTOR ("mysql" o "sqlite"); un nombre desconocido es un error, no un MySQL por defecto
+    nombre = nombre.lower()
+    if nombre == "sqlite":
+        return MotorSQLite(ruta_sqlite, timeout)
+    if nombre != "mysql":
+        raise ValueError(f"BD_MOTOR desconocido: {nombre} (use mysql o sqlite)")
+    return MotorMySQL(host, usuario, password, base, timeout)
+
+def _sentencias_insert(ruta_sql: str) -> List[str]:
+    # Solo los INSERT del script MySQL: CREATE DATABASE, USE y las consultas sueltas se omiten
+    with open(ruta_sql, encoding="utf-8") as archivo:
+        texto = archivo.read()
+    sentencias = []
+    for sentencia in texto.split(";"):
+        lineas = [linea for linea in sentencia.strip().splitlines() if not linea.strip().lower().startswith("use ")]
+        sentencia = "\n".join(lineas).strip()
+        if sentencia.upper().startswith("INSERT"):
+            sentencias.append(sentencia)
+    return sentencias
+
+def inicializar_sqlite(ruta: str, datos_ejemplo: bool = True) -> bool:
+    """Crea el esquema en `ruta` si la base todavía no lo tiene. Devuelve True si lo creó."""
+    conexion = sqlite3.connect(ruta)
+    try:
+        existe = conexion.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'producto';").fetchone()
+        if existe:
+            return False
+        with open(ESQUEMA_SQLITE, encoding="utf-8") as archivo:
+            conexion.executescript(archivo.read())
+        if datos_ejemplo:
+            with conexion: # Una sola transacción para todos los datos de ejemplo
+                for sentencia in _sentencias_insert(DATOS_EJEMPLO):
+                    conexion.execute(traducir_a_sqlite(sentencia))
+        return True
+    finally:
+        conexion.close()
@@ -1,55 +1,247 @@
-import mysql.connector
-from typing import List, Tuple, Any, Optional
+from typing import List, Tuple, Any, Optional, Dict, Iterable, Iterator
+import atexit
 import os
+import threading
+import time
+from contextlib import contextmanager
 from PIL import Image
+from pool_conexiones import PoolConexiones, PoolAgotado
+import motores_bd
+from cache_lru import CacheLRU
+import miniaturas
+import metricas
+import registros
+
+DB_HOST = "localhost"
+DB_USER = "root"
+DB_PASSWORD = "Pata2021."
+DB_NAME = "BD_proyecto"
+POOL_TAMANO = int(os.environ.get("BD_POOL_TAMANO", "5"))
+CONEXION_TIMEOUT = int(os.environ.get("BD_CONEXION_TIMEOUT", "10")) # Segundos; evita esperas largas con el servidor caído
+CACHE_PRODUCTOS_TAMANO = int(os.environ.get("BD_CACHE_PRODUCTOS_TAMANO", "10000"))
+CACHE_PRODUCTOS_TTL = float(os.environ.get("BD_CACHE_PRODUCTOS_TTL", "300"))
+CACHE_SIM_TTL = float(os.environ.get("BD_CACHE_SIM_TTL", "60")) # Respaldo por si no corre el feed del kardex
+MOTOR_BD = os.environ.get("BD_MOTOR", "mysql").lower() # "mysql" o "sqlite"
+SQLITE_RUTA = os.environ.get("BD_SQLITE_RUTA", os.path.join(os.path.dirname(os.path.abspath(__file__)), "inventario.sqlite3"))
+UMBRAL_CONSULTA_LENTA = float(os.environ.get("BD_UMBRAL_CONSULTA_LENTA_MS", "500")) / 1000 # 0 desactiva el registro
+RUTA_LOG_CONSULTAS_LENTAS = os.environ.get("BD_LOG_CONSULTAS_LENTAS") # Sin definir: se escriben en stderr
+TAMANO_BLOQUE_IN = int(os.environ.get("BD_TAMANO_BLOQUE_IN", "500")) # Máximo de valores por lista IN (...) en las consultas por lote de ids
+
+DatabaseError = motores_bd.ERRORES_BD # Tupla de clases: se usa igual que una clase en un except
+ERRORES_CONSULTA = DatabaseError + (PoolAgotado,)
+
+
+class ListadoIncompleto(Exception):
+    """Falló la consulta de una página a mitad de un listado paginado: lo ya entregado no es el listado completo."""
+
+
+def crear_motor():
+    return motores_bd.crear_motor(MOTOR_BD, SQLITE_RUTA, DB_HOST, DB_USER, DB_PASSWORD, DB_NAME, CONEXION_TIMEOUT)
+
+motor = crear_motor()
 
 def conexion_BD():
     try:
-        conexion = mysql.connector.connect(
-            host="localhost",
-            user="root",
-            password="Pata2021.",
-            database="BD_proyecto"
-        )
-        return conexion
-    except mysql.connector.Error as err:
+        return motor.conectar()
+    except DatabaseError as err:
         print(f"Conexión con la BD fallida: {err}")
         return None
 
-def ejecutar_query(query_string: str, params: Optional[tuple] = None) -> Optional[List[Tuple[Any, ...]]]:
-    conexion = None
+_pool: Optional[PoolConexiones] = None
+_pool_lock = threading.Lock()
+
+def obtener_pool() -> PoolConexiones: # Pool único del proceso, se crea en el primer uso
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            _pool = PoolConexiones(motor.conectar, tamano=POOL_TAMANO, verificar=motor.verificar)
+        return _pool
+
+def configurar_motor(nuevo_motor) -> None: # Cambia de base (p. ej. a una SQLite de pruebas) cerrando el pool anterior
+    global _pool, motor
+    with _pool_lock:
+        anterior, _pool = _pool, None
+        motor = nuevo_motor
+    if anterior is not None:
+        anterior.cerrar()
+    cache_productos.limpiar()
+    cache_sim.limpiar()
+
+def configurar_pool(tamano: int) -> None: # Cambia el tamaño del pool cerrando el anterior
+    global _pool, POOL_TAMANO
+    with _pool_lock:
+        anterior, _pool = _pool, None
+        POOL_TAMANO = tamano
+    if anterior is not None:
+        anterior.cerrar()
+
+def estadisticas_pool() -> Dict[str, int]:
+    return obtener_pool().estadisticas()
+
+@atexit.register
+def cerrar_pool() -> None:
+    if _pool is not None:
+        _pool.cerrar()
+
+# Métricas por plantilla de consulta de ejecutar_query e iterar_query
+metricas_consultas = metricas.RegistroMetricas(UMBRAL_CONSULTA_LENTA)
+metricas.configurar_log_lentas(RUTA_LOG_CONSULTAS_LENTAS)
+
+def _registrar_consulta_lenta(conexion, query_string: str, params, conexion_s: float, ejecucion_s: float,
+                              lectura_s: float, filas: int) -> None:
+    plan = ["(EXPLAIN solo se pide para SELECT)"]
+    if query_string.lstrip().upper().startswith("SELECT"):
+        try:
+            plan = motor.explicar(conexion, query_string, params)
+        except DatabaseError as err:
+            plan = [f"(no se pudo obtener el EXPLAIN: {err})"]
+    metricas.logger_lentas.warning(
+        "Consulta lenta: %.1f ms (conexión %.1f, ejecución %.1f, lectura %.1f), %d filas\nQuery: %s\nParams: %r\nEXPLAIN:\n  %s",
+        (conexion_s + ejecucion_s + lectura_s) * 1000, conexion_s * 1000, ejecucion_s * 1000, lectura_s * 1000,
+        filas, metricas.normalizar_query(query_string), params, "\n  ".join(plan))
+
+def ejecutar_query(query_string: str, params: Optional[tuple] = None, como: Optional[type] = None) -> Optional[List[Tuple[Any, ...]]]:
+    # Con `como` (una clase de registros.py) cada fila se devuelve como ese objeto, por nombre de columna
+    inicio = time.perf_counter()
+    conexion_s = ejecucion_s = lectura_s = 0.0
+    resultado = None
     try:
-        conexion = conexion_BD()
-        if conexion is None:
-            return None
-
-        cursor = conexion.cursor()
-        cursor.execute(query_string, params)
-        results = cursor.fetchall()
-        return results
-    except mysql.connector.Error as err:
+        with obtener_pool().conexion() as conexion:
+            marca = time.perf_counter()
+            conexion_s = marca - inicio
+            cursor = conexion.cursor()
+            try:
+                cursor.execute(query_string, params)
+                ejecucion_s = time.perf_counter() - marca
+                marca = time.perf_counter()
+                resultado = cursor.fetchall()
+                if como is not None:
+                    resultado = registros.convertir(como, resultado, [columna[0] for columna in cursor.description])
+                lectura_s = time.perf_counter() - marca
+            finally:
+                cursor.close()
+            if metricas_consultas.es_lenta(conexion_s + ejecucion_s + lectura_s):
+                _registrar_consulta_lenta(conexion, query_string, params, conexion_s, ejecucion_s, lectura_s, len(resultado))
+            return resultado
+    except ERRORES_CONSULTA as err:
         print(f"Error al ejecutar el query: {err}\nQuery: {query_string}\nParams: {params}")
         return None
     finally:
-        if conexion and conexion.is_connected():
+        metricas_consultas.registrar(query_string, conexion_s, ejecucion_s, lectura_s, len(resultado or ()),
+                                     metricas.bytes_aproximados(resultado), error=resultado is None)
+
+def iterar_query(query_string: str, params: Optional[tuple] = None, tamano_lote: int = 1000,
+                 como: Optional[type] = None, propagar_errores: bool = False) -> Iterator[List[Tuple[Any, ...]]]:
+    # Versión en streaming de ejecutar_query: cursor sin buffer, el servidor envía las filas
+    # a medida que se leen y se entregan en bloques de `tamano_lote` sin juntar todo en memoria.
+    # Si el consumidor deja de iterar a mitad, la conexión queda con filas pendientes y el pool la descarta.
+    # Las métricas cuentan solo el tiempo de la BD, no el que el consumidor tarda entre bloques.
+    # Un error corta el listado en silencio; con `propagar_errores` se relanza (p. ej. para no dar por buena una exportación a medias).
+    inicio = time.perf_counter()
+    conexion_s = ejecucion_s = lectura_s = 0.0
+    filas_totales = bytes_totales = 0
+    fallo = False
+    try:
+        with obtener_pool().conexion() as conexion:
+            marca = time.perf_counter()
+            conexion_s = marca - inicio
+            cursor = conexion.cursor(buffered=False)
+            cursor.execute(query_string, params)
+            ejecucion_s = time.perf_counter() - marca
+            crear = registros.fabrica(como, [columna[0] for columna in cursor.description]) if como is not None else None
+            while True:
+                marca = time.perf_counter()
+                filas = cursor.fetchmany(tamano_lote)
+                lectura_s += time.perf_counter() - marca
+                if not filas:
+                    break
+                if crear is not None:
+                    filas = [crear(fila) for fila in filas]
+                filas_totales += len(filas)
+                bytes_totales += metricas.bytes_aproximados(filas)
+                yield filas
+            cursor.close()
+            if metricas_consultas.es_lenta(conexion_s + ejecucion_s + lectura_s):
+                _registrar_consulta_lenta(conexion, query_string, params, conexion_s, ejecucion_s, lectura_s, filas_totales)
+    except ERRORES_CONSULTA as err:
+        fallo = True
+        if propagar_errores:
+            raise
+        print(f"Error al ejecutar el query: {err}\nQuery: {query_string}\nParams: {params}")
+    finally: # También si el consumidor cerró el listado a mitad, que no cuenta como error
+        metricas_consultas.registrar(query_string, conexion_s, ejecucion_s, lectura_s, filas_totales, bytes_totales, error=fallo)
+
+def metricas_prometheus() -> str: # Métricas de consultas más el estado del pool y de la cache de productos
+    indicadores = {f"bd_pool_{clave}": valor for clave, valor in estadisticas_pool().items()}
+    for clave, valor in estadisticas_cache_productos().items():
+        indicadores[f"bd_cache_productos_{clave}"] = valor
+    for clave, valor in cache_sim.estadisticas().items():
+        indicadores[f"bd_cache_sim_{clave}"] = valor
+    return metricas.formato_prometheus(metricas_consultas.instantanea(), indicadores)
+
+def exportar_metricas(ruta: str) -> None: # Para el colector de archivos de texto de node_exporter
+    metricas.exportar_archivo(metricas_prometheus(), ruta)
+
+def servir_metricas(puerto: int, host: str = "127.0.0.1"):
+    return metricas.servir_http(metricas_prometheus, puerto, host)
+
+@contextmanager
+def transaccion(): # Cursor dentro de una transacción explícita; confirma al salir o deshace si hay error
+    with obtener_pool().conexion() as conexion:
+        conexion.start_transaction()
+        cursor = conexion.cursor()
+        try:
+            yield cursor
+            conexion.commit()
+        except Exception:
+            conexion.rollback()
+            raise
+        finally:
             cursor.close()
-            conexion.close()
 
-def obtener_detalles_producto(product_id: str) -> Optional[Tuple[Any, ...]]: # DEVUELVE LOS DETALLES DE UN PRODUCTO
-    query = "SELECT * FROM producto WHERE id_producto = %s"
-    resultado = ejecutar_query(query, (product_id,))
-    if resultado and len(resultado) > 0:
-        return resultado[0] 
-    return None
+# Cache de filas de producto: la tabla cambia poco y casi todas las opciones
+# del menú consultan primero si el producto existe
+cache_productos = CacheLRU(CACHE_PRODUCTOS_TAMANO, CACHE_PRODUCTOS_TTL)
+
+def invalidar_producto(product_id: str) -> None: # Llamar después de modificar o borrar un producto
+    cache_productos.invalidar(product_id)
+
+def invalidar_cache_productos() -> None:
+    cache_productos.limpiar()
+
+def estadisticas_cache_productos() -> Dict[str, Any]:
+    return cache_productos.estadisticas()
+
+def obtener_detalles_producto(product_id: str, como_objeto: bool = False): # DEVUELVE LOS DETALLES DE UN PRODUCTO
+    # Tupla con las columnas de producto o, con como_objeto, un registros.Producto
+    encontrado, producto = cache_productos.obtener(product_id)
+    if not encontrado:
+        query = "SELECT * FROM producto WHERE id_producto = %s"
+        resultado = ejecutar_query(query, (product_id,))
+        if not resultado:
+            return None
+        producto = resultado[0]
+        cache_productos.guardar(product_id, producto) # Solo se guardan productos existentes
+    return registros.fabrica(registros.Producto)(producto) if como_objeto else producto
+
+def obtener_lotes_de_producto(product_id: str, como_objeto: bool = False) -> List[Any]:
+    resultados = ejecutar_query("SELECT id_lote, id_producto, fecha_ingreso FROM lote WHERE id_producto = %s ORDER BY id_lote;",
+                                (product_id,), como=registros.Lote if como_objeto else None)
+    return resultados or []
+
+def obtener_entorno(id_entorno: str, como_objeto: bool = False):
+    query = """
+    SELECT id_entorno, nombre, ubicacion_fisica, temperatura_min, temperatura_max, humedad_min, humedad_max, ventilacion
+    FROM entorno_almacenamiento
+    WHERE id_entorno = %s;
+    """
+    resultado = ejecutar_query(query, (id_entorno,), como=registros.Entorno if como_objeto else None)
+    return resultado[0] if resultado else None
 
 def obtener_stock(product_id: str) -> int: #CALCULA EL STOCK EN GENERAL DE UN PRODUCTO EN ESPECIFICO
     query = """
-    SELECT SUM(CASE tipo_movimiento 
-                  WHEN 'ENTRADA' THEN cantidad 
-                  WHEN 'SALIDA' THEN -cantidad 
-                  ELSE 0 
-               END) as stock_actual
-    FROM movimiento_kardex 
+    SELECT SUM(cantidad) as stock_actual
+    FROM saldo_stock
     WHERE id_producto = %s;
     """
     resultado = ejecutar_query(query, (product_id,))
@@ -59,13 +251,9 @@ def obtener_stock(product_id: str) -> int: #CALCULA EL STOCK EN GENERAL DE UN PR
 
 def obtener_stock_producto_lote(id_producto_especifico: str, id_lote: str, id_entorno) -> int:# Calcula el stock de un lote de un producto en especÍfico 
     query = """
-    SELECT SUM(CASE tipo_movimiento
-                  WHEN 'ENTRADA' THEN cantidad
-                  WHEN 'SALIDA' THEN -cantidad
-                  ELSE 0
-               END) as stock_del_lote_producto
-    FROM movimiento_kardex
-    WHERE id_producto = %s AND id_lote = %s AND id_entorno =%s;
+    SELECT SUM(cantidad) as stock_del_lote_producto
+    FROM saldo_stock
+    WHERE id_producto = %s AND id_lote = %s AND id_entorno = %s;
     """
     resultado = ejecutar_query(query, (id_producto_especifico, id_lote, id_entorno))
     if resultado and resultado[0] and resultado[0][0] is not None:
@@ -73,31 +261,27 @@ def obtener_stock_producto_lote(id_producto_especifico: str, id_lote: str, id_en
     return 0
 
 def producto_entorno(id_entorno: str) -> List[Tuple[Any, ...]]:
+    # num_movimiento es numérico (migración 004/005): el MAX por producto se resuelve
+    # leyendo solo el rango de id_entorno en idx_kardex_entorno_producto_mov
     query = """
     SELECT mk.id_producto, mk.estado_post_movimiento
-    FROM movimiento_kardex mk
-    INNER JOIN (
+    FROM (
         SELECT id_producto, MAX(num_movimiento) as max_mov
         FROM movimiento_kardex
         WHERE id_entorno = %s
         GROUP BY id_producto
-    ) as latest_mov 
-    ON mk.id_producto = latest_mov.id_producto AND mk.num_movimiento = latest_mov.max_mov
-    WHERE mk.id_entorno = %s;
+    ) as latest_mov
+    INNER JOIN movimiento_kardex mk ON mk.num_movimiento = latest_mov.max_mov;
     """
-    resultado = ejecutar_query(query, (id_entorno, id_entorno))
+    resultado = ejecutar_query(query, (id_entorno,))
     if resultado is None:
         return []
     return resultado
 
 def obtener_stock_producto_desglosado_por_lote(product_id: str) -> List[Tuple[str, int]]: 
     query = """
-    SELECT id_lote, SUM(CASE tipo_movimiento
-                           WHEN 'ENTRADA' THEN cantidad
-                           WHEN 'SALIDA' THEN -cantidad
-                           ELSE 0
-                        END) as stock_del_lote
-    FROM movimiento_kardex
+    SELECT id_lote, SUM(cantidad) as stock_del_lote
+    FROM saldo_stock
     WHERE id_producto = %s 
     GROUP BY id_lote;
     """
@@ -113,105 +297,377 @@ def cantidad_productos_dañados() -> int:
         return int(resultado[0][0])
     return 0
 
-def obtener_sim_total(): # Esta función ahora calcula el STOCK de SIMs en total.
+def obtener_stock_por_entorno() -> Optional[List[Tuple[str, Optional[str], int]]]:
+    # (id_entorno, nombre, stock) de cada entorno con saldo, en una consulta sobre el saldo materializado; None si falló
     sql_query = """
-    SELECT SUM(CASE mk.tipo_movimiento
-              WHEN 'ENTRADA' THEN mk.cantidad
-              WHEN 'SALIDA' THEN -mk.cantidad
-              ELSE 0
-           END) AS stock_total_sim
-    FROM producto p
-    LEFT JOIN lote l ON p.id_producto = l.id_producto
-    LEFT JOIN movimiento_kardex mk ON l.id_lote = mk.id_lote
-    WHERE p.tipo = 'SIM';
+    SELECT s.id_entorno, e.nombre, SUM(s.cantidad) AS stock_entorno
+    FROM saldo_stock s
+    LEFT JOIN entorno_almacenamiento e ON e.id_entorno = s.id_entorno
+    GROUP BY s.id_entorno, e.nombre
+    ORDER BY s.id_entorno;
     """
-    resultado = ejecutar_query(sql_query)
-    if resultado and resultado[0] and resultado[0][0] is not None:
-        return int(resultado[0][0])
-    return
+    resultados = ejecutar_query(sql_query)
+    if resultados is None:
+        return None
+    return [(str(id_entorno), nombre, int(stock or 0)) for id_entorno, nombre, stock in resultados]
+
+OPERADORES = ("ENTEL", "MOVISTAR", "CLARO", "BITEL")
+
+# Stock de SIMs agrupado por operador; lo invalidan los movimientos nuevos de SIMs (ver feed_kardex)
+cache_sim = CacheLRU(1, CACHE_SIM_TTL)
+
+_sim_lock = threading.Lock() # Un solo hilo consulta ante un fallo de cache; los demás esperan su resultado
+
+def _stock_sim_agrupado() -> Optional[Dict[Optional[str], int]]:
+    encontrado, agrupado = cache_sim.obtener("por_operador")
+    if encontrado:
+        return agrupado
+    with _sim_lock:
+        encontrado, agrupado = cache_sim.obtener("por_operador") # Otro hilo pudo cargarlo mientras se esperaba
+        if encontrado:
+            return agrupado
+        # Una sola consulta: las SIMs salen de idx_producto_tipo_operador y cada una
+        # se une con su saldo por la PK de saldo_stock, sin pasar por lote ni por el kardex
+        sql_query = """
+        SELECT p.operador, SUM(s.cantidad) AS stock_sim
+        FROM producto p
+        INNER JOIN saldo_stock s ON s.id_producto = p.id_producto
+        WHERE p.tipo = 'SIM'
+        GROUP BY p.operador;
+        """
+        resultados = ejecutar_query(sql_query)
+        if resultados is None:
+            return None
+        agrupado = {operador: int(stock or 0) for operador, stock in resultados}
+        cache_sim.guardar("por_operador", agrupado)
+        return agrupado
 
-def obtener_sim_de_operador(operator_name: str): # Esta función ahora calcula el STOCK de SIMs de un operador, basado en los movimientos de entrada/salida.
-    sql_query = """
-    SELECT SUM(CASE mk.tipo_movimiento
-              WHEN 'ENTRADA' THEN mk.cantidad
-              WHEN 'SALIDA' THEN -mk.cantidad
-              ELSE 0
-           END) AS stock_total_sim
-    FROM producto p
-    LEFT JOIN lote l ON p.id_producto = l.id_producto
-    LEFT JOIN movimiento_kardex mk ON l.id_lote = mk.id_lote
-    WHERE p.tipo = 'SIM' AND p.operador = %s;
-    """
-    resultado = ejecutar_query(sql_query, params=(operator_name,))
-    if resultado and resultado[0] and resultado[0][0] is not None:
-        return int(resultado[0][0])
-    return 0 # Devuelve 0 si no hay stock o el operador no tiene SIMs con movimientos
+def obtener_sim_por_operador() -> Optional[Dict[str, int]]: # Stock de SIMs de cada operador (0 si no tiene), en una consulta; None si falló
+    agrupado = _stock_sim_agrupado()
+    if agrupado is None:
+        return None
+    return {operador: agrupado.get(operador, 0) for operador in OPERADORES}
 
-def obtener_detalles_entradas_en_un_dia(specific_date: str) -> List[Tuple[Any, ...]]:
-    query = """
-    SELECT num_movimiento, id_producto, cantidad, id_lote, id_entorno, estado_post_movimiento
-    FROM movimiento_kardex
-    WHERE tipo_movimiento = 'ENTRADA' AND fecha = %s;
-    """
-    resultados = ejecutar_query(query, (specific_date,))
+def obtener_sim_total(): # Esta función ahora calcula el STOCK de SIMs en total.
+    agrupado = _stock_sim_agrupado()
+    if agrupado is None:
+        return None
+    return sum(agrupado.values()) # Incluye las SIMs sin operador asignado
+
+def obtener_sim_de_operador(operator_name: str): # Esta función ahora calcula el STOCK de SIMs de un operador, a partir del saldo materializado
+    agrupado = _stock_sim_agrupado()
+    if agrupado is None: # Error de la BD: no confundirlo con un operador sin stock
+        return None
+    return agrupado.get(operator_name.strip().upper(), 0) # 0 si no hay stock o el operador no tiene SIMs con movimientos
+
+def cambios_tocan_sims(cambios) -> bool: # True si alguno de los productos movidos (filas de feed_kardex) es una SIM
+    for bloque in _bloques({fila[3] for fila in cambios}, TAMANO_BLOQUE_IN):
+        marcadores = ", ".join(["%s"] * len(bloque))
+        resultado = ejecutar_query(
+            f"SELECT COUNT(*) FROM producto WHERE tipo = 'SIM' AND id_producto IN ({marcadores});", tuple(bloque))
+        if resultado is None or resultado[0][0]: # Ante un error, mejor suponer que sí
+            return True
+    return False
+
+def invalidar_sim_al_recibir_cambios(cambios) -> None:
+    # Oyente para feed_kardex: solo invalida si alguno de los productos movidos es una SIM
+    if cambios_tocan_sims(cambios):
+        cache_sim.limpiar()
+
+CAMPOS_MOVIMIENTOS_DEL_DIA = ("num_movimiento", "id_producto", "cantidad", "id_lote", "id_entorno", "estado_post_movimiento")
+SQL_MOVIMIENTOS_DEL_DIA = """
+SELECT {columnas}
+FROM movimiento_kardex
+WHERE tipo_movimiento = %s AND fecha = %s;
+"""
+
+def _consulta_movimientos_del_dia(como_objeto: bool) -> Tuple[str, Optional[type]]:
+    # Las tuplas traen solo CAMPOS_MOVIMIENTOS_DEL_DIA; los registros.Movimiento, todos sus campos (fecha y tipo incluidos)
+    if como_objeto:
+        return SQL_MOVIMIENTOS_DEL_DIA.format(columnas=", ".join(registros.Movimiento.CAMPOS)), registros.Movimiento
+    return SQL_MOVIMIENTOS_DEL_DIA.format(columnas=", ".join(CAMPOS_MOVIMIENTOS_DEL_DIA)), None
+
+def obtener_detalles_entradas_en_un_dia(specific_date: str, como_objeto: bool = False) -> List[Any]:
+    query, como = _consulta_movimientos_del_dia(como_objeto)
+    resultados = ejecutar_query(query, ("ENTRADA", specific_date), como=como)
     if resultados:
         return resultados
     return []
 
-def obtener_detalles_salidas_en_un_dia(specific_date: str) -> List[Tuple[Any, ...]]:
-    query = """
-    SELECT num_movimiento, id_producto, cantidad, id_lote, id_entorno, estado_post_movimiento
-    FROM movimiento_kardex
-    WHERE tipo_movimiento = 'SALIDA' AND fecha = %s;
-    """
-    resultados = ejecutar_query(query, (specific_date,))
+def obtener_detalles_salidas_en_un_dia(specific_date: str, como_objeto: bool = False) -> List[Any]:
+    query, como = _consulta_movimientos_del_dia(como_objeto)
+    resultados = ejecutar_query(query, ("SALIDA", specific_date), como=como)
     if resultados:
         return resultados
     return []
 
-def obtener_stock_todos_productos(): #CALCULA EL STOCK EN GENERAL DE TODOS LOS PRODUCTOS
-    query_productos = "SELECT id_producto, nombre FROM producto;"
-    productos = ejecutar_query(query_productos)
-    
-    if not productos:
-        return []
-        
-    stock_total = []
-    for id_producto, nombre_producto in productos:
-        stock = obtener_stock(id_producto)
-        stock_total.append((id_producto, nombre_producto, stock))
-        
-    return stock_total
+# En streaming: un error a mitad del día se relanza, nunca se entrega un día a medias como si fuera completo
+def iterar_entradas_en_un_dia(specific_date: str, tamano_lote: int = 1000, como_objeto: bool = False) -> Iterator[List[Any]]:
+    query, como = _consulta_movimientos_del_dia(como_objeto)
+    return iterar_query(query, ("ENTRADA", specific_date), tamano_lote, como=como, propagar_errores=True)
+
+def iterar_salidas_en_un_dia(specific_date: str, tamano_lote: int = 1000, como_objeto: bool = False) -> Iterator[List[Any]]:
+    query, como = _consulta_movimientos_del_dia(como_objeto)
+    return iterar_query(query, ("SALIDA", specific_date), tamano_lote, como=como, propagar_errores=True)
+
+# Una página del día siguiendo idx_kardex_tipo_fecha_mov (migración 009): sin ordenar el día entero en cada página
+SQL_PAGINA_MOVIMIENTOS_DEL_DIA = """
+SELECT {columnas}
+FROM movimiento_kardex
+WHERE tipo_movimiento = %s AND fecha = %s AND num_movimiento > %s
+ORDER BY num_movimiento
+LIMIT %s;
+"""
+
+class PaginasMovimientosDelDia:
+    """Movimientos de un tipo en una fecha, de a una página por vez, en orden de num_movimiento.
+
+    Para la tabla de la GUI, que pide páginas mientras el usuario se
+    desplaza: como PaginasStockProductos, cada página es una consulta por
+    clave (num_movimiento > último visto) y entre página y página no queda
+    ningún cursor abierto ocupando una conexión del pool. Si una página
+    falla se lanza ListadoIncompleto y el siguiente next() la vuelve a pedir.
+    """
 
-def mostrar_imagen(id_imagen):
-    conexion = conexion_BD()
-    cursor = conexion.cursor()
+    def __init__(self, tipo_movimiento: str, fecha: str, tamano_pagina: int = 1000, como_objeto: bool = False):
+        self.tipo_movimiento = tipo_movimiento
+        self.fecha = fecha
+        self.tamano_pagina = tamano_pagina
+        columnas = registros.Movimiento.CAMPOS if como_objeto else CAMPOS_MOVIMIENTOS_DEL_DIA # num_movimiento va primero
+        self._query = SQL_PAGINA_MOVIMIENTOS_DEL_DIA.format(columnas=", ".join(columnas))
+        self._como = registros.Movimiento if como_objeto else None
+        self._ultimo = 0
+        self._terminado = False
+
+    def __iter__(self) -> "PaginasMovimientosDelDia":
+        return self
+
+    def __next__(self) -> List[Any]:
+        if self._terminado:
+            raise StopIteration
+        pagina = ejecutar_query(self._query, (self.tipo_movimiento, self.fecha, self._ultimo, self.tamano_pagina),
+                                como=self._como)
+        if pagina is None:
+            raise ListadoIncompleto(f"No se pudo leer la página de {self.tipo_movimiento} del {self.fecha} "
+                                    f"después del movimiento {self._ultimo}")
+        if len(pagina) < self.tamano_pagina:
+            self._terminado = True
+        if not pagina:
+            raise StopIteration
+        self._ultimo = pagina[-1][0]
+        return pagina
+
+    def close(self) -> None:
+        self._terminado = True
+
+def iterar_paginas_entradas_en_un_dia(specific_date: str, tamano_pagina: int = 1000, como_objeto: bool = False) -> PaginasMovimientosDelDia:
+    return PaginasMovimientosDelDia("ENTRADA", specific_date, tamano_pagina, como_objeto)
+
+def iterar_paginas_salidas_en_un_dia(specific_date: str, tamano_pagina: int = 1000, como_objeto: bool = False) -> PaginasMovimientosDelDia:
+    return PaginasMovimientosDelDia("SALIDA", specific_date, tamano_pagina, como_objeto)
+
+SQL_STOCK_PRODUCTOS = """
+SELECT p.id_producto, p.nombre, COALESCE(SUM(s.cantidad), 0) AS stock_actual
+FROM producto p
+LEFT JOIN saldo_stock s ON s.id_producto = p.id_producto
+WHERE {filtro}
+GROUP BY p.id_producto, p.nombre
+ORDER BY p.id_producto
+LIMIT %s;
+"""
+
+def obtener_pagina_stock_productos(desde_id: str = "", tamano_pagina: int = 1000, ids: Optional[List[str]] = None) -> Optional[List[Tuple[str, str, int]]]:
+    # Una sola consulta agrupada por página; paginación por clave (id_producto > último id visto)
+    if ids is None:
+        query = SQL_STOCK_PRODUCTOS.format(filtro="p.id_producto > %s")
+        params = (desde_id, tamano_pagina)
+    else:
+        if not ids:
+            return []
+        marcadores = ", ".join(["%s"] * len(ids))
+        query = SQL_STOCK_PRODUCTOS.format(filtro=f"p.id_producto > %s AND p.id_producto IN ({marcadores})")
+        params = (desde_id, *ids, tamano_pagina)
+    resultados = ejecutar_query(query, params)
+    if resultados is None:
+        return None
+    return [(id_producto, nombre, int(stock)) for id_producto, nombre, stock in resultados]
+
+class PaginasStockProductos:
+    """Iterador del stock de todos los productos (o solo de `ids`), de a una página por vez.
+
+    Cada página es una consulta independiente: entre página y página no se
+    retiene ninguna conexión. Si una página falla se lanza ListadoIncompleto
+    en lugar de terminar como si no hubiera más productos, y a diferencia de
+    un generador el iterador sigue usable: el siguiente next() vuelve a
+    pedir esa misma página (así la tabla de la GUI puede reintentar).
+    """
+
+    def __init__(self, ids: Optional[Iterable[str]] = None, tamano_pagina: int = 1000):
+        self.tamano_pagina = tamano_pagina
+        self._ids = None if ids is None else sorted(set(ids))
+        self._ultimo_id = "" # Paginación por clave (sin ids) o posición en la lista de ids
+        self._posicion = 0
+        self._terminado = False
+
+    def __iter__(self) -> "PaginasStockProductos":
+        return self
+
+    def __next__(self) -> List[Tuple[str, str, int]]:
+        while not self._terminado:
+            if self._ids is None:
+                pagina = obtener_pagina_stock_productos(self._ultimo_id, self.tamano_pagina)
+                if pagina is None:
+                    raise ListadoIncompleto(f"No se pudo leer la página de stock después del producto '{self._ultimo_id}'")
+                if len(pagina) < self.tamano_pagina:
+                    self._terminado = True
+                if pagina:
+                    self._ultimo_id = pagina[-1][0]
+                    return pagina
+            else:
+                bloque = self._ids[self._posicion:self._posicion + self.tamano_pagina]
+                if not bloque:
+                    self._terminado = True
+                    break
+                pagina = obtener_pagina_stock_productos("", self.tamano_pagina, bloque)
+                if pagina is None:
+                    raise ListadoIncompleto(f"No se pudo leer la página {self._posicion // self.tamano_pagina + 1} del stock por ids")
+                self._posicion += self.tamano_pagina
+                if pagina: # Un bloque de ids inexistentes no es el final del listado
+                    return pagina
+        raise StopIteration
+
+    def close(self) -> None: # Como el close() de un generador: deja de entregar páginas
+        self._terminado = True
+
+def iterar_paginas_stock_productos(ids: Optional[Iterable[str]] = None, tamano_pagina: int = 1000) -> PaginasStockProductos:
+    return PaginasStockProductos(ids, tamano_pagina)
+
+def iterar_stock_productos(ids: Optional[Iterable[str]] = None, tamano_pagina: int = 1000) -> Iterator[Tuple[str, str, int]]:
+    # Recorre el stock fila a fila, sin cargarlo entero en memoria
+    for pagina in iterar_paginas_stock_productos(ids, tamano_pagina):
+        yield from pagina
+
+def obtener_stock_todos_productos(ids: Optional[Iterable[str]] = None, tamano_pagina: int = 1000): #CALCULA EL STOCK EN GENERAL DE TODOS LOS PRODUCTOS
+    try:
+        return list(iterar_stock_productos(ids, tamano_pagina))
+    except ListadoIncompleto as err: # None, como las demás consultas ante un error: nunca una lista a medias
+        print(err)
+        return None
+
+def _bloques(valores: Iterable, tamano: int) -> Iterator[list]:
+    # Valores sin repetir, en orden, partidos en bloques de a lo sumo `tamano`
+    unicos = sorted(set(valores))
+    for inicio in range(0, len(unicos), tamano):
+        yield unicos[inicio:inicio + tamano]
+
+def obtener_stock_many(ids: Iterable[str], tamano_bloque: int = TAMANO_BLOQUE_IN) -> Dict[str, Optional[int]]:
+    """Stock general de varios productos con una consulta por cada `tamano_bloque` ids.
+
+    Devuelve {id_producto: stock}; los productos que no existen quedan con
+    None (un producto existente sin movimientos tiene stock 0). Si una
+    consulta falla, los ids de ese bloque no aparecen en el resultado.
+    """
+    stock: Dict[str, Optional[int]] = {}
+    for bloque in _bloques(ids, tamano_bloque):
+        marcadores = ", ".join(["%s"] * len(bloque))
+        query = f"""
+        SELECT p.id_producto, COALESCE(SUM(s.cantidad), 0) AS stock_actual
+        FROM producto p
+        LEFT JOIN saldo_stock s ON s.id_producto = p.id_producto
+        WHERE p.id_producto IN ({marcadores})
+        GROUP BY p.id_producto;
+        """
+        resultados = ejecutar_query(query, tuple(bloque))
+        if resultados is None:
+            continue
+        encontrados = {id_producto: int(cantidad) for id_producto, cantidad in resultados}
+        for id_producto in bloque:
+            stock[id_producto] = encontrados.get(id_producto)
+    return stock
+
+def obtener_stock_lotes_many(claves: Iterable[Tuple[str, str, str]],
+                             tamano_bloque: int = TAMANO_BLOQUE_IN) -> Dict[Tuple[str, str, str], Optional[int]]:
+    """Versión por lote de obtener_stock_producto_lote: claves (id_producto, id_lote, id_entorno).
+
+    Las combinaciones sin ningún movimiento registrado quedan con None.
+    """
+    stock: Dict[Tuple[str, str, str], Optional[int]] = {}
+    for bloque in _bloques(claves, tamano_bloque):
+        marcadores = ", ".join(["(%s, %s, %s)"] * len(bloque))
+        query = f"""
+        SELECT id_producto, id_lote, id_entorno, SUM(cantidad) AS stock_del_lote_producto
+        FROM saldo_stock
+        WHERE (id_producto, id_lote, id_entorno) IN ({marcadores})
+        GROUP BY id_producto, id_lote, id_entorno;
+        """
+        resultados = ejecutar_query(query, tuple(valor for clave in bloque for valor in clave))
+        if resultados is None:
+            continue
+        encontrados = {(id_producto, id_lote, id_entorno): int(cantidad)
+                       for id_producto, id_lote, id_entorno, cantidad in resultados}
+        for clave in bloque:
+            stock[clave] = encontrados.get(clave)
+    return stock
+
+def obtener_stock_en_entorno_many(ids: Iterable[str], id_entorno: str,
+                                  tamano_bloque: int = TAMANO_BLOQUE_IN) -> Dict[str, Optional[int]]:
+    """Stock de varios productos dentro de un entorno de almacenamiento (p. ej. una lista de picking).
+
+    Igual que obtener_stock_many: None para los productos que no existen,
+    0 para los que existen pero no tienen saldo en ese entorno.
+    """
+    stock: Dict[str, Optional[int]] = {}
+    for bloque in _bloques(ids, tamano_bloque):
+        marcadores = ", ".join(["%s"] * len(bloque))
+        query = f"""
+        SELECT p.id_producto, COALESCE(SUM(s.cantidad), 0) AS stock_en_entorno
+        FROM producto p
+        LEFT JOIN saldo_stock s ON s.id_producto = p.id_producto AND s.id_entorno = %s
+        WHERE p.id_producto IN ({marcadores})
+        GROUP BY p.id_producto;
+        """
+        resultados = ejecutar_query(query, (id_entorno, *bloque))
+        if resultados is None:
+            continue
+        encontrados = {id_producto: int(cantidad) for id_producto, cantidad in resultados}
+        for id_producto in bloque:
+            stock[id_producto] = encontrados.get(id_producto)
+    return stock
+
+def obtener_ruta_imagen(id_producto: str) -> Optional[str]:
+    resultado = ejecutar_query("SELECT ruta FROM producto WHERE id_producto = %s", (id_producto,))
+    return resultado[0][0] if resultado else None
+
+def obtener_rutas_imagenes() -> List[str]: # Rutas de imagen de todos los productos que tienen una
+    resultado = ejecutar_query("SELECT DISTINCT ruta FROM producto WHERE ruta IS NOT NULL AND ruta <> '';")
+    return [fila[0] for fila in resultado] if resultado else []
+
+def obtener_miniatura_producto(id_producto: str):
+    # Devuelve la miniatura ya decodificada (de la caché en disco si existe) o None si no hay imagen
+    ruta_imagen = obtener_ruta_imagen(id_producto)
+    if not ruta_imagen or not os.path.exists(ruta_imagen):
+        return None
+    return miniaturas.cargar_miniatura(ruta_imagen)
 
-    cursor.execute("SELECT ruta FROM producto WHERE id_producto = %s", (id_imagen,))
-    resultado = cursor.fetchone()
+def mostrar_imagen(id_imagen):
+    ruta_imagen = obtener_ruta_imagen(id_imagen)
 
-    if resultado:
-        ruta_imagen = resultado[0]
+    if ruta_imagen:
         if os.path.exists(ruta_imagen):
-            img = Image.open(ruta_imagen)
+            img = Image.open(ruta_imagen) # El visor muestra la imagen original; las miniaturas son para la GUI
             img.show()
         else:
             print("⚠️  La imagen ya no existe en el disco.")
     else:
         print("⚠️  No se encontró esa imagen.")
 
-    cursor.close()
-    conexion.close()
-
 def mostrar_ruta_imagen(id_imagen:str):
     query = "SELECT ruta FROM producto WHERE id_producto = %s"
-    resultado = ejecutar_query(query, id_imagen)
+    resultado = ejecutar_query(query, (id_imagen,))
     return resultado
 
 if __name__ == "__main__":
-    column_names_producto = ["ID Producto", "Descripción", "Tipo", "Modelo", "Operador", "No. Serie", "ICCID", "MAC", "Tecnología", "Propiedad", 
-                             "Estado", "Ruta Archivo", "Nombre Archivo"]
-    column_names_movimientos = ["No. Movimiento", "ID Producto", "Cantidad", "ID Lote", "ID Entorno", "Estado Post Movimiento"]
+    etiquetas_movimientos = registros.Movimiento.etiquetas(CAMPOS_MOVIMIENTOS_DEL_DIA)
     while True:
         print("\n--- MENÚ PRINCIPAL ---")
         print("1. Ver detalles de un producto (incluye stock por lote)")
@@ -226,19 +682,19 @@ if __name__ == "__main__":
         print("10. Contar SIM cards por operador") 
         print("11. Contar SIM cards totales") 
         print("12. Mostrar imagen de producto")
+        print("13. Ver métricas de consultas")
         
         opcion_valida = False
-        opcion = input("Seleccione una opción (1-12): ")
+        opcion = input("Seleccione una opción (1-13): ")
 
         if opcion == "1":
             opcion_valida = True
             pid = input("Ingrese ID del producto: ")
-            detalles_producto = obtener_detalles_producto(pid)
+            detalles_producto = obtener_detalles_producto(pid, como_objeto=True)
             if detalles_producto:
                 print("--- Detalles del Producto ---")
-                for i, col_name in enumerate(column_names_producto):
-                    if i < len(detalles_producto):
-                         print(f"{col_name}: {detalles_producto[i]}")
+                for col_name, valor in detalles_producto.campos():
+                    print(f"{col_name}: {valor}")
 
                 print("\n--- Stock por Lote (asociado al producto) ---")
                 stock_lotes = obtener_stock_producto_desglosado_por_lote(pid)
@@ -314,34 +770,54 @@ if __name__ == "__main__":
         elif opcion == "8": 
             opcion_valida = True
             fecha = input("Ingrese la fecha (YYYY-MM-DD) para ver detalles de entradas: ")
-            detalles_entradas = obtener_detalles_entradas_en_un_dia(fecha)
-            if detalles_entradas:
-                print(f"\n--- Detalles de Entradas en {fecha} ---")
-                for entrada in detalles_entradas:
-                    for i, col_name in enumerate(column_names_movimientos): 
-                        print(f"  {col_name}: {entrada[i]}")
-                    print("-" * 20)
+            total_entradas = 0
+            try:
+                for lote_entradas in iterar_entradas_en_un_dia(fecha, como_objeto=True): # Se imprimen por bloques, sin cargar el día completo
+                    if total_entradas == 0:
+                        print(f"\n--- Detalles de Entradas en {fecha} ---")
+                    for entrada in lote_entradas:
+                        for campo, col_name in zip(CAMPOS_MOVIMIENTOS_DEL_DIA, etiquetas_movimientos):
+                            print(f"  {col_name}: {getattr(entrada, campo)}")
+                        print("-" * 20)
+                    total_entradas += len(lote_entradas)
+            except ERRORES_CONSULTA as err:
+                print(f"❌ Error de base de datos: el listado quedó incompleto ({total_entradas} entradas mostradas): {err}")
             else:
-                print(f"No se encontraron entradas para la fecha {fecha}.")
+                if total_entradas == 0:
+                    print(f"No se encontraron entradas para la fecha {fecha}.")
 
         elif opcion == "9": # Antigua opción 6 - Consultar salidas de un día específico
             opcion_valida = True
             fecha = input("Ingrese la fecha (YYYY-MM-DD) para ver detalles de salidas: ")
-            detalles_salidas = obtener_detalles_salidas_en_un_dia(fecha)
-            if detalles_salidas:
-                print(f"\n--- Detalles de Salidas en {fecha} ---")
-                for salida in detalles_salidas:
-                    for i, col_name in enumerate(column_names_movimientos): # Reutilizamos column_names_movimientos
-                        print(f"  {col_name}: {salida[i]}")
-                    print("-" * 20)
+            total_salidas = 0
+            try:
+                for lote_salidas in iterar_salidas_en_un_dia(fecha, como_objeto=True):
+                    if total_salidas == 0:
+                        print(f"\n--- Detalles de Salidas en {fecha} ---")
+                    for salida in lote_salidas:
+                        for campo, col_name in zip(CAMPOS_MOVIMIENTOS_DEL_DIA, etiquetas_movimientos):
+                            print(f"  {col_name}: {getattr(salida, campo)}")
+                        print("-" * 20)
+                    total_salidas += len(lote_salidas)
+            except ERRORES_CONSULTA as err:
+                print(f"❌ Error de base de datos: el listado quedó incompleto ({total_salidas} salidas mostradas): {err}")
             else:
-                print(f"No se encontraron salidas para la fecha {fecha}.")
+                if total_salidas == 0:
+                    print(f"No se encontraron salidas para la fecha {fecha}.")
             
         elif opcion == "10": # Antigua opción 7
             opcion_valida = True
-            operador_nombre = input("Ingrese nombre del operador para contar sus SIM cards: ")
-            num_sim_operador = obtener_sim_de_operador(operador_nombre)
-            print(f"Total de SIM cards del operador '{operador_nombre}': {num_sim_operador}")
+            operador_nombre = input("Ingrese nombre del operador para contar sus SIM cards (Enter para ver todos): ").strip()
+            if operador_nombre:
+                num_sim_operador = obtener_sim_de_operador(operador_nombre)
+                print(f"Total de SIM cards del operador '{operador_nombre}': {num_sim_operador}")
+            else:
+                por_operador = obtener_sim_por_operador()
+                if por_operador is None:
+                    print("No se pudo consultar el stock de SIM cards.")
+                else:
+                    for operador, num_sim_operador in por_operador.items():
+                        print(f"  {operador:<10} {num_sim_operador}")
 
         elif opcion == "11": # Antigua opción 8
             opcion_valida = True
@@ -356,6 +832,15 @@ if __name__ == "__main__":
             except ValueError:
                 print("❌ ID inválido.")
 
+        elif opcion == "13":
+            opcion_valida = True
+            print("--- Métricas de consultas (por plantilla, desde que se abrió el programa) ---")
+            print(metricas.resumen_texto(metricas_consultas.instantanea()))
+            ruta_metricas = input("Ruta para exportar en formato Prometheus (Enter para omitir): ").strip()
+            if ruta_metricas:
+                exportar_metricas(ruta_metricas)
+                print(f"Métricas exportadas a {ruta_metricas}")
+
         else:
             print("Opción no válida. Por favor, intente nuevamente.")
         
@@ -0,0 +1,119 @@
+import asyncio
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial, wraps
+from typing import Any, Awaitable, Callable, Dict, Iterable, Optional
+
+import oficial
+
+# Versión asyncio de la API de oficial.py. Cada consulta sigue siendo la función
+# síncrona de siempre, pero corre en un hilo de un executor con tantos hilos
+# como conexiones tiene el pool: las consultas independientes se lanzan juntas
+# (asyncio.gather) y tardan lo que la más lenta, sin abrir más conexiones que
+# las del pool ni esperar en PoolConexiones.obtener().
+
+_executor: Optional[ThreadPoolExecutor] = None
+_executor_tamano = 0
+_executor_lock = threading.Lock()
+
+def obtener_executor() -> ThreadPoolExecutor: # Se rehace si configurar_pool cambió el tamaño del pool
+    global _executor, _executor_tamano
+    with _executor_lock:
+        if _executor is None or _executor_tamano != oficial.POOL_TAMANO:
+            if _executor is not None:
+                _executor.shutdown(wait=False)
+            _executor_tamano = oficial.POOL_TAMANO
+            _executor = ThreadPoolExecutor(max_workers=_executor_tamano, thread_name_prefix="consulta-async")
+        return _executor
+
+def cerrar_executor() -> None:
+    global _executor
+    with _executor_lock:
+        anterior, _executor = _executor, None
+    if anterior is not None:
+        anterior.shutdown(wait=True)
+
+async def ejecutar(funcion: Callable[..., Any], *args: Any, **kwargs: Any) -> Any:
+    """Corre `funcion(*args, **kwargs)` en el executor y espera el resultado sin bloquear el loop."""
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(obtener_executor(), partial(funcion, *args, **kwargs))
+
+def _asincrona(funcion: Callable[..., Any]) -> Callable[..., Awaitable[Any]]:
+    @wraps(funcion)
+    async def envoltura(*args: Any, **kwargs: Any) -> Any:
+        return await ejecutar(funcion, *args, **kwargs)
+    return envoltura
+
+obtener_detalles_producto = _asincrona(oficial.obtener_detalles_producto)
+obtener_stock = _asincrona(oficial.obtener_stock)
+obtener_stock_many = _asincrona(oficial.obtener_stock_many)
+obtener_stock_lotes_many = _asincrona(oficial.obtener_stock_lotes_many)
+obtener_stock_en_entorno_many = _asincrona(oficial.obtener_stock_en_entorno_many)
+obtener_stock_producto_lote = _asincrona(oficial.obtener_stock_producto_lote)
+obtener_stock_producto_desglosado_por_lote = _asincrona(oficial.obtener_stock_producto_desglosado_por_lote)
+producto_entorno = _asincrona(oficial.producto_entorno)
+cantidad_productos_dañados = _asincrona(oficial.cantidad_productos_dañados)
+obtener_stock_por_entorno = _asincrona(oficial.obtener_stock_por_entorno)
+obtener_sim_total = _asincrona(oficial.obtener_sim_total)
+obtener_sim_de_operador = _asincrona(oficial.obtener_sim_de_operador)
+obtener_sim_por_operador = _asincrona(oficial.obtener_sim_por_operador)
+obtener_detalles_entradas_en_un_dia = _asincrona(oficial.obtener_detalles_entradas_en_un_dia)
+obtener_detalles_salidas_en_un_dia = _asincrona(oficial.obtener_detalles_salidas_en_un_dia)
+obtener_stock_todos_productos = _asincrona(oficial.obtener_stock_todos_productos)
+obtener_lotes_de_producto = _asincrona(oficial.obtener_lotes_de_producto)
+obtener_entorno = _asincrona(oficial.obtener_entorno)
+
+async def obtener_resumen_inventario_async(incluir_productos: bool = True) -> Dict[str, Any]:
+    """Las cifras de la pantalla de resumen, consultadas en paralelo.
+
+    Devuelve total de SIMs, SIMs por operador, movimientos DAÑADO y, con
+    `incluir_productos`, el stock de todos los productos. El total y el
+    desglose por operador salen de la misma consulta agrupada: la primera
+    en llegar la ejecuta y la otra espera ese resultado (ver
+    oficial._stock_sim_agrupado).
+    """
+    tareas = {
+        "sim_total": obtener_sim_total(),
+        "sim_por_operador": obtener_sim_por_operador(),
+        "productos_danados": cantidad_productos_dañados(),
+    }
+    if incluir_productos:
+        tareas["stock_productos"] = obtener_stock_todos_productos()
+    valores = await asyncio.gather(*tareas.values())
+    resultados = dict(zip(tareas, valores))
+    resultados.setdefault("stock_productos", None)
+    return resultados
+
+def obtener_resumen_inventario(incluir_productos: bool = True) -> Dict[str, Any]:
+    # Envoltura síncrona para el menú de consola y los scripts (no llamar desde un loop en marcha)
+    return asyncio.run(obtener_resumen_inventario_async(incluir_productos))
+
+# Cifras del tablero de la GUI: cada una se puede pedir por separado para refrescar solo las que cambiaron
+METRICAS_TABLERO: Dict[str, Callable[[], Awaitable[Any]]] = {
+    "stock_entornos": obtener_stock_por_entorno,
+    "danados": cantidad_productos_dañados,
+    "sim": obtener_sim_por_operador,
+}
+
+async def obtener_metricas_async(nombres: Iterable[str]) -> Dict[str, Any]:
+    # Las métricas pedidas (claves de METRICAS_TABLERO) en una sola tanda concurrente
+    nombres = list(nombres)
+    valores = await asyncio.gather(*(METRICAS_TABLERO[nombre]() for nombre in nombres))
+    return dict(zip(nombres, valores))
+
+def obtener_metricas(nombres: Iterable[str]) -> Dict[str, Any]:
+    return asyncio.run(obtener_metricas_async(nombres))
+
+if __name__ == "__main__":
+    inicio = time.perf_counter()
+    resumen = obtener_resumen_inventario()
+    segundos = time.perf_counter() - inicio
+    print("--- Resumen del inventario ---")
+    print(f"SIM cards en stock: {resumen['sim_total']}")
+    for operador, cantidad in (resumen["sim_por_operador"] or {}).items():
+        print(f"  {operador:<10} {cantidad}")
+    print(f"Movimientos con estado DAÑADO: {resumen['productos_danados']}")
+    print(f"Productos con stock consultado: {len(resumen['stock_productos'] or [])}")
+    print(f"({segundos * 1000:.0f} ms, consultas en paralelo sobre {oficial.POOL_TAMANO} conexiones)")
+    cerrar_executor()
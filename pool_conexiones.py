@@ -0,0 +1,156 @@
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+from typing import Any, Callable, Deque, Dict, Optional, Tuple
+
+
+class PoolAgotado(Exception):
+    """Se agotó el tiempo de espera para obtener una conexión libre del pool."""
+
+
+class PoolConexiones:
+    """Pool de conexiones reutilizables compartido por todo el proceso.
+
+    Las conexiones se crean bajo demanda hasta `tamano`. Al entregarlas se
+    verifica su estado si estuvieron inactivas más de `verificar_tras`
+    segundos; las que fallan la verificación se descartan y se reemplazan por
+    una conexión nueva.
+    """
+
+    def __init__(self, fabrica: Callable[[], Any], tamano: int = 5,
+                 verificar: Optional[Callable[[Any], bool]] = None,
+                 cerrar: Optional[Callable[[Any], None]] = None,
+                 timeout_espera: float = 30.0, verificar_tras: float = 1.0):
+        if tamano < 1:
+            raise ValueError("El tamaño del pool debe ser al menos 1")
+        self.tamano = tamano
+        self.timeout_espera = timeout_espera
+        self.verificar_tras = verificar_tras
+        self._fabrica = fabrica
+        self._verificar = verificar
+        self._cerrar = cerrar
+        self._libres: Deque[Tuple[Any, float]] = deque()
+        self._creadas = 0
+        self._cerrado = False
+        self._condicion = threading.Condition()
+        self._contadores = {
+            "checkouts": 0,
+            "esperas": 0,
+            "conexiones_creadas": 0,
+            "handshakes_ahorrados": 0,
+            "reconexiones": 0,
+            "descartadas": 0,
+        }
+
+    def _cerrar_conexion(self, conexion: Any) -> None:
+        try:
+            if self._cerrar is not None:
+                self._cerrar(conexion)
+            else:
+                conexion.close()
+        except Exception:
+            pass
+
+    def _crear(self) -> Any:
+        try:
+            conexion = self._fabrica()
+        except Exception:
+            with self._condicion:
+                self._creadas -= 1
+                self._condicion.notify()
+            raise
+        with self._condicion:
+            self._contadores["conexiones_creadas"] += 1
+        return conexion
+
+    def obtener(self) -> Any:
+        """Entrega una conexión sana, esperando si todas están en uso."""
+        limite = time.monotonic() + self.timeout_espera
+        with self._condicion:
+            if self._cerrado:
+                raise PoolAgotado("El pool de conexiones está cerrado")
+            self._contadores["checkouts"] += 1
+            espero = False
+            while not self._libres and self._creadas >= self.tamano:
+                if not espero:
+                    self._contadores["esperas"] += 1
+                    espero = True
+                restante = limite - time.monotonic()
+                if restante <= 0:
+                    raise PoolAgotado(f"No hubo conexiones libres en {self.timeout_espera} s")
+                self._condicion.wait(restante)
+            if self._libres:
+                conexion, liberada_en = self._libres.pop()
+            else:
+                conexion, liberada_en = None, 0.0
+                self._creadas += 1
+
+        if conexion is None:
+            return self._crear()
+
+        inactiva = time.monotonic() - liberada_en
+        if self._verificar is not None and inactiva >= self.verificar_tras and not self._verificar(conexion):
+            # Socket caído (timeout del servidor, reinicio, red): se reemplaza.
+            self._cerrar_conexion(conexion)
+            with self._condicion:
+                self._contadores["descartadas"] += 1
+                self._contadores["reconexiones"] += 1
+            return self._crear()
+
+        with self._condicion:
+            self._contadores["handshakes_ahorrados"] += 1
+        return conexion
+
+    def devolver(self, conexion: Any, descartar: bool = False) -> None:
+        with self._condicion:
+            if descartar or self._cerrado:
+                self._creadas -= 1
+                if descartar:
+                    self._contadores["descartadas"] += 1
+            else:
+                self._libres.append((conexion, time.monotonic()))
+                conexion = None
+            self._condicion.notify()
+        if conexion is not None:
+            self._cerrar_conexion(conexion)
+
+    @contextmanager
+    def conexion(self):
+        """Presta una conexión durante el bloque `with` y la devuelve al salir.
+
+        Si el bloque lanza una excepción y la conexión ya no pasa la
+        verificación, se descarta en lugar de volver al pool. Si el bloque se
+        interrumpe (Ctrl+C, un generador que se cierra a medio leer) la
+        conexión puede tener resultados pendientes y también se descarta.
+        """
+        conexion = self.obtener()
+        try:
+            yield conexion
+        except Exception:
+            sana = self._verificar is None or self._verificar(conexion)
+            self.devolver(conexion, descartar=not sana)
+            raise
+        except BaseException:
+            self.devolver(conexion, descartar=True)
+            raise
+        else:
+            self.devolver(conexion)
+
+    def estadisticas(self) -> Dict[str, int]:
+        with self._condicion:
+            datos = dict(self._contadores)
+            datos["tamano"] = self.tamano
+            datos["libres"] = len(self._libres)
+            datos["en_uso"] = self._creadas - len(self._libres)
+        return datos
+
+    def cerrar(self) -> None:
+        with self._condicion:
+            self._cerrado = True
+            libres = [conexion for conexion, _ in self._libres]
+            self._creadas -= len(libres)
+            self._libres.clear()
+            self._condicion.notify_all()
+        for conexion in libres:
+            self._cerrar_conexion(conexion)
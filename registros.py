@@ -0,0 +1,144 @@
+import sys
+from typing import Any, Callable, Dict, List, Optional, Sequence, Tuple
+
+class Registro:
+    """Base de las filas tipadas: atributos por nombre y sin __dict__ por instancia.
+
+    Con __slots__ cada objeto guarda solo las referencias a sus valores, sin
+    el diccionario de atributos de una clase común. Además la fábrica
+    comparte (sys.intern) los textos de los campos de COMPARTIDOS: ids y
+    estados que se repiten en miles de filas y que el conector entrega como
+    un objeto str distinto en cada una (ver tamano_por_fila). También se
+    puede indexar e iterar en el orden de CAMPOS, así que sirve donde se
+    esperaba una tupla (por ejemplo, en TablaVirtual).
+    """
+
+    __slots__ = ()
+    CAMPOS: Tuple[str, ...] = ()
+    COMPARTIDOS: Tuple[str, ...] = () # Campos con pocos valores distintos
+    ETIQUETAS: Dict[str, str] = {} # Nombre para mostrar de cada campo
+
+    def __init__(self, *valores: Any, **por_nombre: Any):
+        for campo, valor in zip(self.CAMPOS, valores):
+            setattr(self, campo, valor)
+        for campo in self.CAMPOS[len(valores):]:
+            setattr(self, campo, por_nombre.get(campo))
+
+    def __iter__(self):
+        for campo in self.CAMPOS:
+            yield getattr(self, campo)
+
+    def __getitem__(self, indice: int) -> Any:
+        return getattr(self, self.CAMPOS[indice])
+
+    def __len__(self) -> int:
+        return len(self.CAMPOS)
+
+    def __eq__(self, otro: Any) -> bool:
+        return type(otro) is type(self) and tuple(self) == tuple(otro)
+
+    def __hash__(self) -> int: # Coherente con __eq__: sirven como clave de dict o en un set
+        return hash((type(self), tuple(self)))
+
+    def __repr__(self) -> str:
+        return f"{type(self).__name__}({', '.join(f'{campo}={getattr(self, campo)!r}' for campo in self.CAMPOS)})"
+
+    def como_tupla(self) -> Tuple[Any, ...]:
+        return tuple(self)
+
+    def campos(self) -> List[Tuple[str, Any]]: # (etiqueta, valor) en orden, para mostrar el detalle
+        return [(self.ETIQUETAS.get(campo, campo), getattr(self, campo)) for campo in self.CAMPOS]
+
+    @classmethod
+    def etiquetas(cls, campos: Optional[Sequence[str]] = None) -> List[str]:
+        return [cls.ETIQUETAS.get(campo, campo) for campo in (campos or cls.CAMPOS)]
+
+
+class Producto(Registro):
+    CAMPOS = ("id_producto", "descripcion", "tipo", "modelo", "operador", "numero_serie", "iccid",
+              "direccion_mac", "tecnologia", "propiedad", "estado", "ruta", "nombre")
+    __slots__ = CAMPOS
+    COMPARTIDOS = ("tipo", "modelo", "operador", "tecnologia", "propiedad", "estado")
+    ETIQUETAS = dict(zip(CAMPOS, ["ID Producto", "Descripción", "Tipo", "Modelo", "Operador", "No. Serie", "ICCID",
+                                  "MAC", "Tecnología", "Propiedad", "Estado", "Ruta Archivo", "Nombre Archivo"]))
+
+
+class Lote(Registro):
+    CAMPOS = ("id_lote", "id_producto", "fecha_ingreso")
+    __slots__ = CAMPOS
+    COMPARTIDOS = ("id_producto",)
+    ETIQUETAS = dict(zip(CAMPOS, ["ID Lote", "ID Producto", "Fecha Ingreso"]))
+
+
+class Movimiento(Registro):
+    CAMPOS = ("num_movimiento", "fecha", "tipo_movimiento", "id_producto", "id_lote", "cantidad",
+              "id_entorno", "estado_post_movimiento")
+    __slots__ = CAMPOS
+    COMPARTIDOS = ("tipo_movimiento", "id_producto", "id_lote", "id_entorno", "estado_post_movimiento")
+    ETIQUETAS = dict(zip(CAMPOS, ["No. Movimiento", "Fecha", "Tipo", "ID Producto", "ID Lote", "Cantidad",
+                                  "ID Entorno", "Estado Post Movimiento"]))
+
+
+class Entorno(Registro):
+    CAMPOS = ("id_entorno", "nombre", "ubicacion_fisica", "temperatura_min", "temperatura_max",
+              "humedad_min", "humedad_max", "ventilacion")
+    __slots__ = CAMPOS
+    COMPARTIDOS = ("ventilacion",)
+    ETIQUETAS = dict(zip(CAMPOS, ["ID Entorno", "Nombre", "Ubicación", "Temp. Mín.", "Temp. Máx.",
+                                  "Humedad Mín.", "Humedad Máx.", "Ventilación"]))
+
+
+def _compartir(valor: Any) -> Any:
+    return sys.intern(valor) if type(valor) is str else valor
+
+_fabricas: Dict[Tuple[type, Tuple[str, ...]], Callable[[Sequence[Any]], Registro]] = {}
+
+def fabrica(clase: type, columnas: Optional[Sequence[str]] = None) -> Callable[[Sequence[Any]], Registro]:
+    """Función fila -> objeto para filas con `columnas` (por defecto, CAMPOS en orden).
+
+    Se genera una vez por clase y lista de columnas, como hace
+    collections.namedtuple: una sola asignación múltiple por fila, sin
+    recorrer los campos en Python. Los campos que la consulta no trae
+    quedan en None y los de COMPARTIDOS pasan por sys.intern.
+    """
+    columnas = tuple(columnas or clase.CAMPOS)
+    clave = (clase, columnas)
+    if clave not in _fabricas:
+        desconocidas = [columna for columna in columnas if columna not in clase.CAMPOS]
+        if desconocidas:
+            raise ValueError(f"{clase.__name__} no tiene los campos: {', '.join(desconocidas)}")
+        faltantes = [campo for campo in clase.CAMPOS if campo not in columnas]
+        lineas = ["def crear(fila):", "    objeto = nuevo(clase)"]
+        lineas.append(f"    {', '.join('objeto.' + columna for columna in columnas)}, = fila")
+        for columna in columnas:
+            if columna in clase.COMPARTIDOS:
+                lineas.append(f"    objeto.{columna} = compartir(objeto.{columna})")
+        if faltantes:
+            lineas.append(f"    {' = '.join('objeto.' + campo for campo in faltantes)} = None")
+        lineas.append("    return objeto")
+        espacio = {"nuevo": object.__new__, "clase": clase, "compartir": _compartir}
+        exec("\n".join(lineas), espacio)
+        _fabricas[clave] = espacio["crear"]
+    return _fabricas[clave]
+
+def convertir(clase: type, filas: Sequence[Sequence[Any]], columnas: Optional[Sequence[str]] = None) -> List[Registro]:
+    crear = fabrica(clase, columnas)
+    return [crear(fila) for fila in filas]
+
+def tamano_por_fila(clase: type, filas: Sequence[Sequence[Any]]) -> Tuple[float, float]:
+    """Bytes promedio por fila (contenedor más valores no compartidos) como tupla y como objeto de `clase`.
+
+    Cada valor se cuenta una sola vez aunque lo referencien varias filas,
+    así se ve lo que ahorra compartir los textos repetidos.
+    """
+    def medir(contenedores) -> float:
+        vistos, total = set(), 0
+        for contenedor in contenedores:
+            total += sys.getsizeof(contenedor)
+            for valor in contenedor:
+                if id(valor) not in vistos:
+                    vistos.add(id(valor))
+                    total += sys.getsizeof(valor)
+        return total / max(len(filas), 1)
+
+    return medir([tuple(fila) for fila in filas]), medir(convertir(clase, filas))
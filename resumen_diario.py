@@ -0,0 +1,166 @@
+import argparse
+import os
+from datetime import datetime, timedelta
+from typing import Any, List, Optional, Sequence, Tuple
+
+from oficial import TAMANO_BLOQUE_IN, ejecutar_query, transaccion
+
+PROCESO = "resumen_diario"
+# Huecos de la numeración detrás de la marca (ver migración 008): cuánto se espera a que aparezcan
+# y cuántos se anotan como máximo por bloque (un salto grande de la numeración no son inserts en curso)
+ESPERA_HUECOS = float(os.environ.get("BD_RESUMEN_ESPERA_HUECOS", "600"))
+HUECOS_MAXIMOS = int(os.environ.get("BD_RESUMEN_HUECOS_MAXIMOS", "10000"))
+COLUMNAS_AGRUPABLES = ("fecha", "id_producto", "id_entorno", "id_lote", "tipo_movimiento")
+AGRUPACION_POR_DEFECTO = ("fecha", "id_producto", "id_entorno", "tipo_movimiento")
+
+SQL_ACUMULAR_RESUMEN = """
+INSERT INTO resumen_diario_kardex (fecha, id_producto, id_entorno, id_lote, tipo_movimiento, cantidad_total, num_movimientos)
+SELECT fecha, id_producto, id_entorno, id_lote, COALESCE(tipo_movimiento, ''), SUM(cantidad), COUNT(*)
+FROM movimiento_kardex
+WHERE {filtro} AND fecha IS NOT NULL
+GROUP BY fecha, id_producto, id_entorno, id_lote, COALESCE(tipo_movimiento, '')
+ON DUPLICATE KEY UPDATE cantidad_total = cantidad_total + VALUES(cantidad_total),
+                        num_movimientos = num_movimientos + VALUES(num_movimientos);
+"""
+
+def _momento(segundos_atras: float = 0.0) -> str:
+    return (datetime.now() - timedelta(seconds=segundos_atras)).strftime("%Y-%m-%d %H:%M:%S")
+
+def _incorporar_huecos(cursor) -> int:
+    # Suma los movimientos de huecos anotados que ya aparecieron y descarta los vencidos
+    cursor.execute(
+        "SELECT h.num_movimiento FROM hueco_resumen_diario h "
+        "INNER JOIN movimiento_kardex m ON m.num_movimiento = h.num_movimiento;")
+    aparecidos = [int(fila[0]) for fila in cursor.fetchall()]
+    for inicio in range(0, len(aparecidos), TAMANO_BLOQUE_IN):
+        bloque = aparecidos[inicio:inicio + TAMANO_BLOQUE_IN]
+        marcadores = ", ".join(["%s"] * len(bloque))
+        cursor.execute(SQL_ACUMULAR_RESUMEN.format(filtro=f"num_movimiento IN ({marcadores})"), tuple(bloque))
+        cursor.execute(f"DELETE FROM hueco_resumen_diario WHERE num_movimiento IN ({marcadores});", tuple(bloque))
+    cursor.execute("DELETE FROM hueco_resumen_diario WHERE detectado < %s;", (_momento(ESPERA_HUECOS),))
+    return len(aparecidos)
+
+def _anotar_huecos(cursor, desde: int, hasta: int) -> None:
+    # Números entre desde y hasta que todavía no se ven: inserts sin confirmar (o deshechos)
+    cursor.execute("SELECT num_movimiento FROM movimiento_kardex WHERE num_movimiento > %s AND num_movimiento <= %s "
+                   "ORDER BY num_movimiento;", (desde, hasta))
+    huecos: List[int] = []
+    anterior = desde
+    for (numero,) in cursor.fetchall():
+        if numero - anterior > 1 and len(huecos) < HUECOS_MAXIMOS: # Los más cercanos a la marca: los más viejos
+            huecos.extend(range(anterior + 1, min(numero, anterior + 1 + HUECOS_MAXIMOS - len(huecos))))
+        anterior = numero
+    if huecos:
+        detectado = _momento()
+        cursor.executemany("INSERT INTO hueco_resumen_diario (num_movimiento, detectado) VALUES (%s, %s)",
+                           [(numero, detectado) for numero in huecos])
+
+def refrescar_resumen_diario(tamano_lote: int = 50000) -> int:
+    """Agrega al resumen los movimientos posteriores a la marca de agua.
+
+    Cada bloque de hasta `tamano_lote` movimientos se suma y avanza la marca
+    en la misma transacción, así que un refresco interrumpido nunca cuenta
+    dos veces un movimiento. Los números que faltan detrás de la marca (un
+    insert concurrente que todavía no confirmó) quedan anotados en
+    hueco_resumen_diario y se suman cuando aparecen, hasta ESPERA_HUECOS
+    segundos. Devuelve cuántos movimientos se procesaron. Las modificaciones
+    o borrados de movimientos ya resumidos no se detectan: para eso está
+    reconstruir_resumen_diario().
+    """
+    total = 0
+    primero = True
+    while True:
+        with transaccion() as cursor:
+            cursor.execute("SELECT ultimo_movimiento FROM marca_agua_proceso WHERE proceso = %s FOR UPDATE;", (PROCESO,))
+            fila = cursor.fetchone()
+            desde = int(fila[0]) if fila else 0
+            if primero: # Con la marca bloqueada: dos refrescos a la vez no suman dos veces un hueco
+                total += _incorporar_huecos(cursor)
+                primero = False
+            cursor.execute(
+                "SELECT MAX(num_movimiento), COUNT(*) FROM (SELECT num_movimiento FROM movimiento_kardex "
+                "WHERE num_movimiento > %s ORDER BY num_movimiento LIMIT %s) AS bloque;",
+                (desde, tamano_lote),
+            )
+            hasta, cantidad = cursor.fetchone()
+            if not cantidad:
+                return total
+            if int(hasta) - desde > int(cantidad):
+                _anotar_huecos(cursor, desde, int(hasta))
+            cursor.execute(SQL_ACUMULAR_RESUMEN.format(filtro="num_movimiento > %s AND num_movimiento <= %s"), (desde, hasta))
+            cursor.execute(
+                "INSERT INTO marca_agua_proceso (proceso, ultimo_movimiento, actualizado) VALUES (%s, %s, NOW()) "
+                "ON DUPLICATE KEY UPDATE ultimo_movimiento = VALUES(ultimo_movimiento), actualizado = NOW();",
+                (PROCESO, hasta),
+            )
+            total += int(cantidad)
+
+def refrescar_al_recibir_cambios(cambios) -> None:
+    # Oyente para feed_kardex: el resumen se pone al día en segundo plano y no al consultarlo
+    refrescar_resumen_diario()
+
+def reconstruir_resumen_diario() -> int: # Borra el resumen y lo recalcula desde todo el historial
+    with transaccion() as cursor:
+        cursor.execute("DELETE FROM resumen_diario_kardex;")
+        cursor.execute("DELETE FROM hueco_resumen_diario;")
+        cursor.execute("UPDATE marca_agua_proceso SET ultimo_movimiento = 0 WHERE proceso = %s;", (PROCESO,))
+    return refrescar_resumen_diario()
+
+def obtener_resumen_movimientos(fecha_inicio: str, fecha_fin: str, id_producto: Optional[str] = None,
+                                id_lote: Optional[str] = None, id_entorno: Optional[str] = None,
+                                tipo_movimiento: Optional[str] = None,
+                                agrupar_por: Sequence[str] = AGRUPACION_POR_DEFECTO,
+                                refrescar: bool = True) -> List[Tuple[Any, ...]]:
+    """Totales de movimientos entre dos fechas (inclusive) en una sola consulta.
+
+    Cada fila trae las columnas de `agrupar_por` seguidas de la cantidad total
+    y el número de movimientos. Con `refrescar` se incorporan antes los
+    movimientos nuevos, que suele ser un bloque pequeño o ninguno.
+    """
+    columnas = [col for col in agrupar_por if col in COLUMNAS_AGRUPABLES]
+    if len(columnas) != len(agrupar_por):
+        raise ValueError(f"Solo se puede agrupar por: {', '.join(COLUMNAS_AGRUPABLES)}")
+    if refrescar:
+        refrescar_resumen_diario()
+
+    condiciones = ["fecha BETWEEN %s AND %s"]
+    params: List[Any] = [fecha_inicio, fecha_fin]
+    for columna, valor in (("id_producto", id_producto), ("id_lote", id_lote),
+                           ("id_entorno", id_entorno), ("tipo_movimiento", tipo_movimiento)):
+        if valor:
+            condiciones.append(f"{columna} = %s")
+            params.append(valor)
+
+    seleccion = ", ".join(columnas + ["SUM(cantidad_total)", "SUM(num_movimientos)"])
+    query = f"SELECT {seleccion} FROM resumen_diario_kardex WHERE {' AND '.join(condiciones)}"
+    if columnas:
+        query += f" GROUP BY {', '.join(columnas)} ORDER BY {', '.join(columnas)}"
+    resultados = ejecutar_query(query + ";", tuple(params))
+    if resultados is None:
+        return []
+    return [(*fila[:-2], int(fila[-2] or 0), int(fila[-1] or 0)) for fila in resultados]
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Resumen diario de movimientos del kardex.")
+    subcomandos = parser.add_subparsers(dest="comando", required=True)
+    subcomandos.add_parser("refrescar", help="Incorpora los movimientos nuevos al resumen")
+    subcomandos.add_parser("reconstruir", help="Recalcula el resumen completo")
+    consulta = subcomandos.add_parser("consultar", help="Totales entre dos fechas")
+    consulta.add_argument("inicio", help="Fecha inicial YYYY-MM-DD")
+    consulta.add_argument("fin", help="Fecha final YYYY-MM-DD")
+    consulta.add_argument("--producto")
+    consulta.add_argument("--lote")
+    consulta.add_argument("--entorno")
+    consulta.add_argument("--tipo", choices=["ENTRADA", "SALIDA", "DEVOLUCION", "MANTENIMIENTO"])
+    args = parser.parse_args()
+
+    if args.comando == "refrescar":
+        print(f"Movimientos incorporados al resumen: {refrescar_resumen_diario()}")
+    elif args.comando == "reconstruir":
+        print(f"Resumen reconstruido con {reconstruir_resumen_diario()} movimientos.")
+    else:
+        filas = obtener_resumen_movimientos(args.inicio, args.fin, args.producto, args.lote, args.entorno, args.tipo)
+        if not filas:
+            print(f"No hay movimientos entre {args.inicio} y {args.fin}.")
+        for fecha, id_producto, id_entorno, tipo, cantidad, movimientos in filas:
+            print(f"{fecha}  {id_producto:<8} {id_entorno:<12} {tipo:<13} cantidad: {cantidad:>8}  movimientos: {movimientos}")
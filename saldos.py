@@ -0,0 +1,72 @@
+import sys
+from typing import Dict, List, Tuple
+
+from oficial import ejecutar_query, transaccion
+
+# Recalcula el saldo desde cero a partir de todo el historial del kardex
+SQL_RECALCULO_SALDOS = """
+SELECT id_producto, id_lote, id_entorno, COALESCE(estado_post_movimiento, '') AS estado,
+       SUM(CASE tipo_movimiento
+             WHEN 'ENTRADA' THEN cantidad
+             WHEN 'SALIDA' THEN -cantidad
+             ELSE 0
+           END) AS cantidad
+FROM movimiento_kardex
+GROUP BY id_producto, id_lote, id_entorno, COALESCE(estado_post_movimiento, '')
+"""
+
+ClaveSaldo = Tuple[str, str, str, str]
+
+def reconstruir_saldos() -> int: # Vacía saldo_stock y lo vuelve a llenar con un recálculo completo
+    with transaccion() as cursor:
+        cursor.execute("DELETE FROM saldo_stock;")
+        cursor.execute(
+            "INSERT INTO saldo_stock (id_producto, id_lote, id_entorno, estado, cantidad) " + SQL_RECALCULO_SALDOS + ";"
+        )
+        return cursor.rowcount
+
+def _saldos_como_dict(filas) -> Dict[ClaveSaldo, int]:
+    saldos = {}
+    for id_producto, id_lote, id_entorno, estado, cantidad in filas:
+        if cantidad:
+            saldos[(id_producto, id_lote, id_entorno, estado)] = int(cantidad)
+    return saldos
+
+def verificar_saldos() -> List[Tuple[ClaveSaldo, int, int]]:
+    """Compara saldo_stock con un recálculo completo del kardex.
+
+    Devuelve las claves que difieren como (clave, saldo_guardado, saldo_recalculado).
+    Una clave ausente y una con cantidad 0 se consideran equivalentes.
+    """
+    guardados = ejecutar_query("SELECT id_producto, id_lote, id_entorno, estado, cantidad FROM saldo_stock;")
+    recalculados = ejecutar_query(SQL_RECALCULO_SALDOS + ";")
+    if guardados is None or recalculados is None:
+        raise RuntimeError("No se pudieron leer los saldos de la base de datos")
+
+    saldos_guardados = _saldos_como_dict(guardados)
+    saldos_recalculados = _saldos_como_dict(recalculados)
+    diferencias = []
+    for clave in sorted(saldos_guardados.keys() | saldos_recalculados.keys()):
+        guardado = saldos_guardados.get(clave, 0)
+        recalculado = saldos_recalculados.get(clave, 0)
+        if guardado != recalculado:
+            diferencias.append((clave, guardado, recalculado))
+    return diferencias
+
+if __name__ == "__main__":
+    comando = sys.argv[1] if len(sys.argv) > 1 else ""
+    if comando == "reconstruir":
+        filas = reconstruir_saldos()
+        print(f"Saldos reconstruidos: {filas} filas.")
+    elif comando == "verificar":
+        diferencias = verificar_saldos()
+        if not diferencias:
+            print("Los saldos coinciden con el kardex.")
+        else:
+            print(f"Se encontraron {len(diferencias)} saldos descuadrados:")
+            for (id_producto, id_lote, id_entorno, estado), guardado, recalculado in diferencias:
+                print(f"  {id_producto} / {id_lote} / {id_entorno} / {estado or '-'}: guardado {guardado}, kardex {recalculado}")
+            sys.exit(1)
+    else:
+        print("Uso: python saldos.py reconstruir | verificar")
+        sys.exit(2)
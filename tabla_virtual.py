@@ -0,0 +1,284 @@
+import inspect
+import tkinter as tk
+from bisect import bisect_right
+from tkinter import ttk
+from typing import Any, Callable, Dict, Iterator, List, Optional, Sequence, Tuple
+
+# Recibe (función a ejecutar fuera del hilo de Tk, callback con su resultado en el hilo de Tk,
+# callback con (mensaje, se puede reintentar) si la función falla o no termina a tiempo)
+EjecutorSegundoPlano = Callable[[Callable[[], Any], Callable[[Any], None], Callable[[str, bool], None]], None]
+
+
+class _Invertido:
+    # Clave de orden descendente: bisect y sort solo usan <
+    __slots__ = ("clave",)
+
+    def __init__(self, clave):
+        self.clave = clave
+
+    def __lt__(self, otro: "_Invertido") -> bool:
+        return otro.clave < self.clave
+
+
+class TablaVirtual(ttk.Frame):
+    """Tabla de resultados que solo dibuja las filas visibles.
+
+    El Treeview tiene siempre tantos ítems como filas caben en pantalla; al
+    desplazarse se reescriben sus valores en lugar de crear o borrar ítems,
+    así que el costo de dibujar no depende del total de filas. Los datos
+    llegan de un iterador de páginas que se consume a medida que el usuario
+    se acerca al final de lo ya cargado. Ordenar y filtrar trabajan sobre las
+    filas en memoria, sin volver a consultar la base de datos; con un orden
+    activo, cada página nueva se intercala en el orden ya armado en lugar de
+    reordenar todo. Si una página falla se ofrece reintentarla.
+    """
+
+    def __init__(self, master, ejecutar_en_segundo_plano: EjecutorSegundoPlano, margen_carga: int = 200, **kwargs):
+        super().__init__(master, **kwargs)
+        self._ejecutar = ejecutar_en_segundo_plano
+        self._margen_carga = margen_carga
+        self._columnas: List[str] = []
+        self._filas: List[Tuple[Any, ...]] = [] # Todas las filas recibidas
+        self._vista: List[Tuple[Any, ...]] = [] # Filas que pasan los filtros, en el orden elegido
+        self._items: List[str] = [] # Ítems del Treeview que se reutilizan al desplazarse
+        self._inicio = 0
+        self._visibles = 20
+        self._paginas: Optional[Iterator[Sequence[Tuple[Any, ...]]]] = None
+        self._cargando = False
+        self._agotado = True
+        self._error: Optional[str] = None # Última página fallida; se muestra con el botón Reintentar
+        self._incompleto = False # Falló una página que no se puede volver a pedir
+        self._al_quedar_vacia: Optional[Callable[[], None]] = None
+        self._orden: Optional[Tuple[int, bool]] = None # (columna, descendente)
+        self._filtros: Dict[int, str] = {}
+
+        barra = ttk.Frame(self)
+        barra.pack(fill=tk.X, pady=(0, 5))
+        ttk.Label(barra, text="Filtrar").pack(side=tk.LEFT)
+        self._combo_columna = ttk.Combobox(barra, state="readonly", width=22)
+        self._combo_columna.pack(side=tk.LEFT, padx=5)
+        self._entry_filtro = ttk.Entry(barra, width=20)
+        self._entry_filtro.pack(side=tk.LEFT)
+        self._entry_filtro.bind("<Return>", lambda _evento: self._aplicar_filtro())
+        ttk.Button(barra, text="Aplicar", command=self._aplicar_filtro).pack(side=tk.LEFT, padx=5)
+        ttk.Button(barra, text="Quitar filtros", command=self._quitar_filtros).pack(side=tk.LEFT)
+        self._estado = tk.StringVar()
+        ttk.Label(barra, textvariable=self._estado).pack(side=tk.RIGHT)
+        self._boton_reintentar = ttk.Button(barra, text="Reintentar", command=self._reintentar) # Solo visible tras un error
+
+        cuerpo = ttk.Frame(self)
+        cuerpo.pack(expand=True, fill=tk.BOTH)
+        self._tree = ttk.Treeview(cuerpo, show="headings", selectmode="browse")
+        self._scroll = ttk.Scrollbar(cuerpo, orient=tk.VERTICAL, command=self._al_desplazar)
+        self._scroll.pack(side=tk.RIGHT, fill=tk.Y)
+        self._tree.pack(side=tk.LEFT, expand=True, fill=tk.BOTH)
+
+        self._tree.bind("<Configure>", self._al_redimensionar)
+        self._tree.bind("<MouseWheel>", self._al_rueda)
+        self._tree.bind("<Button-4>", lambda _evento: self._desplazar_a(self._inicio - 3) or "break")
+        self._tree.bind("<Button-5>", lambda _evento: self._desplazar_a(self._inicio + 3) or "break")
+        self._tree.bind("<Prior>", lambda _evento: self._desplazar_a(self._inicio - self._visibles) or "break")
+        self._tree.bind("<Next>", lambda _evento: self._desplazar_a(self._inicio + self._visibles) or "break")
+
+    # --- Carga de datos ---
+
+    def cargar(self, columnas: Sequence[str], paginas: Iterator[Sequence[Tuple[Any, ...]]],
+               al_quedar_vacia: Optional[Callable[[], None]] = None):
+        """Reemplaza el contenido por las filas que entregue `paginas` (un bloque por `next`)."""
+        self._columnas = list(columnas)
+        self._tree.delete(*self._items)
+        self._items = []
+        self._tree.configure(columns=[str(i) for i in range(len(self._columnas))])
+        for i, nombre in enumerate(self._columnas):
+            self._tree.heading(str(i), text=nombre, command=lambda i=i: self._ordenar_por(i))
+            self._tree.column(str(i), width=120, stretch=True)
+        self._combo_columna.configure(values=self._columnas)
+        if self._columnas:
+            self._combo_columna.current(0)
+        self._filas, self._vista = [], []
+        self._inicio = 0
+        self._orden = None
+        self._filtros = {}
+        self._paginas = paginas
+        self._al_quedar_vacia = al_quedar_vacia
+        self._cargando = False
+        self._agotado = False
+        self._limpiar_error()
+        self._incompleto = False
+        self._dibujar()
+        self._pedir_pagina()
+
+    def detener(self):
+        # Deja de pedir páginas; las que estén en camino se ignoran al llegar
+        self._paginas = None
+        self._cargando = False
+        self._agotado = True
+        self._limpiar_error()
+
+    def _pedir_pagina(self):
+        if self._cargando or self._agotado or self._paginas is None or self._error is not None:
+            return
+        self._cargando = True
+        paginas = self._paginas
+        self._ejecutar(lambda: next(paginas, None), lambda pagina: self._recibir_pagina(paginas, pagina),
+                       lambda mensaje, reintentable: self._fallo_pagina(paginas, mensaje, reintentable))
+        self._actualizar_estado()
+
+    def _fallo_pagina(self, paginas, mensaje: str, reintentable: bool):
+        if paginas is not self._paginas:
+            return
+        self._cargando = False
+        self._error = mensaje
+        # Un generador que lanzó una excepción ya terminó: pedirle otra página no retomaría el listado
+        if inspect.isgenerator(paginas) and inspect.getgeneratorstate(paginas) == inspect.GEN_CLOSED:
+            reintentable = False
+        if reintentable:
+            self._boton_reintentar.pack(side=tk.RIGHT, padx=5)
+        else:
+            self._agotado = True
+            self._incompleto = True
+        self._actualizar_estado()
+
+    def _limpiar_error(self):
+        self._error = None
+        self._boton_reintentar.pack_forget()
+
+    def _reintentar(self):
+        self._limpiar_error()
+        self._pedir_pagina()
+
+    def _recibir_pagina(self, paginas, pagina):
+        if paginas is not self._paginas: # Llegó tarde: ya se cargó otra consulta
+            return
+        self._cargando = False
+        if not pagina:
+            self._agotado = True
+            if not self._filas and self._al_quedar_vacia is not None:
+                self._al_quedar_vacia()
+                return
+        else:
+            self._filas.extend(pagina)
+            nuevas = [fila for fila in pagina if self._pasa_filtros(fila)]
+            if self._orden is None:
+                self._vista.extend(nuevas)
+            else:
+                self._intercalar_en_vista(nuevas)
+        self._dibujar()
+        self._pedir_si_hace_falta()
+
+    def _pedir_si_hace_falta(self):
+        if self._inicio + self._visibles >= len(self._vista) - self._margen_carga:
+            self._pedir_pagina()
+
+    # --- Orden y filtros (en memoria) ---
+
+    def _pasa_filtros(self, fila) -> bool:
+        for columna, texto in self._filtros.items():
+            if texto not in str(fila[columna]).lower():
+                return False
+        return True
+
+    def _clave_orden(self) -> Callable[[Tuple[Any, ...]], Any]:
+        columna, descendente = self._orden
+        if descendente:
+            return lambda fila: _Invertido((fila[columna] is None, fila[columna]))
+        return lambda fila: (fila[columna] is None, fila[columna]) # Los vacíos al final
+
+    def _recalcular_vista(self):
+        vista = [fila for fila in self._filas if self._pasa_filtros(fila)] if self._filtros else list(self._filas)
+        if self._orden is not None:
+            vista.sort(key=self._clave_orden())
+        self._vista = vista
+
+    def _intercalar_en_vista(self, nuevas: List[Tuple[Any, ...]]):
+        # Ordena solo la página y la intercala con búsqueda binaria: O(p log n) comparaciones
+        # y una copia de la lista, en lugar de reordenar todas las filas en cada página
+        clave = self._clave_orden()
+        nuevas.sort(key=clave)
+        vista, resultado, anterior = self._vista, [], 0
+        for fila in nuevas:
+            posicion = bisect_right(vista, clave(fila), lo=anterior, key=clave)
+            resultado.extend(vista[anterior:posicion])
+            resultado.append(fila)
+            anterior = posicion
+        resultado.extend(vista[anterior:])
+        self._vista = resultado
+
+    def _ordenar_por(self, columna: int):
+        descendente = self._orden == (columna, False)
+        self._orden = (columna, descendente)
+        for i, nombre in enumerate(self._columnas):
+            flecha = (" ▼" if descendente else " ▲") if i == columna else ""
+            self._tree.heading(str(i), text=nombre + flecha)
+        self._recalcular_vista()
+        self._desplazar_a(0)
+
+    def _aplicar_filtro(self):
+        columna = self._combo_columna.current()
+        if columna < 0:
+            return
+        texto = self._entry_filtro.get().strip().lower()
+        if texto:
+            self._filtros[columna] = texto
+        else:
+            self._filtros.pop(columna, None)
+        self._recalcular_vista()
+        self._desplazar_a(0)
+
+    def _quitar_filtros(self):
+        self._filtros = {}
+        self._entry_filtro.delete(0, tk.END)
+        self._recalcular_vista()
+        self._desplazar_a(0)
+
+    # --- Desplazamiento y dibujo ---
+
+    def _al_desplazar(self, *args):
+        if args[0] == "moveto":
+            self._desplazar_a(int(float(args[1]) * len(self._vista)))
+        elif args[0] == "scroll":
+            paso = int(args[1]) * (self._visibles if args[2] == "pages" else 1)
+            self._desplazar_a(self._inicio + paso)
+
+    def _al_rueda(self, evento):
+        self._desplazar_a(self._inicio - int(evento.delta / 120) * 3)
+        return "break"
+
+    def _al_redimensionar(self, evento):
+        alto_fila = int(ttk.Style().lookup("Treeview", "rowheight") or 20)
+        visibles = max(1, (evento.height - alto_fila) // alto_fila) # Descuenta la fila de encabezados
+        if visibles != self._visibles:
+            self._visibles = visibles
+            self._desplazar_a(self._inicio)
+
+    def _desplazar_a(self, inicio: int):
+        self._inicio = max(0, min(inicio, len(self._vista) - self._visibles))
+        self._dibujar()
+        self._pedir_si_hace_falta()
+
+    def _dibujar(self):
+        filas = self._vista[self._inicio:self._inicio + self._visibles]
+        while len(self._items) < len(filas):
+            self._items.append(self._tree.insert("", tk.END))
+        while len(self._items) > len(filas):
+            self._tree.delete(self._items.pop())
+        for item, fila in zip(self._items, filas):
+            self._tree.item(item, values=["" if valor is None else valor for valor in fila])
+        total = len(self._vista)
+        if total:
+            self._scroll.set(self._inicio / total, (self._inicio + len(filas)) / total)
+        else:
+            self._scroll.set(0.0, 1.0)
+        self._actualizar_estado()
+
+    def _actualizar_estado(self):
+        texto = f"{len(self._vista)} de {len(self._filas)} filas"
+        if self._cargando:
+            texto += " (cargando...)"
+        elif self._incompleto:
+            texto += " (incompleto)"
+        elif not self._agotado:
+            texto += " (hay más)"
+        if self._error is not None:
+            texto += f" — {self._error}"
+        self._estado.set(texto)
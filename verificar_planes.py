@@ -0,0 +1,125 @@
+import sys
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+import oficial
+import cierres_stock
+
+# Tipos de acceso de EXPLAIN que implican recorrer la tabla o el índice completo
+TIPOS_RECORRIDO_COMPLETO = ("ALL", "index")
+
+# Agregados que por diseño leen toda la tabla: su recorrido se informa pero no cuenta como fallo.
+# Las tablas van con su alias, que es lo que muestra EXPLAIN, y con su nombre
+RECORRIDOS_PERMITIDOS: Dict[str, Tuple[str, ...]] = {
+    "obtener_stock_por_entorno": ("s", "saldo_stock"), # Suma de todo el saldo, agrupado por entorno
+}
+
+def _muestra_de_datos() -> Tuple[str, str, str, str]: # Un movimiento real para usar sus valores como parámetros
+    fila = oficial.ejecutar_query(
+        "SELECT id_producto, id_lote, id_entorno, fecha FROM movimiento_kardex LIMIT 1;"
+    )
+    if not fila:
+        raise RuntimeError("El kardex está vacío: no hay datos de muestra para generar los planes")
+    id_producto, id_lote, id_entorno, fecha = fila[0]
+    return id_producto, id_lote, id_entorno, str(fecha)
+
+def consultas_a_verificar() -> List[Tuple[str, Callable[[], Any]]]:
+    id_producto, id_lote, id_entorno, fecha = _muestra_de_datos()
+    return [
+        ("obtener_detalles_producto", lambda: oficial.obtener_detalles_producto(id_producto)),
+        ("obtener_stock", lambda: oficial.obtener_stock(id_producto)),
+        ("obtener_stock_producto_lote", lambda: oficial.obtener_stock_producto_lote(id_producto, id_lote, id_entorno)),
+        ("producto_entorno", lambda: oficial.producto_entorno(id_entorno)),
+        ("obtener_stock_producto_desglosado_por_lote", lambda: oficial.obtener_stock_producto_desglosado_por_lote(id_producto)),
+        ("cantidad_productos_dañados", oficial.cantidad_productos_dañados),
+        ("obtener_stock_por_entorno", oficial.obtener_stock_por_entorno),
+        ("obtener_sim_total", oficial.obtener_sim_total),
+        ("obtener_sim_de_operador", lambda: oficial.obtener_sim_de_operador("ENTEL")),
+        ("obtener_sim_por_operador", oficial.obtener_sim_por_operador),
+        ("obtener_detalles_entradas_en_un_dia", lambda: oficial.obtener_detalles_entradas_en_un_dia(fecha)),
+        ("obtener_detalles_salidas_en_un_dia", lambda: oficial.obtener_detalles_salidas_en_un_dia(fecha)),
+        ("iterar_paginas_salidas_en_un_dia", lambda: next(oficial.iterar_paginas_salidas_en_un_dia(fecha), None)),
+        ("obtener_stock_todos_productos", lambda: oficial.obtener_pagina_stock_productos("", 1000)),
+        ("obtener_stock_todos_productos (ids)", lambda: oficial.obtener_pagina_stock_productos("", 1000, [id_producto])),
+        ("obtener_stock_many", lambda: oficial.obtener_stock_many([id_producto])),
+        ("obtener_stock_lotes_many", lambda: oficial.obtener_stock_lotes_many([(id_producto, id_lote, id_entorno)])),
+        ("obtener_stock_en_entorno_many", lambda: oficial.obtener_stock_en_entorno_many([id_producto], id_entorno)),
+        ("obtener_stock_a_fecha", lambda: cierres_stock.obtener_stock_a_fecha(id_producto, fecha)),
+    ]
+
+def capturar_queries(funcion: Callable[[], Any]) -> List[Tuple[str, Optional[tuple]]]:
+    """Ejecuta `funcion` sustituyendo ejecutar_query para registrar qué SQL envía.
+
+    Se sustituye en oficial y en cada módulo que la importó por nombre
+    (cierres_stock, saldos...), que si no seguirían llamando a la original.
+    """
+    capturadas = []
+    original = oficial.ejecutar_query
+
+    def registrar(query_string, params=None, como=None):
+        capturadas.append((query_string, params))
+        return []
+
+    modulos = [modulo for modulo in list(sys.modules.values())
+               if getattr(modulo, "ejecutar_query", None) is original]
+    for modulo in modulos:
+        modulo.ejecutar_query = registrar
+    oficial.invalidar_cache_productos() # Un acierto de cache no enviaría ningún SQL
+    oficial.cache_sim.limpiar()
+    try:
+        funcion()
+    finally:
+        for modulo in modulos:
+            modulo.ejecutar_query = original
+    return capturadas
+
+def explicar(query_string: str, params: Optional[tuple]) -> List[dict]:
+    with oficial.obtener_pool().conexion() as conexion:
+        cursor = conexion.cursor(dictionary=True)
+        try:
+            cursor.execute("EXPLAIN " + query_string.strip().rstrip(";"), params)
+            return cursor.fetchall()
+        finally:
+            cursor.close()
+
+def verificar_planes(min_filas: int = 0) -> List[str]:
+    """Devuelve una descripción por cada consulta que cae en un recorrido completo.
+
+    También falla una entrada que no envió ningún SQL por ejecutar_query.
+    Los recorridos sobre tablas con menos de `min_filas` filas estimadas se
+    ignoran (útil con los datos semilla, donde el optimizador prefiere leer
+    la tabla entera), igual que los de RECORRIDOS_PERMITIDOS y las tablas
+    derivadas (<derivedN>): ese paso lee el resultado ya calculado de la
+    subconsulta, cuyo plan aparece en sus propias filas del EXPLAIN.
+    """
+    fallos = []
+    for nombre, funcion in consultas_a_verificar():
+        queries = capturar_queries(funcion)
+        if not queries: # Sin SQL capturado no se verificó nada: mejor fallar que dar un falso "ok"
+            fallos.append(f"{nombre}: no se capturó ninguna consulta")
+            print(f"{nombre:<45} sin consultas capturadas")
+        for query_string, params in queries:
+            for paso in explicar(query_string, params):
+                filas = paso.get("rows") or 0
+                tabla = str(paso.get("table"))
+                estado = "ok"
+                if paso.get("type") in TIPOS_RECORRIDO_COMPLETO and filas >= min_filas:
+                    if tabla.startswith("<derived"):
+                        estado = "ok (tabla derivada)"
+                    elif tabla in RECORRIDOS_PERMITIDOS.get(nombre, ()):
+                        estado = "RECORRIDO COMPLETO (permitido)"
+                    else:
+                        estado = "RECORRIDO COMPLETO"
+                        fallos.append(f"{nombre}: {tabla} ({paso.get('type')}, ~{filas} filas)")
+                print(f"{nombre:<45} {tabla:<20} {str(paso.get('type')):<8} "
+                      f"key={paso.get('key')} filas~{filas} {estado}")
+    return fallos
+
+if __name__ == "__main__":
+    min_filas = int(sys.argv[1]) if len(sys.argv) > 1 else 0
+    fallos = verificar_planes(min_filas)
+    if fallos:
+        print(f"\n{len(fallos)} consulta(s) sin índice adecuado o sin verificar:")
+        for fallo in fallos:
+            print(f"  {fallo}")
+        sys.exit(1)
+    print("\nTodas las consultas usan un índice.")